@@ -2,17 +2,34 @@
 GearGuard+ Maintenance Management System
 Main application entry point
 """
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
 from models import (
     Equipment, MaintenanceTeam, MaintenanceRequest, 
     Employee, Dashboard
 )
+from models.analytics import ANALYTICS_ENABLED, AnalyticsEngine
+from models.base import get_data_version
 
 
 class Environment:
     """Application environment holding all models"""
     
-    def __init__(self):
+    def __init__(self, storage_factory=None):
+        # Callable(model) -> storage backend or None for in-memory storage,
+        # e.g. models.storage.sqlite_storage_factory(db)
+        self.storage_factory = storage_factory
+        # NumPy columns for fleet-wide dashboard figures; None without NumPy
+        self.analytics = AnalyticsEngine(self) if ANALYTICS_ENABLED else None
         self.models = {}
+        # Models, their indexes, computed-field queues and caches are not
+        # thread-safe: request threads and the overdue sweeper hold this
+        # lock around every model call
+        self.lock = threading.RLock()
+        self._local = threading.local()  # Per-thread request scope
         self._initialize_models()
     
     def _initialize_models(self):
@@ -30,13 +47,113 @@ class Environment:
     def __getitem__(self, model_name):
         """Allow dict-style access"""
         return self.get(model_name)
+    
+    def flush(self):
+        """Flag newly overdue requests, age out breakdowns and recompute pending computed fields"""
+        self.models['maintenance.request'].sweep_overdue()
+        self.models['equipment'].expire_breakdowns()
+        for model in self.models.values():
+            model._flush()
+    
+    def begin_request_scope(self):
+        """Start a request-scoped identity map for related record lookups"""
+        self._local.identity_map = {}
+        self._local.today = None
+    
+    def end_request_scope(self):
+        """Discard the current request's identity map"""
+        self._local.identity_map = None
+        self._local.today = None
+    
+    @contextmanager
+    def request_scope(self):
+        """Context manager form of begin/end_request_scope"""
+        self.begin_request_scope()
+        try:
+            yield self
+        finally:
+            self.end_request_scope()
+    
+    def get_identity_map(self):
+        """Identity map of the current request ({model name: {id: record}}), or None"""
+        return getattr(self._local, 'identity_map', None)
+    
+    def today(self):
+        """
+        Today's date; looked up once per request scope, so overdue flags
+        and day windows within one request agree even across midnight
+        """
+        today = getattr(self._local, 'today', None)
+        if today is None:
+            today = date.today()
+            if self.get_identity_map() is not None:
+                self._local.today = today
+        return today
+
+
+class OverdueSweeper:
+    """Background thread flagging requests as overdue when their date passes"""
+    
+    def __init__(self, env, interval=60):
+        self.env = env
+        self.interval = interval  # Seconds between sweeps
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start sweeping in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='overdue-sweeper', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop the thread after its current sweep"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def sweep(self):
+        """Run one sweep now, returning the ids flagged overdue"""
+        with self.env.lock:
+            # Health scores of equipment whose breakdowns aged out recompute on next read
+            self.env['equipment'].expire_breakdowns()
+            return self.env['maintenance.request'].sweep_overdue()
+    
+    def _run(self):
+        # First sweep right away: requests may have gone overdue while stopped
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Overdue sweep failed: {e}")
+            if self._stopped.wait(self.interval):
+                break
 
 
 class GearGuardApp:
     """Main application class"""
     
-    def __init__(self):
-        self.env = Environment()
+    # Dashboard section -> (Dashboard method, depends on today's date)
+    DASHBOARD_SECTIONS = {
+        'kpis': ('get_kpis', True),
+        'preventive_vs_corrective': ('get_preventive_vs_corrective', False),
+        'requests_per_team': ('get_requests_per_team', False),
+        'technician_workloads': ('get_technician_workloads', False),
+        'critical_equipment': ('get_critical_equipment', False),
+        'alerts': ('get_predictive_alerts', True),
+    }
+    
+    # Seconds a date-dependent section (overdue counts, 30-day breakdowns)
+    # may be served from cache when no data changed
+    DASHBOARD_CACHE_TTL = 60
+    
+    def __init__(self, storage_factory=None):
+        self.env = Environment(storage_factory=storage_factory)
+        self._dashboard_cache = {}  # section -> (data version, expiry, value)
+        self.overdue_sweeper = OverdueSweeper(self.env)  # start() to run in the background
     
     def setup_demo_data(self):
         """Create demo data for testing"""
@@ -276,15 +393,31 @@ class GearGuardApp:
             'requests': [req1, req2, req3, req4, req5, req6, req7, req8, req9, req10, req11],
         }
     
+    def get_dashboard_section(self, section):
+        """
+        Get one dashboard section, recomputed only when model data changed
+        (or, for date-dependent sections, when the cache TTL ran out)
+        """
+        method_name, date_dependent = self.DASHBOARD_SECTIONS[section]
+        # Pending computed fields would bump the version mid-computation
+        self.env.flush()
+        version = get_data_version()
+        now = time.monotonic()
+        
+        cached = self._dashboard_cache.get(section)
+        if cached and cached[0] == version and (cached[1] is None or now < cached[1]):
+            return cached[2]
+        
+        value = getattr(self.env['dashboard'], method_name)()
+        expiry = now + self.DASHBOARD_CACHE_TTL if date_dependent else None
+        self._dashboard_cache[section] = (version, expiry, value)
+        return value
+    
     def get_dashboard_data(self):
         """Get dashboard data"""
-        dashboard = self.env['dashboard']
         return {
-            'kpis': dashboard.get_kpis(),
-            'preventive_vs_corrective': dashboard.get_preventive_vs_corrective(),
-            'requests_per_team': dashboard.get_requests_per_team(),
-            'technician_workloads': dashboard.get_technician_workloads(),
-            'alerts': dashboard.get_predictive_alerts(),
+            section: self.get_dashboard_section(section)
+            for section in self.DASHBOARD_SECTIONS
         }
 
 
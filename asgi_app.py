@@ -0,0 +1,197 @@
+"""
+GearGuard+ ASGI Application
+Serves the JSON API with asyncio and forwards every other path to the
+Flask web interface (web_app.py)
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+
+Unchanged API payloads are answered with 304 on the event loop, once the
+path passed the route's check (a month in range); routes whose check
+needs the models answer 304 after their handler returned 200. Other
+API calls run on a small thread pool and the Flask UI on asgiref's
+WsgiToAsgi adapter; both hold the environment lock around model calls,
+so they take turns with each other and with the overdue sweeper. Beyond
+GEARGUARD_API_MAX_PENDING queued API calls, clients get 503 with
+Retry-After instead of piling up.
+"""
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+
+from metrics import metrics
+from web_app import (app as flask_app, api_etag, check_calendar_month, gear_app,
+                     get_calendar_month, get_equipment_health)
+
+
+# Model calls are serialized by the environment lock, so more workers
+# only help handlers that block outside the models
+API_WORKERS = int(os.environ.get('GEARGUARD_API_WORKERS', 1))
+API_MAX_PENDING = int(os.environ.get('GEARGUARD_API_MAX_PENDING', 512))
+
+_api_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix='gearguard-api')
+_api_pending = 0  # API calls queued or running; only touched on the event loop
+
+# Flask UI; requests take the environment lock in web_app's request hooks
+_flask_asgi = WsgiToAsgi(flask_app)
+
+
+def _dashboard_section(section):
+    return gear_app.get_dashboard_section(section), 200
+
+
+def _always_valid(*args):
+    return None
+
+
+# (path pattern, Flask endpoint name, handler(*path groups) -> (payload, status),
+# check(*path groups) -> (payload, status) error or None, run on the event loop
+# before a 304, or None when only the handler can tell);
+# same JSON and same metrics route labels as web_app
+API_ROUTES = [
+    (re.compile(r'^/api/dashboard/kpis$'), 'api_kpis', lambda: _dashboard_section('kpis'),
+     _always_valid),
+    (re.compile(r'^/api/dashboard/alerts$'), 'api_alerts', lambda: _dashboard_section('alerts'),
+     _always_valid),
+    (re.compile(r'^/api/calendar/(\d+)/(\d+)$'), 'api_calendar_month',
+     lambda year, month: get_calendar_month(int(year), int(month)),
+     lambda year, month: check_calendar_month(int(year), int(month))),
+    (re.compile(r'^/api/equipment/(\d+)/health$'), 'api_equipment_health',
+     lambda equipment_id: get_equipment_health(int(equipment_id)), None),
+]
+
+
+def _match_api_route(path):
+    """(endpoint, handler, check, args) for an API path, or None"""
+    for pattern, endpoint, handler, check in API_ROUTES:
+        match = pattern.match(path)
+        if match:
+            return endpoint, handler, check, match.groups()
+    return None
+
+
+def _call_in_scope(handler, args):
+    """
+    Run a model call under the environment lock, inside a request scope
+    (shared related-record lookups)
+    Returns (payload, status, ORM operations made)
+    """
+    metrics.begin_request()
+    try:
+        with gear_app.env.lock, gear_app.env.request_scope():
+            payload, status = handler(*args)
+    finally:
+        operations = metrics.end_request()
+    return payload, status, operations
+
+
+def _etag_matches(scope, etag):
+    """Whether the request's If-None-Match lists etag (weak comparison)"""
+    for name, value in scope.get('headers', []):
+        if name.lower() != b'if-none-match':
+            continue
+        for tag in value.decode('latin-1').split(','):
+            tag = tag.strip()
+            if tag == '*' or tag.replace('W/', '', 1).strip('"') == etag:
+                return True
+    return False
+
+
+def _conditional_headers(etag):
+    return [(b'etag', f'"{etag}"'.encode('latin-1')), (b'cache-control', b'no-cache')]
+
+
+async def _send_not_modified(send, etag):
+    await send({'type': 'http.response.start', 'status': 304, 'headers': _conditional_headers(etag)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send_json(send, status, payload, head=False, extra_headers=()):
+    body = flask_app.json.dumps(payload).encode('utf-8')
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('latin-1')),
+    ]
+    headers.extend(extra_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def _serve_api(scope, send, endpoint, handler, check, args):
+    global _api_pending
+    start = time.perf_counter()
+    method = scope['method']
+    if method not in ('GET', 'HEAD'):
+        await _send_json(send, 405, {'error': 'Method not allowed'},
+                         extra_headers=[(b'allow', b'GET, HEAD')])
+        return
+    if check is not None:
+        error = check(*args)
+        if error is not None:
+            payload, status = error
+            await _send_json(send, status, payload, head=method == 'HEAD')
+            metrics.observe_request(endpoint, method, status, time.perf_counter() - start, 0)
+            return
+        # Unchanged data: answered on the event loop without touching the models
+        etag = api_etag()
+        if _etag_matches(scope, etag):
+            await _send_not_modified(send, etag)
+            metrics.observe_request(endpoint, method, 304, time.perf_counter() - start, 0)
+            return
+    if _api_pending >= API_MAX_PENDING:
+        await _send_json(send, 503, {'error': 'Server busy'}, head=method == 'HEAD',
+                         extra_headers=[(b'retry-after', b'1')])
+        metrics.observe_request(endpoint, method, 503, time.perf_counter() - start, 0)
+        return
+    
+    _api_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        payload, status, operations = await loop.run_in_executor(
+            _api_executor, _call_in_scope, handler, args
+        )
+    finally:
+        _api_pending -= 1
+    if status != 200:
+        await _send_json(send, status, payload, head=method == 'HEAD')
+    else:
+        # Tagged after the call: flushing computed fields bumps the version
+        etag = api_etag()
+        if _etag_matches(scope, etag):
+            status = 304
+            await _send_not_modified(send, etag)
+        else:
+            await _send_json(send, status, payload, head=method == 'HEAD',
+                             extra_headers=_conditional_headers(etag))
+    metrics.observe_request(endpoint, method, status, time.perf_counter() - start, operations)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            gear_app.overdue_sweeper.stop()
+            _api_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return  # No websockets
+    
+    route = _match_api_route(scope['path'])
+    if route is None:
+        await _flask_asgi(scope, receive, send)
+    else:
+        await _serve_api(scope, send, *route)
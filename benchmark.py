@@ -0,0 +1,344 @@
+"""
+GearGuard+ Benchmark Suite
+Times ORM primitives, dashboard queries and web routes on synthetic fleets
+of growing size, or measures the memory they take, and writes the results
+as JSON for comparing runs
+
+Usage:
+    python benchmark.py                                  # 1k, 10k, 100k, 1M requests
+    python benchmark.py --sizes 1000 10000 --output before.json
+    python benchmark.py --sizes 1000 10000 --baseline before.json
+    python benchmark.py --memory --storage memory compact --sizes 100000 1000000
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from app import GearGuardApp
+from synthetic_data import generate_fleet
+
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+DASHBOARD_METHODS = (
+    'get_kpis',
+    'get_preventive_vs_corrective',
+    'get_requests_per_team',
+    'get_critical_equipment',
+    'get_technician_workloads',
+    'get_predictive_alerts',
+)
+
+# Route name -> URL; <equipment> and <request> are replaced with real ids
+ROUTES = {
+    'dashboard': '/',
+    'equipment_list': '/equipment',
+    'equipment_detail': '/equipment/<equipment>',
+    'requests_list': '/requests',
+    'requests_kanban': '/requests?view=kanban',
+    'request_detail': '/requests/<request>',
+    'calendar': '/calendar',
+    'api_kpis': '/api/dashboard/kpis',
+    'api_alerts': '/api/dashboard/alerts',
+    'api_equipment_health': '/api/equipment/<equipment>/health',
+}
+
+
+def fleet_counts(size):
+    """Record counts of a fleet with size maintenance requests"""
+    return {
+        'employees': max(6, size // 200),
+        'teams': max(2, size // 2000),
+        'equipment': max(10, size // 10),
+        'requests': size,
+    }
+
+
+def time_call(func, repeat):
+    """Timings of repeat calls in milliseconds (the first call runs cold)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'first_ms': round(timings[0], 3),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+    }
+
+
+def orm_benchmarks(app):
+    """Name -> callable for the ORM primitives"""
+    equipment_model = app.env['equipment']
+    request_model = app.env['maintenance.request']
+    equipment_ids = [record['id'] for record in equipment_model.search([], limit=100)]
+    request_ids = [record['id'] for record in request_model.search([], limit=100)]
+    total = request_model.search_count([])
+    today = datetime.now()
+    month_start = f"{today.year:04d}-{today.month:02d}-01"
+    month_end = f"{today.year + today.month // 12:04d}-{today.month % 12 + 1:02d}-01"
+    counter = iter(range(sys.maxsize))
+    
+    def create_and_flush():
+        request_model.create({
+            'subject': f"Benchmark request {next(counter)}",
+            'equipment_id': equipment_ids[0],
+            'request_type': 'corrective',
+            'scheduled_date': today.strftime('%Y-%m-%d'),
+        })
+        app.env.flush()
+    
+    def create_multi_and_flush():
+        # One request for each of the first 100 equipment, in one batch
+        request_model.create_multi([{
+            'subject': f"Benchmark request {next(counter)}",
+            'equipment_id': equipment_id,
+            'request_type': 'corrective',
+            'scheduled_date': today.strftime('%Y-%m-%d'),
+        } for equipment_id in equipment_ids])
+        app.env.flush()
+    
+    return {
+        'search_by_state': lambda: request_model.search([('state', '=', 'new')]),
+        'search_by_equipment': lambda: request_model.search([('equipment_id', '=', equipment_ids[0])]),
+        'search_unindexed': lambda: request_model.search([('duration', '>', 7.5)]),
+        'search_date_range': lambda: request_model.search_date_range(month_start, month_end),
+        'search_ordered_page': lambda: request_model.search([], order='scheduled_date desc', limit=50),
+        'search_deep_offset': lambda: request_model.search([], limit=50, offset=total // 2),
+        'search_count_open': lambda: request_model.search_count([('state', 'in', ['new', 'in_progress'])]),
+        'read_group_by_equipment': lambda: request_model.read_group([], 'equipment_id'),
+        'browse_100': lambda: request_model.browse(request_ids),
+        'equipment_read_10': lambda: equipment_model.read(equipment_ids[:10]),
+        'write_one': lambda: request_model.write(
+            [request_ids[0]], {'description': f"Benchmark write {next(counter)}"}
+        ),
+        'compute_health_score': lambda: equipment_model._compute_health_score(equipment_ids[0]),
+        'compute_health_scores_100': lambda: equipment_model._compute_health_scores(equipment_ids),
+        'create_and_flush': create_and_flush,
+        'create_multi_100_and_flush': create_multi_and_flush,
+    }
+
+
+def dashboard_benchmarks(app):
+    """Name -> callable for every Dashboard method, plus the cached full dashboard"""
+    dashboard = app.env['dashboard']
+    benchmarks = {name: getattr(dashboard, name) for name in DASHBOARD_METHODS}
+    benchmarks['get_dashboard_data'] = app.get_dashboard_data
+    return benchmarks
+
+
+def route_benchmarks(app):
+    """Name -> callable requesting each main page through the Flask test client"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import web_app
+    # Serve the synthetic fleet instead of the demo data
+    web_app.gear_app.overdue_sweeper.stop()
+    web_app.gear_app = app
+    client = web_app.app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    
+    equipment_id = app.env['equipment'].search([], limit=1)[0]['id']
+    request_id = app.env['maintenance.request'].search([], limit=1)[0]['id']
+    
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+    
+    benchmarks = {}
+    for name, url in ROUTES.items():
+        url = url.replace('<equipment>', str(equipment_id)).replace('<request>', str(request_id))
+        benchmarks[name] = lambda url=url: get(url)
+    return benchmarks
+
+
+def make_app(storage, workdir, size):
+    """Fresh application on the chosen storage backend"""
+    if storage == 'sqlite':
+        from database import Database
+        from models.storage import sqlite_storage_factory
+        database = Database(db_path=os.path.join(workdir, f"benchmark-{size}.db"))
+        return GearGuardApp(storage_factory=sqlite_storage_factory(database))
+    if storage == 'compact':
+        from models.storage import compact_storage_factory
+        return GearGuardApp(storage_factory=compact_storage_factory)
+    return GearGuardApp()
+
+
+def run_size(size, storage, workdir, repeat, seed, routes=True, analytics=True):
+    """Generate a fleet of size requests and time every benchmark on it"""
+    app = make_app(storage, workdir, size)
+    if not analytics:
+        app.env.analytics = None  # Dashboard on model queries
+    counts = fleet_counts(size)
+    
+    start = time.perf_counter()
+    generate_fleet(app, seed=seed, **counts)
+    generate_seconds = time.perf_counter() - start
+    
+    # First read computes every stored computed field of the new records
+    start = time.perf_counter()
+    app.env.flush()
+    flush_seconds = time.perf_counter() - start
+    
+    groups = [('orm', orm_benchmarks(app)), ('dashboard', dashboard_benchmarks(app))]
+    if routes:
+        groups.append(('route', route_benchmarks(app)))
+    
+    results = {}
+    for group, benchmarks in groups:
+        for name, func in benchmarks.items():
+            timing = results[f"{group}.{name}"] = time_call(func, repeat)
+            print(f"  {group + '.' + name:<40} {timing['median_ms']:>12.3f} ms")
+    
+    return {
+        'size': size,
+        'storage': storage,
+        'analytics': app.env.analytics is not None,
+        'counts': counts,
+        'generate_seconds': round(generate_seconds, 3),
+        'first_flush_seconds': round(flush_seconds, 3),
+        'results': results,
+    }
+
+
+def resident_memory():
+    """Resident set size of this process in bytes, or None where unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    # Peak rather than current size: kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure_memory(size, storage, workdir, seed):
+    """Resident memory taken by a flushed fleet of size requests, in this process"""
+    gc.collect()
+    before = resident_memory()
+    app = make_app(storage, workdir, size)
+    generate_fleet(app, seed=seed, **fleet_counts(size))
+    app.env.flush()
+    gc.collect()
+    after = resident_memory()
+    if before is None or after is None:
+        raise RuntimeError('resident memory is not available on this platform')
+    return {
+        'size': size,
+        'storage': storage,
+        'resident_mb': round((after - before) / 2 ** 20, 1),
+        'bytes_per_request': round((after - before) / size),
+    }
+
+
+def memory_benchmark(size, storage, seed):
+    """measure_memory() in a fresh interpreter, so earlier fleets do not skew it"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure-memory',
+         '--sizes', str(size), '--storage', storage, '--seed', str(seed)],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(report, baseline):
+    """Print median-time and memory ratios against a previous report"""
+    previous = {(run['size'], run.get('storage', baseline.get('storage'))): run['results']
+                for run in baseline.get('runs', [])}
+    for run in report['runs']:
+        before = previous.get((run['size'], run['storage']))
+        if not before:
+            continue
+        print(f"\nSize {run['size']} ({run['storage']}) vs baseline (median, lower is better)")
+        for name, timing in run['results'].items():
+            if name in before and before[name]['median_ms']:
+                ratio = timing['median_ms'] / before[name]['median_ms']
+                print(f"  {name:<40} {before[name]['median_ms']:>10.3f} -> "
+                      f"{timing['median_ms']:>10.3f} ms  x{ratio:.2f}")
+    
+    previous = {(entry['size'], entry['storage']): entry for entry in baseline.get('memory', [])}
+    for entry in report.get('memory', []):
+        before = previous.get((entry['size'], entry['storage']))
+        if before and before['resident_mb']:
+            print(f"  memory {entry['size']} ({entry['storage']}){'':<20} "
+                  f"{before['resident_mb']:>10.1f} -> {entry['resident_mb']:>10.1f} MB  "
+                  f"x{entry['resident_mb'] / before['resident_mb']:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark GearGuard+ on synthetic fleets')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='maintenance requests per fleet (default: 1k 10k 100k 1M)')
+    parser.add_argument('--storage', choices=('memory', 'compact', 'sqlite'), nargs='+',
+                        default=['memory'], help='storage backends to run (default: memory)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-routes', action='store_true', help='skip the Flask routes')
+    parser.add_argument('--no-analytics', action='store_true',
+                        help='answer the dashboard with model queries, not the NumPy engine')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure resident memory per fleet instead of timing')
+    parser.add_argument('--measure-memory', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    args = parser.parse_args(argv)
+    
+    if args.measure_memory:
+        # Child process of memory_benchmark(): one fleet, result as JSON
+        with tempfile.TemporaryDirectory() as workdir:
+            print(json.dumps(measure_memory(args.sizes[0], args.storage[0], workdir, args.seed)))
+        return
+    
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'runs': [],
+        'memory': [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for storage in args.storage:
+                if args.memory:
+                    entry = memory_benchmark(size, storage, args.seed)
+                    report['memory'].append(entry)
+                    print(f"Fleet with {size} requests ({storage}): {entry['resident_mb']:.1f} MB, "
+                          f"{entry['bytes_per_request']} bytes per request")
+                    continue
+                print(f"Fleet with {size} requests ({storage})")
+                report['runs'].append(run_size(
+                    size, storage, workdir, args.repeat, args.seed,
+                    routes=not args.no_routes, analytics=not args.no_analytics
+                ))
+    
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
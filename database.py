@@ -4,26 +4,91 @@ Using SQLite for simplicity and portability
 """
 import sqlite3
 import os
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
+from time import perf_counter
+
+from metrics import metrics
+
+
+class _ConnectionLease:
+    """Holds a thread's connection; hands it back to the pool when the thread ends"""
+    
+    def __init__(self, database, conn):
+        self.conn = conn
+        weakref.finalize(self, database._release_connection, conn)
 
 
 class Database:
-    """Database connection and management"""
+    """
+    Database connection and management
+    Each thread gets its own connection from a pool; in WAL mode readers
+    never wait for a writer and writers wait up to busy_timeout ms
+    """
     
-    def __init__(self, db_path='gearguard.db'):
+    def __init__(self, db_path='gearguard.db', journal_mode='WAL', synchronous='NORMAL',
+                 cache_size=-16000, mmap_size=256 * 1024 * 1024, busy_timeout=5000,
+                 max_idle_connections=8):
         self.db_path = db_path
-        self.conn = None
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = int(cache_size)    # Pages, or KiB when negative
+        self.mmap_size = int(mmap_size)      # Bytes, 0 disables memory mapping
+        self.busy_timeout = int(busy_timeout)  # Milliseconds
+        self.max_idle_connections = max_idle_connections
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._idle_connections = []
+        self._connections = set()
+        # An in-memory database exists per connection, so it is shared
+        self._shared_conn = None
         self._initialize_database()
     
+    @property
+    def conn(self):
+        """Connection for the calling thread"""
+        return self.get_connection()
+    
     def _initialize_database(self):
         """Initialize database and create tables"""
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        if self.db_path == ':memory:':
+            self._shared_conn = self._connect()
         self._create_tables()
     
+    def _connect(self):
+        """Open a connection with the configured pragmas"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        if self.db_path != ':memory:':
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        with self._pool_lock:
+            self._connections.add(conn)
+        return conn
+    
+    def _release_connection(self, conn):
+        """Return a connection from a finished thread to the idle pool"""
+        with self._pool_lock:
+            if conn not in self._connections:
+                return  # Already closed
+            if len(self._idle_connections) < self.max_idle_connections:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle_connections.append(conn)
+                return
+            self._connections.discard(conn)
+        conn.close()
+    
     def _create_tables(self):
         """Create all necessary tables"""
-        cursor = self.conn.cursor()
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
         # Users table
         cursor.execute('''
@@ -91,6 +156,8 @@ class Database:
                 is_scrapped INTEGER DEFAULT 0,
                 active INTEGER DEFAULT 1,
                 health_score INTEGER DEFAULT 100,
+                maintenance_requests_count INTEGER DEFAULT 0,
+                open_requests_count INTEGER DEFAULT 0,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (assigned_employee_id) REFERENCES employees(id),
                 FOREIGN KEY (maintenance_team_id) REFERENCES maintenance_teams(id)
@@ -119,48 +186,137 @@ class Database:
             )
         ''')
         
-        self.conn.commit()
+        conn.commit()
     
     def get_connection(self):
-        """Get database connection"""
-        if self.conn is None:
-            self._initialize_database()
-        return self.conn
+        """Get the calling thread's database connection"""
+        if self._shared_conn is not None:
+            return self._shared_conn
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            with self._pool_lock:
+                conn = self._idle_connections.pop() if self._idle_connections else None
+            lease = self._local.lease = _ConnectionLease(self, conn or self._connect())
+        return lease.conn
+    
+    def in_transaction(self):
+        """Whether the calling thread is inside a transaction() block"""
+        return getattr(self._local, 'transaction_depth', 0) > 0
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Run a unit of work with a single commit at the end
+        Statements executed inside the block are not committed one by one;
+        an exception rolls everything back. Nested blocks use savepoints.
+        """
+        conn = self.get_connection()
+        depth = getattr(self._local, 'transaction_depth', 0)
+        savepoint = f"gearguard_{depth}"
+        if depth == 0:
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')  # Take the write lock up front
+        else:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        self._local.transaction_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.transaction_depth = depth
+            if depth == 0:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._local.transaction_depth = depth
+        if depth == 0:
+            conn.commit()
+        else:
+            conn.execute(f"RELEASE {savepoint}")
     
     def execute(self, query, params=None):
-        """Execute a query"""
-        cursor = self.conn.cursor()
+        """Execute a query, committing unless inside a transaction"""
+        start = perf_counter()
+        conn = self.get_connection()
+        cursor = conn.cursor()
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
-        self.conn.commit()
+        if not self.in_transaction():
+            conn.commit()
+        metrics.observe('db', (('operation', 'execute'),), perf_counter() - start)
+        return cursor
+    
+    def executemany(self, query, seq_of_params):
+        """Execute a query for each parameter set, committing once"""
+        start = perf_counter()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(query, seq_of_params)
+        if not self.in_transaction():
+            conn.commit()
+        metrics.observe('db', (('operation', 'executemany'),), perf_counter() - start)
         return cursor
     
     def fetch_one(self, query, params=None):
         """Fetch one row"""
-        cursor = self.conn.cursor()
+        start = perf_counter()
+        cursor = self.get_connection().cursor()
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
         row = cursor.fetchone()
+        metrics.observe('db', (('operation', 'fetch_one'),), perf_counter() - start, 1 if row else 0)
         return dict(row) if row else None
     
     def fetch_all(self, query, params=None):
         """Fetch all rows"""
-        cursor = self.conn.cursor()
+        start = perf_counter()
+        cursor = self.get_connection().cursor()
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        rows = [dict(row) for row in cursor.fetchall()]
+        metrics.observe('db', (('operation', 'fetch_all'),), perf_counter() - start, len(rows))
+        return rows
+    
+    def fetch_batches(self, query, params=None, batch_size=500):
+        """Yield rows in batches of dicts without loading the full result"""
+        # Timed while fetching only, not while the caller works on a batch
+        start = perf_counter()
+        cursor = self.get_connection().cursor()
         if params:
             cursor.execute(query, params)
         else:
             cursor.execute(query)
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        elapsed = perf_counter() - start
+        fetched = 0
+        try:
+            while True:
+                start = perf_counter()
+                rows = [dict(row) for row in cursor.fetchmany(batch_size)]
+                elapsed += perf_counter() - start
+                if not rows:
+                    break
+                fetched += len(rows)
+                yield rows
+        finally:
+            metrics.observe('db', (('operation', 'fetch_batches'),), elapsed, fetched)
     
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Close all pooled database connections"""
+        with self._pool_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+            self._idle_connections.clear()
+        for conn in connections:
+            conn.close()
+        self._shared_conn = None
+        self._local = threading.local()
 
 
 # Global database instance
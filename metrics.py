@@ -0,0 +1,171 @@
+"""
+GearGuard+ Metrics
+Call counts, records touched and latency histograms for the hot paths
+(ORM, database, web requests), exported in Prometheus text format
+Set GEARGUARD_METRICS=0 to turn collection off.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+
+# Histogram upper bounds: latency in seconds, ORM operations per request
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OPERATION_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Subsystem -> (latency metric, HELP text, records metric, HELP text)
+SUBSYSTEMS = {
+    'orm': ('gearguard_orm_operation_seconds', 'ORM call latency',
+            'gearguard_orm_records_total', 'Records returned or written by ORM calls'),
+    'db': ('gearguard_db_query_seconds', 'Database call latency',
+           'gearguard_db_rows_total', 'Rows fetched by database calls'),
+    'http': ('gearguard_http_request_seconds', 'HTTP request latency', None, None),
+}
+REQUEST_OPERATIONS_METRIC = 'gearguard_http_request_orm_operations'
+
+
+class Histogram:
+    """Observation counts per upper bound, plus their sum and count"""
+    
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+    
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot: above every bound
+        self.sum = 0
+        self.count = 0
+    
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def samples(self):
+        """(le label, cumulative count) pairs, ending with +Inf"""
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            cumulative += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), cumulative
+
+
+class Metrics:
+    """
+    Process-wide metrics registry
+    Updates take one short lock; ORM calls made while a web request is
+    being served are also counted per request, per thread.
+    """
+    
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._latency = {}     # (subsystem, labels) -> Histogram
+        self._records = {}     # (subsystem, labels) -> records / rows
+        self._operations = {}  # route -> Histogram of ORM operations per request
+    
+    def observe(self, subsystem, labels, seconds, records=None):
+        """Record one call; labels is a tuple of (name, value) pairs"""
+        if not self.enabled:
+            return
+        key = (subsystem, labels)
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            if records is not None:
+                self._records[key] = self._records.get(key, 0) + records
+        if subsystem == 'orm':
+            operations = getattr(self._local, 'operations', None)
+            if operations is not None:
+                self._local.operations = operations + 1
+    
+    def begin_request(self):
+        """Start counting the calling thread's ORM operations"""
+        self._local.operations = 0
+    
+    def end_request(self):
+        """Stop counting; returns the ORM operations since begin_request()"""
+        operations = getattr(self._local, 'operations', None)
+        self._local.operations = None
+        return operations or 0
+    
+    def observe_request(self, route, method, status, seconds, operations):
+        """Record one served web request and the ORM operations it made"""
+        if not self.enabled:
+            return
+        route = route or 'unmatched'
+        self.observe('http', (('route', route), ('method', method), ('status', str(status))), seconds)
+        with self._lock:
+            histogram = self._operations.get(route)
+            if histogram is None:
+                histogram = self._operations[route] = Histogram(OPERATION_BUCKETS)
+            histogram.observe(operations)
+    
+    def reset(self):
+        """Forget everything collected so far"""
+        with self._lock:
+            self._latency.clear()
+            self._records.clear()
+            self._operations.clear()
+    
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            latency = {key: _copy(histogram) for key, histogram in self._latency.items()}
+            records = dict(self._records)
+            operations = {route: _copy(histogram) for route, histogram in self._operations.items()}
+        
+        lines = []
+        for subsystem, (name, help_text, records_name, records_help) in SUBSYSTEMS.items():
+            series = sorted((labels, histogram) for (kind, labels), histogram in latency.items()
+                            if kind == subsystem)
+            if series:
+                lines.extend(_render_histogram(name, help_text, series))
+            counters = sorted((labels, value) for (kind, labels), value in records.items()
+                              if kind == subsystem)
+            if counters:
+                lines.append(f"# HELP {records_name} {records_help}")
+                lines.append(f"# TYPE {records_name} counter")
+                for labels, value in counters:
+                    lines.append(f"{records_name}{_labels(labels)} {value}")
+        if operations:
+            lines.extend(_render_histogram(
+                REQUEST_OPERATIONS_METRIC, 'ORM operations per HTTP request',
+                sorted(((('route', route),), histogram) for route, histogram in operations.items())
+            ))
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.bounds)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
+
+
+def _labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _render_histogram(name, help_text, series):
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} histogram"
+    for labels, histogram in series:
+        for bound, count in histogram.samples():
+            yield f"{name}_bucket{_labels(labels, [('le', bound)])} {count}"
+        yield f"{name}_sum{_labels(labels)} {histogram.sum!r}"
+        yield f"{name}_count{_labels(labels)} {histogram.count}"
+
+
+# Global metrics registry
+metrics = Metrics(enabled=os.environ.get('GEARGUARD_METRICS', '1') != '0')
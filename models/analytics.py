@@ -0,0 +1,274 @@
+"""
+Columnar analytics engine
+NumPy column arrays of maintenance requests and equipment, so fleet-wide
+dashboard figures are vectorized masks and bincounts instead of loops over
+records. Optional: without NumPy (or with GEARGUARD_ANALYTICS=0) the
+Dashboard answers with model queries.
+"""
+import os
+import threading
+from itertools import islice
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+from .counters import SlidingWindowCounter
+from .maintenance_request import MaintenanceRequest
+
+
+ANALYTICS_ENABLED = np is not None and os.environ.get('GEARGUARD_ANALYTICS', '1') != '0'
+
+# Records converted per step when loading a whole model
+_LOAD_CHUNK_SIZE = 100000
+
+
+def _selection_codes(choices) -> Dict[str, int]:
+    """Selection value -> code; 0 stands for unset or unknown values"""
+    return {value: code for code, (value, _) in enumerate(choices, 1)}
+
+
+def _codes(records: List[Dict], field: str, codes: Dict[str, int]) -> List[int]:
+    return [codes.get(record.get(field), 0) for record in records]
+
+
+def _ids(records: List[Dict], field: str) -> List[int]:
+    """Many2one ids, 0 when unset"""
+    values = [record.get(field) for record in records]
+    return [value if value.__class__ is int and value > 0 else 0 for value in values]
+
+
+def _numbers(records: List[Dict], field: str) -> List[float]:
+    """Numeric values, NaN (never matching a comparison) when unset"""
+    values = [record.get(field) for record in records]
+    return [value if value.__class__ in (int, float) else float('nan') for value in values]
+
+
+def _day_ordinals(records: List[Dict], field: str) -> List[int]:
+    """Day of date / datetime values as a proleptic ordinal, 0 when unset"""
+    values = [record.get(field) for record in records]
+    return [value.toordinal() if value else 0 for value in values]
+
+
+class _ColumnTable:
+    """Columns of one model as NumPy arrays indexed by id - 1, with a liveness mask"""
+    
+    def __init__(self, dtypes: Dict[str, str]):
+        self.alive = np.zeros(0, dtype=bool)
+        self.columns = {name: np.zeros(0, dtype=dtype) for name, dtype in dtypes.items()}
+    
+    def _reserve(self, max_id: int):
+        capacity = len(self.alive)
+        if max_id <= capacity:
+            return
+        capacity = max(max_id, 2 * capacity)
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), bool)])
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate(
+                [column, np.zeros(capacity - len(column), column.dtype)]
+            )
+    
+    def assign(self, ids: List[int], values: Dict[str, List]):
+        """Store the column values of records ids"""
+        self._reserve(max(ids))
+        positions = np.array(ids, dtype=np.int64) - 1
+        self.alive[positions] = True
+        for name, column_values in values.items():
+            self.columns[name][positions] = column_values
+    
+    def discard(self, ids: List[int]):
+        """Drop deleted records"""
+        positions = np.array([i for i in ids if 0 < i <= len(self.alive)], dtype=np.int64) - 1
+        self.alive[positions] = False
+
+
+class AnalyticsEngine:
+    """
+    Dashboard figures over NumPy columns of requests and equipment
+    A model's columns are loaded on first use. Afterwards model writes only
+    mark ids stale (see BaseModel._notify_analytics); the next query
+    reloads those records in one batch, after flushing computed fields.
+    """
+    
+    STATE_CODES = _selection_codes(MaintenanceRequest.STATES)
+    TYPE_CODES = _selection_codes(MaintenanceRequest.REQUEST_TYPES)
+    
+    # Model -> column -> dtype
+    TABLES = {
+        'maintenance.request': {
+            'state': 'int8',
+            'request_type': 'int8',
+            'equipment_id': 'int64',
+            'maintenance_team_id': 'int64',
+            'technician_id': 'int64',
+            'is_overdue': 'bool',
+            'create_day': 'int32',
+        },
+        'equipment': {
+            'in_service': 'bool',
+            'health_score': 'float64',
+        },
+    }
+    # Model -> record fields the columns are derived from
+    FIELDS = {
+        'maintenance.request': {'state', 'request_type', 'equipment_id', 'maintenance_team_id',
+                                'technician_id', 'is_overdue', 'create_date'},
+        'equipment': {'is_scrapped', 'active', 'health_score'},
+    }
+    
+    def __init__(self, env):
+        self.env = env
+        self._lock = threading.RLock()        # Loading, refreshing and querying
+        self._stale_lock = threading.Lock()
+        self._tables = {}  # Model name -> _ColumnTable, once loaded
+        self._stale = {}   # Model name -> ids written since the last refresh
+    
+    def mark_stale(self, model_name: str, ids: List[int]):
+        """Note written or deleted records of a loaded model"""
+        if model_name in self._stale:
+            with self._stale_lock:
+                self._stale[model_name].update(ids)
+    
+    # Loading
+    
+    def _columns(self, model_name: str, records: List[Dict]) -> Dict[str, List]:
+        """Column values of records"""
+        if model_name == 'equipment':
+            return {
+                # Matches the ('is_scrapped', '=', False), ('active', '=', True) domain
+                'in_service': [record.get('is_scrapped') == False and record.get('active') == True
+                               for record in records],
+                'health_score': _numbers(records, 'health_score'),
+            }
+        return {
+            'state': _codes(records, 'state', self.STATE_CODES),
+            'request_type': _codes(records, 'request_type', self.TYPE_CODES),
+            'equipment_id': _ids(records, 'equipment_id'),
+            'maintenance_team_id': _ids(records, 'maintenance_team_id'),
+            'technician_id': _ids(records, 'technician_id'),
+            'is_overdue': [record.get('is_overdue') == True for record in records],
+            'create_day': _day_ordinals(records, 'create_date'),
+        }
+    
+    def _table(self, model_name: str) -> '_ColumnTable':
+        """A model's columns, loaded or brought up to date (caller holds _lock)"""
+        model = self.env[model_name]
+        model._flush()
+        table = self._tables.get(model_name)
+        if table is None:
+            # Writes made while loading are replayed by the next refresh
+            with self._stale_lock:
+                self._stale[model_name] = set()
+            table = _ColumnTable(self.TABLES[model_name])
+            records = iter(model._storage.scan(None, self.FIELDS[model_name]))
+            while True:
+                chunk = list(islice(records, _LOAD_CHUNK_SIZE))
+                if not chunk:
+                    break
+                table.assign([record['id'] for record in chunk], self._columns(model_name, chunk))
+            self._tables[model_name] = table
+            return table
+        
+        with self._stale_lock:
+            stale = self._stale[model_name]
+            self._stale[model_name] = set()
+        if stale:
+            records = model._storage.get_many(sorted(stale))
+            if records:
+                table.assign([record['id'] for record in records],
+                             self._columns(model_name, records))
+            if len(records) < len(stale):
+                table.discard(list(stale.difference(record['id'] for record in records)))
+        return table
+    
+    # Queries
+    
+    def _state_mask(self, table: '_ColumnTable', states) -> 'np.ndarray':
+        codes = [self.STATE_CODES[state] for state in states if state in self.STATE_CODES]
+        return table.alive & np.isin(table.columns['state'], codes)
+    
+    def kpis(self, critical_health: int) -> Dict[str, int]:
+        """Equipment in service, open and overdue requests, critical equipment"""
+        with self._lock:
+            requests = self._table('maintenance.request')
+            equipment = self._table('equipment')
+            in_service = equipment.alive & equipment.columns['in_service']
+            return {
+                'total_equipment': int(np.count_nonzero(in_service)),
+                'open_requests': int(np.count_nonzero(
+                    self._state_mask(requests, MaintenanceRequest.OPEN_STATES)
+                )),
+                'overdue_requests': int(np.count_nonzero(
+                    requests.alive & requests.columns['is_overdue']
+                )),
+                'critical_equipment': int(np.count_nonzero(
+                    in_service & (equipment.columns['health_score'] < critical_health)
+                )),
+            }
+    
+    def request_counts(self, field: str, states=None) -> Dict:
+        """
+        Requests per value of a many2one or selection field, optionally
+        only in the given states; unset values are left out
+        """
+        with self._lock:
+            table = self._table('maintenance.request')
+            mask = table.alive if states is None else self._state_mask(table, states)
+            counts = np.bincount(table.columns[field][mask])
+        values = np.flatnonzero(counts)
+        values = values[values > 0]
+        result = dict(zip(values.tolist(), counts[values].tolist()))
+        codes = {'state': self.STATE_CODES, 'request_type': self.TYPE_CODES}.get(field)
+        if codes is not None:
+            names = {code: value for value, code in codes.items()}
+            result = {names[code]: count for code, count in result.items()}
+        return result
+    
+    def _breakdown_counts(self, days: int) -> 'np.ndarray':
+        """Corrective breakdowns in the last days, indexed by equipment id (caller holds _lock)"""
+        cutoff = SlidingWindowCounter.cutoff(days, self.env.today()).toordinal()
+        table = self._table('maintenance.request')
+        columns = table.columns
+        mask = (self._state_mask(table, MaintenanceRequest.BREAKDOWN_STATES)
+                & (columns['request_type'] == self.TYPE_CODES['corrective'])
+                & (columns['create_day'] >= cutoff))
+        return np.bincount(columns['equipment_id'][mask])
+    
+    def breakdown_counts(self, days: int) -> Dict[int, int]:
+        """Corrective breakdowns per equipment in the last days, for equipment with any"""
+        with self._lock:
+            counts = self._breakdown_counts(days)
+        ids = np.flatnonzero(counts)
+        ids = ids[ids > 0]
+        return dict(zip(ids.tolist(), counts[ids].tolist()))
+    
+    def critical_equipment_ids(self, critical_health: int, limit: int) -> List[int]:
+        """Ids of in-service equipment below critical_health, lowest health first"""
+        with self._lock:
+            table = self._table('equipment')
+            health = table.columns['health_score']
+            positions = np.flatnonzero(
+                table.alive & table.columns['in_service'] & (health < critical_health)
+            )
+            # Stable: equal scores stay in id order
+            ranked = positions[np.argsort(health[positions], kind='stable')[:limit]]
+        return (ranked + 1).tolist()
+    
+    def alert_equipment(self, critical_health: int, breakdowns: int, days: int) -> Dict[int, int]:
+        """
+        {equipment id: breakdowns in the last days} for in-service equipment
+        below critical_health or with at least breakdowns breakdowns, by id
+        """
+        with self._lock:
+            counts = self._breakdown_counts(days)
+            table = self._table('equipment')
+            # Breakdowns per table position (id - 1)
+            per_position = np.zeros(len(table.alive), dtype=np.int64)
+            available = min(len(per_position), max(len(counts) - 1, 0))
+            per_position[:available] = counts[1:available + 1]
+            positions = np.flatnonzero(table.alive & table.columns['in_service'] & (
+                (table.columns['health_score'] < critical_health) | (per_position >= breakdowns)
+            ))
+        return dict(zip((positions + 1).tolist(), per_position[positions].tolist()))
@@ -1,9 +1,77 @@
 """
 Base model classes following Odoo-style ORM patterns
 """
-from datetime import datetime, timedelta
+from datetime import date
+from functools import wraps
+from itertools import count
+from time import perf_counter
 from typing import Any, Dict, List, Optional
 
+from metrics import metrics
+from .dates import PARSERS
+from .domain import compile_domain
+from .storage import MemoryStorage
+
+
+_version_counter = count(1)
+
+# Dirty records recomputed per batch, bounding the copies storages that
+# build records on read (CompactStorage, SQLiteStorage) hold at once
+FLUSH_BATCH_SIZE = 10000
+
+
+def get_data_version() -> int:
+    """Global data version, bumped by every create/write/unlink on any model"""
+    return BaseModel._data_version
+
+
+def computed_field(name: str, depends=(), related=()):
+    """
+    Declare the batch compute method of a stored computed field
+    depends: fields of the same record the value is derived from
+    related: (model name, link field, fields) triples for records of another
+             model pointing at this one, e.g.
+             ('maintenance.request', 'equipment_id', ['state'])
+    The method receives a list of ids and returns {id: value}. Values are
+    stored on the records and recomputed in batch on the next read after
+    one of their dependencies changed.
+    """
+    def decorator(method):
+        method._computed_field = (
+            name,
+            frozenset(depends),
+            tuple((model, link, frozenset(fields)) for model, link, fields in related),
+        )
+        return method
+    return decorator
+
+
+def instrumented(operation: str, records=None):
+    """
+    Record calls of a model method in the metrics registry
+    records: 'result' counts the returned records, 'ids' the ids passed
+             in, an int a fixed number per call
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not metrics.enabled:
+                return method(self, *args, **kwargs)
+            start = perf_counter()
+            result = method(self, *args, **kwargs)
+            if records == 'result':
+                touched = len(result)
+            elif records == 'ids':
+                ids = args[0] if args else kwargs['ids']
+                touched = 1 if isinstance(ids, int) else len(ids)
+            else:
+                touched = records
+            metrics.observe('orm', (('model', self._name), ('operation', operation)),
+                            perf_counter() - start, touched)
+            return result
+        return wrapper
+    return decorator
+
 
 class BaseModel:
     """
@@ -11,94 +79,318 @@ class BaseModel:
     Provides common methods for all models
     """
     
+    _data_version = 0
+    
+    # Hash indexes used by search() for '=' and 'in' conditions.
+    # Each entry is a field name or a tuple of field names (composite index).
+    _indexes = ()
+    
+    # Sorted indexes used by search() for '<', '<=', '>' and '>=' conditions
+    _range_indexes = ()
+    
+    # Persistence mapping used by SQL storage backends (see models/storage.py)
+    _table = None      # Table created in database.py
+    _columns = {}      # Persisted field -> Python type (date / datetime
+                       # fields are parsed from strings, see models/dates.py)
+    _many2many = {}    # Field -> (relation table, own column, related column)
+    
+    # Low-cardinality fields CompactStorage keeps as small codes
+    _coded_fields = ()
+    
+    # Stored computed fields: name -> (method name, depends, related),
+    # collected from @computed_field methods
+    _computed_fields = {}
+    
+    # Date and datetime fields -> parser, derived from _columns
+    _parsers = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._parsers = {
+            field: PARSERS[field_type] for field, field_type in cls._columns.items()
+            if field_type in PARSERS
+        }
+        cls._computed_fields = {}
+        for attr in dir(cls):
+            spec = getattr(getattr(cls, attr, None), '_computed_field', None)
+            if spec:
+                name, depends, related = spec
+                cls._computed_fields[name] = (attr, depends, related)
+    
     def __init__(self, env=None):
         self.env = env or {}
         self._name = self.__class__.__name__.lower()
-        self._records = []
-        self._next_id = 1
+        self._storage = self._make_storage()
+        self._dirty = {}         # Computed field -> ids awaiting recompute
+        self._dependents = None  # Computed fields of other models fed by this one
+        self._flushing = False
+    
+    def _make_storage(self):
+        """Storage backend from the environment's factory, in memory by default"""
+        factory = getattr(self.env, 'storage_factory', None)
+        storage = factory(self) if factory else None
+        return storage or MemoryStorage(self._indexes, self._range_indexes)
+    
+    @property
+    def _records(self):
+        """All records in creation order"""
+        self._flush()
+        return self._storage.records
     
     def create(self, vals: Dict[str, Any]) -> 'BaseModel':
         """Create a new record"""
-        record = {
-            'id': self._next_id,
-            **vals
-        }
-        self._next_id += 1
-        self._records.append(record)
+        self.create_multi([vals])
         return self
     
-    def search(self, domain: List = None) -> List[Dict]:
-        """Search records based on domain"""
-        if domain is None:
-            return self._records.copy()
+    @instrumented('create', records='result')
+    def create_multi(self, vals_list: List[Dict[str, Any]]) -> List[int]:
+        """
+        Create records in one batch and return their ids, in order
+        Models apply their defaults here (override this, not create).
+        Computed fields of the new records and of the records they point
+        at are marked dirty once for the batch, so each is recomputed once
+        on the next read.
+        """
+        records = self._storage.insert_many([self._parse_vals(vals) for vals in vals_list])
+        if not records:
+            return []
+        ids = [record['id'] for record in records]
+        for field in self._computed_fields:
+            self._mark_dirty(field, ids)
+        self._mark_dependents_dirty(records)
+        self._on_created(records)
+        self._notify_analytics(ids)
+        self._bump_version()
+        return ids
+    
+    def _on_created(self, records: List[Dict[str, Any]]):
+        """Hook for models keeping derived structures in step with inserts"""
+    
+    @instrumented('search', records='result')
+    def search(self, domain: List = None, limit: int = None, offset: int = 0,
+               after_id: int = None, order: str = None) -> List[Dict]:
+        """
+        Search records based on domain
+        limit/offset select a page of the matches; after_id starts after
+        that record instead (keyset pagination, no skipped rows to scan).
+        order sorts by 'field [asc|desc], ...' (unset values last, ties by
+        id) instead of creation order; with a limit only the top matches
+        are kept, using a range index on the field when declared.
+        """
+        if after_id:
+            domain = list(domain or []) + [('id', '>', after_id)]
+        domain = self._parse_domain(domain)
+        self._flush()
+        return self._storage.search(domain, limit=limit, offset=offset,
+                                    order=self._parse_order(order) if order else None)
+    
+    @staticmethod
+    def _parse_order(order: str) -> tuple:
+        """'field1 desc, field2' -> (('field1', True), ('field2', False))"""
+        terms = []
+        for term in order.split(','):
+            parts = term.split()
+            if not parts:
+                continue
+            direction = parts[1].lower() if len(parts) > 1 else 'asc'
+            if len(parts) > 2 or direction not in ('asc', 'desc'):
+                raise ValueError(f"Invalid order term: {term.strip()!r}")
+            terms.append((parts[0], direction == 'desc'))
+        return tuple(terms)
+    
+    @instrumented('search_count')
+    def search_count(self, domain: List = None) -> int:
+        """Count records matching domain without building the result list"""
+        domain = self._parse_domain(domain)
+        self._flush()
+        return self._storage.count(domain or None)
+    
+    @instrumented('read_group', records='result')
+    def read_group(self, domain: List, groupby, aggregates: List[str] = None) -> List[Dict]:
+        """
+        Group records matching domain in a single pass
+        groupby: field name or list of field names
+        aggregates: 'field' or 'field:func' entries, func in sum/min/max/avg
+        Returns one dict per group with the groupby values, '__count' and
+        each aggregate keyed by its spec, in order of first appearance
+        """
+        groupby = [groupby] if isinstance(groupby, str) else list(groupby)
+        specs = []
+        for spec in aggregates or []:
+            field, _, func = spec.partition(':')
+            func = func or 'sum'
+            if func not in ('sum', 'min', 'max', 'avg'):
+                raise ValueError(f"Unsupported aggregate function: {func}")
+            specs.append((spec, field, func))
         
-        results = []
-        for record in self._records:
-            if self._match_domain(record, domain):
-                results.append(record)
-        return results
+        domain = self._parse_domain(domain)
+        self._flush()
+        return self._storage.read_group(domain or None, groupby, specs)
     
+    @instrumented('browse', records='result')
     def browse(self, ids: List[int]) -> List[Dict]:
         """Browse records by IDs"""
         if isinstance(ids, int):
             ids = [ids]
-        return [r for r in self._records if r.get('id') in ids]
+        self._flush()
+        # Records come back in creation order, duplicates and unknown ids
+        # are dropped
+        return self._storage.get_many(ids)
     
+    @instrumented('write', records='ids')
     def write(self, ids: List[int], vals: Dict[str, Any]) -> bool:
         """Update records"""
         if isinstance(ids, int):
             ids = [ids]
-        for record in self._records:
-            if record.get('id') in ids:
-                record.update(vals)
+        vals = self._parse_vals(vals)
+        dependents = self._get_dependents(vals)
+        # Link values before the write, so old targets get recomputed too
+        before = self._storage.get_many(ids) if dependents else []
+        old_links = [{link: record.get(link) for _, _, link in dependents} for record in before]
+        
+        self._storage.update(ids, vals)
+        
+        for field, (_, depends, _) in self._computed_fields.items():
+            if depends.intersection(vals):
+                self._mark_dirty(field, ids)
+        if dependents:
+            self._mark_dependents_dirty(old_links, dependents)
+            self._mark_dependents_dirty(self._storage.get_many(ids), dependents)
+        self._forget_cached(ids)
+        self._notify_analytics(ids)
+        self._bump_version()
         return True
     
+    @instrumented('unlink', records='ids')
     def unlink(self, ids: List[int]) -> bool:
         """Delete records"""
         if isinstance(ids, int):
             ids = [ids]
-        self._records = [r for r in self._records if r.get('id') not in ids]
+        removed = self._storage.get_many(ids) if self._get_dependents() else []
+        if self._storage.delete(ids):
+            self._mark_dependents_dirty(removed)
+            self._forget_cached(ids)
+            self._notify_analytics(ids)
+            self._bump_version()
         return True
     
+    # Date fields
+    
+    def _parse_vals(self, vals: Dict[str, Any]) -> Dict[str, Any]:
+        """vals with date and datetime field values parsed, copied only when one changes"""
+        parsed = None
+        for field, parse in self._parsers.items():
+            if field in vals:
+                value = vals[field]
+                converted = parse(value)
+                if converted is not value:
+                    if parsed is None:
+                        parsed = dict(vals)
+                    parsed[field] = converted
+        return vals if parsed is None else parsed
+    
+    def _parse_domain(self, domain: Optional[List]) -> Optional[List]:
+        """domain with the values compared to date and datetime fields parsed"""
+        if not domain or not self._parsers:
+            return domain
+        parsed = []
+        for condition in domain:
+            if len(condition) == 3 and condition[0] in self._parsers:
+                field, operator, value = condition
+                parse = self._parsers[field]
+                if operator in ('in', 'not in'):
+                    value = [parse(v) for v in value]
+                else:
+                    value = parse(value)
+                condition = (field, operator, value)
+            parsed.append(condition)
+        return parsed
+    
+    def _today(self) -> date:
+        """Today's date, fixed for the environment's current request scope"""
+        get_today = getattr(self.env, 'today', None)
+        return get_today() if get_today else date.today()
+    
+    # Stored computed fields
+    
+    def _get_dependents(self, vals: Dict[str, Any] = None) -> List[tuple]:
+        """
+        (model, computed field, link field) entries of other models whose
+        computed fields depend on this model, restricted to those affected
+        by vals when given
+        """
+        if self._dependents is None:
+            self._dependents = []
+            models = getattr(self.env, 'models', None) or {}
+            for model in models.values():
+                for field, (_, _, related) in model._computed_fields.items():
+                    for model_name, link, fields in related:
+                        if model_name == self._name:
+                            self._dependents.append((model, field, link, fields))
+        if vals is None:
+            return [(model, field, link) for model, field, link, _ in self._dependents]
+        return [
+            (model, field, link) for model, field, link, fields in self._dependents
+            if link in vals or fields.intersection(vals)
+        ]
+    
+    def _mark_dependents_dirty(self, records: List[Dict], dependents: List[tuple] = None):
+        """Flag computed fields of the records these records point at"""
+        for model, field, link in (self._get_dependents() if dependents is None else dependents):
+            targets = {record.get(link) for record in records}
+            targets.discard(False)
+            targets.discard(None)
+            if targets:
+                model._mark_dirty(field, targets)
+    
+    def _mark_dirty(self, field: str, ids):
+        self._dirty.setdefault(field, set()).update(ids)
+    
+    def _flush(self):
+        """Recompute dirty stored computed fields in batch"""
+        if not self._dirty or self._flushing:
+            return
+        self._flushing = True
+        try:
+            while self._dirty:
+                field = next(iter(self._dirty))  # Declaration order
+                ids = sorted(self._dirty.pop(field))
+                for start in range(0, len(ids), FLUSH_BATCH_SIZE):
+                    self._recompute(field, ids[start:start + FLUSH_BATCH_SIZE])
+        finally:
+            self._flushing = False
+    
+    def _recompute(self, field: str, ids: List[int]):
+        """Recompute a stored computed field, writing the values that changed"""
+        records = self._storage.get_many(ids)
+        if not records:
+            return
+        method_name = self._computed_fields[field][0]
+        values = getattr(self, method_name)([record['id'] for record in records])
+        # Write changed values, one write per distinct value. Types
+        # are compared too, so an unset (False) counter gets its 0.
+        changed = {}
+        for record in records:
+            value = values.get(record['id'])
+            if (field not in record or record[field] != value
+                    or type(record[field]) is not type(value)):
+                changed.setdefault((type(value), value), []).append(record['id'])
+        for (_, value), value_ids in changed.items():
+            self.write(value_ids, {field: value})
+    
+    def _notify_analytics(self, ids: List[int]):
+        """Mark changed records stale in the environment's analytics engine"""
+        analytics = getattr(self.env, 'analytics', None)
+        if analytics is not None:
+            analytics.mark_stale(self._name, ids)
+    
+    def _bump_version(self):
+        """Signal a data change to version-keyed caches"""
+        BaseModel._data_version = next(_version_counter)
+    
     def _match_domain(self, record: Dict, domain: List) -> bool:
         """Match record against domain criteria"""
-        if not domain:
-            return True
-        
-        # Simple domain matching (field, operator, value)
-        for condition in domain:
-            if len(condition) != 3:
-                continue
-            field, operator, value = condition
-            
-            record_value = record.get(field)
-            
-            if operator == '=':
-                if record_value != value:
-                    return False
-            elif operator == '!=':
-                if record_value == value:
-                    return False
-            elif operator == 'in':
-                if record_value not in value:
-                    return False
-            elif operator == 'not in':
-                if record_value in value:
-                    return False
-            elif operator == '<':
-                if record_value >= value:
-                    return False
-            elif operator == '>':
-                if record_value <= value:
-                    return False
-            elif operator == '<=':
-                if record_value > value:
-                    return False
-            elif operator == '>=':
-                if record_value < value:
-                    return False
-        
-        return True
+        return compile_domain(domain)(record)
     
     def _compute_field(self, record: Dict, field_name: str, compute_func) -> Any:
         """Compute a field value"""
@@ -110,7 +402,58 @@ class BaseModel:
         if related_id and self.env:
             model = self.env.get(related_model)
             if model:
-                related_records = model.browse([related_id])
-                return related_records[0] if related_records else None
+                return model.browse_map([related_id]).get(related_id)
         return None
+    
+    def prefetch(self, records: List[Dict], field_name: str, related_model: str) -> Dict[int, Dict]:
+        """
+        Resolve a relational field for a whole result set at once
+        Works for many2one ids and many2many id lists; returns a
+        {related id: related record} map built with a single browse
+        """
+        related_ids = set()
+        for record in records:
+            value = record.get(field_name)
+            if isinstance(value, (list, tuple, set)):
+                related_ids.update(value)
+            elif value:
+                related_ids.add(value)
+        
+        model = self.env.get(related_model) if self.env else None
+        if not model or not related_ids:
+            return {}
+        return model.browse_map(related_ids)
+    
+    def browse_map(self, ids) -> Dict[int, Dict]:
+        """
+        Browse records into an {id: record} map
+        Inside a request scope, records are served from the environment's
+        identity map and only missing ids are loaded
+        """
+        identity_map = self._identity_map()
+        if identity_map is None:
+            return {record['id']: record for record in self.browse(list(ids))}
+        
+        missing = [i for i in ids if i not in identity_map]
+        if missing:
+            for record in self.browse(missing):
+                identity_map[record['id']] = record
+            for record_id in missing:
+                identity_map.setdefault(record_id, None)  # Remember unknown ids
+        return {i: identity_map[i] for i in ids if identity_map[i] is not None}
+    
+    def _identity_map(self) -> Optional[Dict[int, Dict]]:
+        """This model's slice of the request-scoped identity map, if any"""
+        get_identity_map = getattr(self.env, 'get_identity_map', None)
+        identity_map = get_identity_map() if get_identity_map else None
+        if identity_map is None:
+            return None
+        return identity_map.setdefault(self._name, {})
+    
+    def _forget_cached(self, ids: List[int]):
+        """Drop changed records from the request-scoped identity map"""
+        identity_map = self._identity_map()
+        if identity_map:
+            for record_id in ids:
+                identity_map.pop(record_id, None)
 
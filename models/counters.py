@@ -0,0 +1,90 @@
+"""
+Sliding-window counters
+Per-key event counts bucketed by day, so "how many in the last N days"
+costs O(window) per key instead of a scan over the full history
+"""
+from datetime import date, timedelta
+from typing import Dict, Hashable, Iterable, Optional, Set
+
+
+class SlidingWindowCounter:
+    """
+    Day-bucketed event counts per key
+    Buckets older than retention_days expire as the window slides; any
+    window up to retention_days can be queried.
+    """
+    
+    def __init__(self, retention_days: int = 90):
+        self.retention_days = retention_days
+        self._buckets: Dict[Hashable, Dict[int, int]] = {}  # key -> {day ordinal: count}
+        self._horizon = None  # Ordinal of the oldest day kept, as of the last expiry
+    
+    @staticmethod
+    def cutoff(days: int, today: date = None) -> date:
+        """First day inside a window of days ending today"""
+        return (today or date.today()) - timedelta(days=days)
+    
+    def add(self, key: Hashable, when: Optional[date], amount: int = 1):
+        """Count an event for key on the day of when (a date or datetime)"""
+        if key is None or key is False or not when:
+            return
+        self._expire()
+        day = when.toordinal()
+        if day < self._horizon:
+            return  # Already outside every window
+        
+        buckets = self._buckets.setdefault(key, {})
+        count = buckets.get(day, 0) + amount
+        if count > 0:
+            buckets[day] = count
+        else:
+            buckets.pop(day, None)
+            if not buckets:
+                del self._buckets[key]
+    
+    def remove(self, key: Hashable, when: Optional[date]):
+        """Forget an event counted with add()"""
+        self.add(key, when, -1)
+    
+    def count(self, key: Hashable, days: int, today: date = None) -> int:
+        """Events for key in the last days"""
+        return self.counts(days, [key], today).get(key, 0)
+    
+    def counts(self, days: int, keys: Optional[Iterable[Hashable]] = None,
+               today: date = None) -> Dict[Hashable, int]:
+        """Non-zero event counts in the last days, for all keys or the given ones"""
+        if days > self.retention_days:
+            raise ValueError(
+                f"Window of {days} days exceeds the {self.retention_days}-day retention"
+            )
+        self._expire()
+        cutoff = self.cutoff(days, today).toordinal()
+        
+        result = {}
+        for key in (self._buckets if keys is None else keys):
+            buckets = self._buckets.get(key)
+            if buckets:
+                total = sum(count for day, count in buckets.items() if day >= cutoff)
+                if total:
+                    result[key] = total
+        return result
+    
+    def keys_between(self, start: date, end: date) -> Set[Hashable]:
+        """Keys with events on a day from start up to, not including, end"""
+        self._expire()
+        start, end = start.toordinal(), end.toordinal()
+        return {key for key, buckets in self._buckets.items()
+                if any(start <= day < end for day in buckets)}
+    
+    def _expire(self):
+        """Drop buckets that slid out of the retention window"""
+        horizon = self.cutoff(self.retention_days).toordinal()
+        if horizon == self._horizon:
+            return
+        self._horizon = horizon
+        for key in list(self._buckets):
+            buckets = self._buckets[key]
+            for day in [day for day in buckets if day < horizon]:
+                del buckets[day]
+            if not buckets:
+                del self._buckets[key]
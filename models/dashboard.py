@@ -2,17 +2,28 @@
 Management Dashboard Model
 KPIs, charts, and analytics for maintenance management
 """
-from datetime import datetime, timedelta
 from .base import BaseModel
 
 
 class Dashboard(BaseModel):
     """Dashboard with KPIs and analytics"""
     
+    # Rows shown in the dashboard's critical equipment list
+    CRITICAL_EQUIPMENT_LIMIT = 10
+    
+    # Alert thresholds
+    CRITICAL_HEALTH = 40        # Health scores below this are critical
+    ALERT_BREAKDOWNS = 3        # Corrective breakdowns that raise an alert...
+    ALERT_WINDOW_DAYS = 30      # ...within this many days
+    
     def __init__(self, env=None):
         super().__init__(env)
         self._name = 'dashboard'
     
+    def _analytics(self):
+        """The environment's columnar analytics engine, or None to query the models"""
+        return getattr(self.env, 'analytics', None)
+    
     def get_kpis(self):
         """Get key performance indicators"""
         if not self.env:
@@ -24,30 +35,30 @@ class Dashboard(BaseModel):
         if not equipment_model or not request_model:
             return {}
         
+        analytics = self._analytics()
+        if analytics is not None:
+            return analytics.kpis(self.CRITICAL_HEALTH)
+        
         # Total equipment (active, not scrapped)
-        total_equipment = len(equipment_model.search([
+        total_equipment = equipment_model.search_count([
             ('is_scrapped', '=', False),
             ('active', '=', True)
-        ]))
+        ])
         
         # Open requests
-        open_requests = len(request_model.search([
+        open_requests = request_model.search_count([
             ('state', 'in', ['new', 'in_progress'])
-        ]))
+        ])
         
-        # Overdue requests
-        today = datetime.now().strftime('%Y-%m-%d')
-        overdue_requests = len(request_model.search([
-            ('scheduled_date', '<', today),
-            ('state', 'in', ['new', 'in_progress'])
-        ]))
+        # Overdue requests (flag kept current by the overdue sweeper)
+        overdue_requests = request_model.search_count([('is_overdue', '=', True)])
         
-        # Equipment with critical health (< 40)
-        critical_equipment = len(equipment_model.search([
-            ('health_score', '<', 40),
+        # Equipment with critical health
+        critical_equipment = equipment_model.search_count([
+            ('health_score', '<', self.CRITICAL_HEALTH),
             ('is_scrapped', '=', False),
             ('active', '=', True)
-        ]))
+        ])
         
         return {
             'total_equipment': total_equipment,
@@ -65,17 +76,18 @@ class Dashboard(BaseModel):
         if not request_model:
             return {'preventive': 0, 'corrective': 0}
         
-        preventive = len(request_model.search([
-            ('request_type', '=', 'preventive')
-        ]))
-        
-        corrective = len(request_model.search([
-            ('request_type', '=', 'corrective')
-        ]))
+        analytics = self._analytics()
+        if analytics is not None:
+            counts = analytics.request_counts('request_type')
+        else:
+            counts = {
+                group['request_type']: group['__count']
+                for group in request_model.read_group([], 'request_type')
+            }
         
         return {
-            'preventive': preventive,
-            'corrective': corrective,
+            'preventive': counts.get('preventive', 0),
+            'corrective': counts.get('corrective', 0),
         }
     
     def get_requests_per_team(self):
@@ -90,15 +102,21 @@ class Dashboard(BaseModel):
             return []
         
         teams = team_model.search([])
+        analytics = self._analytics()
+        if analytics is not None:
+            counts = analytics.request_counts('maintenance_team_id')
+        else:
+            counts = {
+                group['maintenance_team_id']: group['__count']
+                for group in request_model.read_group([], 'maintenance_team_id')
+            }
         result = []
         
         for team in teams:
             team_id = team.get('id')
             team_name = team.get('name', 'Unknown')
             
-            request_count = len(request_model.search([
-                ('maintenance_team_id', '=', team_id)
-            ]))
+            request_count = counts.get(team_id, 0)
             
             result.append({
                 'team_id': team_id,
@@ -108,8 +126,37 @@ class Dashboard(BaseModel):
         
         return result
     
+    def get_critical_equipment(self, limit=None):
+        """Lowest-health active equipment below the critical threshold"""
+        if not self.env:
+            return []
+        
+        equipment_model = self.env.get('equipment')
+        if not equipment_model:
+            return []
+        
+        limit = limit or self.CRITICAL_EQUIPMENT_LIMIT
+        analytics = self._analytics()
+        if analytics is not None:
+            ranked_ids = analytics.critical_equipment_ids(self.CRITICAL_HEALTH, limit)
+            by_id = {equipment['id']: equipment for equipment in equipment_model.browse(ranked_ids)}
+            equipments = [by_id[equipment_id] for equipment_id in ranked_ids if equipment_id in by_id]
+        else:
+            equipments = equipment_model.search([
+                ('health_score', '<', self.CRITICAL_HEALTH),
+                ('is_scrapped', '=', False),
+                ('active', '=', True)
+            ], order='health_score asc', limit=limit)
+        
+        return [{
+            'equipment_id': equipment.get('id'),
+            'equipment_name': equipment.get('name', 'Unknown'),
+            'health_score': equipment.get('health_score', 100),
+            'open_requests_count': equipment.get('open_requests_count') or 0,
+        } for equipment in equipments]
+    
     def get_technician_workloads(self):
-        """Get workload distribution across technicians"""
+        """Get workload distribution across all technicians, busiest first"""
         if not self.env:
             return []
         
@@ -120,11 +167,21 @@ class Dashboard(BaseModel):
             return []
         
         technicians = employee_model.get_technicians()
+        analytics = self._analytics()
+        if analytics is not None:
+            workloads = analytics.request_counts('technician_id', states=['new', 'in_progress'])
+        else:
+            workloads = {
+                group['technician_id']: group['__count']
+                for group in request_model.read_group([
+                    ('state', 'in', ['new', 'in_progress'])
+                ], 'technician_id')
+            }
         result = []
         
         for technician in technicians:
             technician_id = technician.get('id')
-            workload = request_model.get_technician_workload(technician_id)
+            workload = workloads.get(technician_id, 0) if technician_id else 0
             
             result.append({
                 'technician_id': technician_id,
@@ -141,8 +198,8 @@ class Dashboard(BaseModel):
         """
         Get predictive maintenance alerts
         Triggers:
-        - 3+ corrective breakdowns in last 30 days
-        - Health score < 40
+        - ALERT_BREAKDOWNS+ corrective breakdowns in the last ALERT_WINDOW_DAYS days
+        - Health score below CRITICAL_HEALTH
         """
         if not self.env:
             return []
@@ -154,35 +211,39 @@ class Dashboard(BaseModel):
             return []
         
         alerts = []
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
-        # Get all active equipment
-        all_equipment = equipment_model.search([
-            ('is_scrapped', '=', False),
-            ('active', '=', True)
-        ])
+        analytics = self._analytics()
+        if analytics is not None:
+            # Only the equipment meeting a trigger, with its breakdowns
+            breakdown_counts = analytics.alert_equipment(
+                self.CRITICAL_HEALTH, self.ALERT_BREAKDOWNS, self.ALERT_WINDOW_DAYS
+            )
+            all_equipment = equipment_model.browse(list(breakdown_counts))
+        else:
+            # Recent corrective breakdowns per equipment, from sliding-window counters
+            breakdown_counts = request_model.get_breakdown_counts(days=self.ALERT_WINDOW_DAYS)
+            
+            # Get all active equipment
+            all_equipment = equipment_model.search([
+                ('is_scrapped', '=', False),
+                ('active', '=', True)
+            ])
         
         for equipment in all_equipment:
             equipment_id = equipment.get('id')
             equipment_name = equipment.get('name', 'Unknown')
             health_score = equipment.get('health_score', 100)
             
-            # Check breakdown count
-            breakdowns = request_model.search([
-                ('equipment_id', '=', equipment_id),
-                ('request_type', '=', 'corrective'),
-                ('create_date', '>=', thirty_days_ago),
-                ('state', 'in', ['repaired', 'scrap'])
-            ])
-            
-            breakdown_count = len(breakdowns)
+            breakdown_count = breakdown_counts.get(equipment_id, 0)
             
             # Generate alert if conditions met
             alert_reasons = []
-            if breakdown_count >= 3:
-                alert_reasons.append(f"{breakdown_count} corrective breakdowns in last 30 days")
+            if breakdown_count >= self.ALERT_BREAKDOWNS:
+                alert_reasons.append(
+                    f"{breakdown_count} corrective breakdowns in last {self.ALERT_WINDOW_DAYS} days"
+                )
             
-            if health_score < 40:
+            if health_score < self.CRITICAL_HEALTH:
                 alert_reasons.append(f"Health score critical: {health_score}/100")
             
             if alert_reasons:
@@ -192,7 +253,7 @@ class Dashboard(BaseModel):
                     'health_score': health_score,
                     'breakdown_count': breakdown_count,
                     'reasons': alert_reasons,
-                    'severity': 'critical' if health_score < 40 else 'warning',
+                    'severity': 'critical' if health_score < self.CRITICAL_HEALTH else 'warning',
                 })
         
         return alerts
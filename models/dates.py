@@ -0,0 +1,47 @@
+"""
+Date fields
+Fields declared as date or datetime in a model's _columns hold
+datetime.date / datetime.datetime values. Strings are parsed once at the
+model boundary (create, write and domain values), so comparisons, sorting
+and day windows never format or compare strings per record.
+"""
+from datetime import date, datetime, time
+from typing import Any
+
+
+def to_date(value: Any) -> Any:
+    """
+    date from a date, a datetime or a 'YYYY-MM-DD[ HH:MM:SS]' string
+    Unset values (False, None, '') stay unset; raises ValueError otherwise
+    """
+    if not value:
+        return None if value is None else False
+    if value.__class__ is date:
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    raise ValueError(f"Invalid date: {value!r}")
+
+
+def to_datetime(value: Any) -> Any:
+    """
+    datetime from a datetime, a date (midnight) or a 'YYYY-MM-DD[ HH:MM:SS]'
+    string; unset values (False, None, '') stay unset; raises ValueError otherwise
+    """
+    if not value:
+        return None if value is None else False
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time())
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    raise ValueError(f"Invalid datetime: {value!r}")
+
+
+# Declared field type -> parser applied at the model boundary
+PARSERS = {date: to_date, datetime: to_datetime}
@@ -0,0 +1,81 @@
+"""
+Domain compilation
+Turns Odoo-style domains into cached predicate functions
+"""
+from typing import Any, Callable, Dict, List
+
+
+# Rejection tests per domain operator; {field} is the record value and
+# {value} the bound domain value. Ordering operators never match unset
+# (False/None) values, mirroring SQL NULL semantics.
+_OPERATOR_TEMPLATES = {
+    '=': 'if {field} != {value}: return False',
+    '!=': 'if {field} == {value}: return False',
+    'in': 'if {field} not in {value}: return False',
+    'not in': 'if {field} in {value}: return False',
+    '<': 'x = {field}\nif x is None or x is False or not x < {value}: return False',
+    '>': 'x = {field}\nif x is None or x is False or not x > {value}: return False',
+    '<=': 'x = {field}\nif x is None or x is False or not x <= {value}: return False',
+    '>=': 'x = {field}\nif x is None or x is False or not x >= {value}: return False',
+}
+
+# Compiled predicate factories keyed by domain shape ((field, operator), ...)
+_predicate_factories: Dict[tuple, Callable] = {}
+_PREDICATE_CACHE_SIZE = 512
+
+
+def _match_all(record: Dict) -> bool:
+    return True
+
+
+def _build_predicate_factory(shape: tuple) -> Callable:
+    """Generate a function binding domain values into a record predicate"""
+    params = []
+    body = ['get = record.get']
+    for position, (field, operator) in enumerate(shape):
+        params.append(f'v{position}')
+        template = _OPERATOR_TEMPLATES.get(operator)
+        if template:  # Unknown operators are ignored, as before
+            body.extend(template.format(field=f'get({field!r})', value=f'v{position}').split('\n'))
+    body.append('return True')
+    
+    source = (
+        f"def factory({', '.join(params)}):\n"
+        f"    def predicate(record):\n"
+        + ''.join(f"        {line}\n" for line in body)
+        + "    return predicate\n"
+    )
+    namespace = {}
+    exec(source, namespace)
+    return namespace['factory']
+
+
+def _bind_value(operator: str, value: Any) -> Any:
+    """Prepare a domain value for the compiled predicate"""
+    if operator in ('in', 'not in'):
+        try:
+            return frozenset(value)
+        except TypeError:
+            return tuple(value)  # Unhashable members, fall back to a scan
+    return value
+
+
+def compile_domain(domain: List) -> Callable[[Dict], bool]:
+    """
+    Compile a domain into a single record predicate
+    Domains of the same shape share one generated function; only the
+    values are bound per call.
+    """
+    if not domain:
+        return _match_all
+    
+    conditions = [condition for condition in domain if len(condition) == 3]
+    shape = tuple((field, operator) for field, operator, _ in conditions)
+    
+    factory = _predicate_factories.get(shape)
+    if factory is None:
+        if len(_predicate_factories) >= _PREDICATE_CACHE_SIZE:
+            _predicate_factories.clear()
+        factory = _predicate_factories[shape] = _build_predicate_factory(shape)
+    
+    return factory(*(_bind_value(operator, value) for _, operator, value in conditions))
@@ -8,22 +8,38 @@ from .base import BaseModel
 class Employee(BaseModel):
     """Employee model for technicians and equipment assignees"""
     
+    _indexes = ('is_technician',)
+    
+    _table = 'employees'
+    _columns = {
+        'name': str,
+        'email': str,
+        'phone': str,
+        'department': str,
+        'is_technician': bool,
+        'active': bool,
+    }
+    _coded_fields = ('department',)
+    
     def __init__(self, env=None):
         super().__init__(env)
         self._name = 'employee'
     
-    def create(self, vals):
-        """Create employee with default values"""
-        defaults = {
-            'name': vals.get('name', ''),
-            'email': vals.get('email', ''),
-            'phone': vals.get('phone', ''),
-            'department': vals.get('department', ''),
-            'is_technician': vals.get('is_technician', False),
-            'active': vals.get('active', True),
-        }
-        defaults.update(vals)
-        return super().create(defaults)
+    def create_multi(self, vals_list):
+        """Create employees with default values"""
+        records = []
+        for vals in vals_list:
+            defaults = {
+                'name': vals.get('name', ''),
+                'email': vals.get('email', ''),
+                'phone': vals.get('phone', ''),
+                'department': vals.get('department', ''),
+                'is_technician': vals.get('is_technician', False),
+                'active': vals.get('active', True),
+            }
+            defaults.update(vals)
+            records.append(defaults)
+        return super().create_multi(records)
     
     def get_technicians(self):
         """Get all active technicians"""
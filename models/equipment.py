@@ -2,96 +2,183 @@
 Equipment / Asset Management Model
 Core model for tracking equipment with health scoring
 """
-from datetime import datetime, timedelta
-from .base import BaseModel
+from datetime import date
+
+from .base import BaseModel, computed_field
+from .counters import SlidingWindowCounter
 
 
 class Equipment(BaseModel):
     """Equipment model with health score computation"""
     
+    _indexes = ('maintenance_team_id',)
+    _range_indexes = ('health_score',)  # Critical / lowest-health lists
+    
+    _table = 'equipment'
+    _columns = {
+        'name': str,
+        'serial_number': str,
+        'department': str,
+        'location': str,
+        'assigned_employee_id': int,
+        'maintenance_team_id': int,
+        'purchase_date': date,
+        'warranty_end_date': date,
+        'is_scrapped': bool,
+        'active': bool,
+        'health_score': int,
+        'maintenance_requests_count': int,
+        'open_requests_count': int,
+    }
+    _coded_fields = ('department', 'location', 'maintenance_team_id', 'purchase_date',
+                     'warranty_end_date', 'health_score', 'maintenance_requests_count',
+                     'open_requests_count')
+    
+    HEALTH_BREAKDOWN_DAYS = 30  # Breakdowns in this window lower the health score
+    
     def __init__(self, env=None):
         super().__init__(env)
         self._name = 'equipment'
+        self._breakdown_cutoff = None  # Window start the stored health scores reflect
     
-    def create(self, vals):
+    def create_multi(self, vals_list):
         """Create equipment with computed health score"""
-        defaults = {
-            'name': vals.get('name', ''),
-            'serial_number': vals.get('serial_number', ''),
-            'department': vals.get('department', ''),
-            'assigned_employee_id': vals.get('assigned_employee_id', False),
-            'maintenance_team_id': vals.get('maintenance_team_id', False),
-            'purchase_date': vals.get('purchase_date', False),
-            'warranty_end_date': vals.get('warranty_end_date', False),
-            'location': vals.get('location', ''),
-            'is_scrapped': vals.get('is_scrapped', False),
-            'health_score': 100,  # Initial health score
-            'active': vals.get('active', True),
-        }
-        defaults.update(vals)
-        record = super().create(defaults)
-        # Compute initial health score
-        self._compute_health_score(record._records[-1]['id'])
-        return record
+        records = []
+        for vals in vals_list:
+            defaults = {
+                'name': vals.get('name', ''),
+                'serial_number': vals.get('serial_number', ''),
+                'department': vals.get('department', ''),
+                'assigned_employee_id': vals.get('assigned_employee_id', False),
+                'maintenance_team_id': vals.get('maintenance_team_id', False),
+                'purchase_date': vals.get('purchase_date', False),
+                'warranty_end_date': vals.get('warranty_end_date', False),
+                'location': vals.get('location', ''),
+                'is_scrapped': vals.get('is_scrapped', False),
+                'health_score': 100,  # Initial health score
+                'active': vals.get('active', True),
+            }
+            defaults.update(vals)
+            records.append(defaults)
+        # Health scores and request counters are computed in one batch on first read
+        return super().create_multi(records)
     
     def _compute_health_score(self, equipment_id):
-        """
-        Compute equipment health score (0-100)
-        Based on:
-        - Breakdown count (corrective maintenance requests)
-        - Overdue maintenance requests
-        - Recent maintenance frequency
-        """
+        """Recompute and store the health score of one equipment"""
         equipment = self.browse([equipment_id])
         if not equipment:
             return 0
         
-        equipment_record = equipment[0]
+        health_score = self._compute_health_scores([equipment_id])[equipment_id]
         
-        # Get maintenance request model
-        if not self.env:
-            return 100
+        # Update equipment record (unchanged scores keep caches valid)
+        if equipment[0].get('health_score') != health_score:
+            self.write([equipment_id], {'health_score': health_score})
         
-        request_model = self.env.get('maintenance.request')
+        return health_score
+    
+    @computed_field('health_score', related=[
+        ('maintenance.request', 'equipment_id',
+         ['request_type', 'create_date', 'state', 'is_overdue']),
+    ])
+    def _compute_health_scores(self, equipment_ids):
+        """
+        Compute equipment health scores (0-100)
+        Based on:
+        - Breakdown count (corrective maintenance requests)
+        - Overdue maintenance requests
+        - Recent maintenance frequency
+        """
+        request_model = self.env.get('maintenance.request') if self.env else None
         if not request_model:
-            return 100
+            return {equipment_id: 100 for equipment_id in equipment_ids}
         
         # Count corrective breakdowns in last 30 days
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        corrective_requests = request_model.search([
-            ('equipment_id', '=', equipment_id),
-            ('request_type', '=', 'corrective'),
-            ('create_date', '>=', thirty_days_ago),
-            ('state', 'in', ['repaired', 'scrap'])
-        ])
-        
-        breakdown_count = len(corrective_requests)
+        breakdown_counts = request_model.get_breakdown_counts(
+            equipment_ids, days=self.HEALTH_BREAKDOWN_DAYS
+        )
         
-        # Count overdue requests
-        today = datetime.now().strftime('%Y-%m-%d')
-        overdue_requests = request_model.search([
-            ('equipment_id', '=', equipment_id),
-            ('scheduled_date', '<', today),
-            ('state', 'in', ['new', 'in_progress'])
+        # Count overdue requests (flag kept current by the overdue sweeper)
+        overdue_counts = self._count_requests_by_equipment(request_model, [
+            ('equipment_id', 'in', equipment_ids),
+            ('is_overdue', '=', True)
         ])
         
-        overdue_count = len(overdue_requests)
-        
         # Calculate health score
         # Base score: 100
         # Penalty: -15 per breakdown in last 30 days
         # Penalty: -10 per overdue request
         # Minimum: 0
+        scores = {}
+        for equipment_id in equipment_ids:
+            health_score = 100
+            health_score -= (breakdown_counts.get(equipment_id, 0) * 15)
+            health_score -= (overdue_counts.get(equipment_id, 0) * 10)
+            scores[equipment_id] = max(0, min(100, health_score))
         
-        health_score = 100
-        health_score -= (breakdown_count * 15)
-        health_score -= (overdue_count * 10)
-        health_score = max(0, min(100, health_score))
+        return scores
+    
+    def expire_breakdowns(self):
+        """
+        Mark dirty the health scores of equipment whose breakdowns slid out
+        of the window since the last call, and return their ids
+        Request writes mark health scores dirty, but a breakdown ageing out
+        is no write: Environment.flush() and the overdue sweeper call this.
+        The first call also covers breakdowns that aged out before it, as
+        stored scores may predate a restart.
+        """
+        request_model = self.env.get('maintenance.request') if self.env else None
+        if not request_model:
+            return []
+        today = self._today()
+        cutoff = SlidingWindowCounter.cutoff(self.HEALTH_BREAKDOWN_DAYS, today)
+        previous, self._breakdown_cutoff = self._breakdown_cutoff, cutoff
+        if previous == cutoff:
+            return []
+        if previous is None:
+            previous = SlidingWindowCounter.cutoff(request_model.BREAKDOWN_RETENTION_DAYS, today)
+        start, end = min(previous, cutoff), max(previous, cutoff)
+        equipment_ids = sorted(request_model.get_breakdown_equipment_ids(start, end))
+        if equipment_ids:
+            self._mark_dirty('health_score', equipment_ids)
+        return equipment_ids
+    
+    @computed_field('maintenance_requests_count', related=[
+        ('maintenance.request', 'equipment_id', []),
+    ])
+    def _compute_maintenance_requests_count(self, equipment_ids):
+        """Stored count of all maintenance requests per equipment"""
+        request_model = self.env.get('maintenance.request') if self.env else None
+        if not request_model:
+            return {equipment_id: 0 for equipment_id in equipment_ids}
         
-        # Update equipment record
-        self.write([equipment_id], {'health_score': health_score})
+        counts = self._count_requests_by_equipment(request_model, [
+            ('equipment_id', 'in', equipment_ids)
+        ])
+        return {equipment_id: counts.get(equipment_id, 0) for equipment_id in equipment_ids}
+    
+    @computed_field('open_requests_count', related=[
+        ('maintenance.request', 'equipment_id', ['state']),
+    ])
+    def _compute_open_requests_count(self, equipment_ids):
+        """Stored count of open maintenance requests per equipment"""
+        request_model = self.env.get('maintenance.request') if self.env else None
+        if not request_model:
+            return {equipment_id: 0 for equipment_id in equipment_ids}
         
-        return health_score
+        counts = self._count_requests_by_equipment(request_model, [
+            ('equipment_id', 'in', equipment_ids),
+            ('state', 'in', ['new', 'in_progress'])
+        ])
+        return {equipment_id: counts.get(equipment_id, 0) for equipment_id in equipment_ids}
+    
+    @staticmethod
+    def _count_requests_by_equipment(request_model, domain):
+        """Map equipment id -> number of requests matching domain"""
+        return {
+            group['equipment_id']: group['__count']
+            for group in request_model.read_group(domain, 'equipment_id')
+        }
     
     def get_health_status(self, equipment_id):
         """Get health status category"""
@@ -110,28 +197,18 @@ class Equipment(BaseModel):
     
     def get_maintenance_requests_count(self, equipment_id):
         """Get count of maintenance requests for equipment"""
-        if not self.env:
-            return 0
-        
-        request_model = self.env.get('maintenance.request')
-        if not request_model:
-            return 0
-        
-        return len(request_model.search([('equipment_id', '=', equipment_id)]))
+        return self._get_stored_value(equipment_id, 'maintenance_requests_count')
     
     def get_open_requests_count(self, equipment_id):
         """Get count of open maintenance requests"""
-        if not self.env:
-            return 0
-        
-        request_model = self.env.get('maintenance.request')
-        if not request_model:
+        return self._get_stored_value(equipment_id, 'open_requests_count')
+    
+    def _get_stored_value(self, equipment_id, field):
+        """Read a stored computed counter, 0 for unknown equipment"""
+        equipment = self.browse([equipment_id])
+        if not equipment:
             return 0
-        
-        return len(request_model.search([
-            ('equipment_id', '=', equipment_id),
-            ('state', 'in', ['new', 'in_progress'])
-        ]))
+        return equipment[0].get(field) or 0
     
     def action_scrap(self, equipment_id):
         """Mark equipment as scrapped"""
@@ -156,22 +233,11 @@ class Equipment(BaseModel):
     
     def _get_maintenance_requests_count(self, equipment_id):
         """Computed field: count of all maintenance requests"""
-        requests = self._get_maintenance_requests_ids(equipment_id)
-        return len(requests)
+        return self.get_maintenance_requests_count(equipment_id)
     
     def _get_open_requests_count(self, equipment_id):
         """Computed field: count of open maintenance requests"""
-        if not self.env:
-            return 0
-        
-        request_model = self.env.get('maintenance.request')
-        if not request_model:
-            return 0
-        
-        return len(request_model.search([
-            ('equipment_id', '=', equipment_id),
-            ('state', 'in', ['new', 'in_progress'])
-        ]))
+        return self.get_open_requests_count(equipment_id)
     
     def read(self, ids, fields=None):
         """Override read to include computed fields"""
@@ -185,9 +251,7 @@ class Equipment(BaseModel):
             record_dict = record.copy()
             equip_id = record.get('id')
             
-            # Add computed fields
-            record_dict['maintenance_requests_count'] = self._get_maintenance_requests_count(equip_id)
-            record_dict['open_requests_count'] = self._get_open_requests_count(equip_id)
+            # Request counters are stored computed fields; add the one2many
             record_dict['maintenance_requests_ids'] = self._get_maintenance_requests_ids(equip_id)
             
             if fields:
@@ -2,8 +2,11 @@
 Maintenance Request Model
 Core workflow model for maintenance operations
 """
-from datetime import datetime, timedelta
-from .base import BaseModel
+import heapq
+from datetime import date, datetime
+from .base import BaseModel, computed_field
+from .counters import SlidingWindowCounter
+from .dates import to_datetime
 
 
 class MaintenanceRequest(BaseModel):
@@ -22,45 +25,103 @@ class MaintenanceRequest(BaseModel):
         ('corrective', 'Corrective'),
     ]
     
+    _indexes = (
+        'equipment_id',
+        'technician_id',
+        'maintenance_team_id',
+        'state',
+        'request_type',
+        'is_overdue',
+        ('equipment_id', 'state'),  # Open requests per equipment
+    )
+    _range_indexes = ('scheduled_date', 'repaired_date')  # Calendar lookups
+    
+    _table = 'maintenance_requests'
+    _columns = {
+        'subject': str,
+        'equipment_id': int,
+        'request_type': str,
+        'scheduled_date': date,
+        'repaired_date': date,
+        'technician_id': int,
+        'maintenance_team_id': int,
+        'duration': float,
+        'description': str,
+        'state': str,
+        'is_overdue': bool,
+        'create_date': datetime,
+    }
+    _coded_fields = ('request_type', 'state', 'scheduled_date', 'repaired_date', 'duration',
+                     'technician_id', 'maintenance_team_id')
+    
+    # Breakdowns: corrective requests that ended repaired or scrapped,
+    # counted per equipment on their creation day
+    BREAKDOWN_STATES = ('repaired', 'scrap')
+    BREAKDOWN_FIELDS = frozenset(['equipment_id', 'request_type', 'state', 'create_date'])
+    BREAKDOWN_RETENTION_DAYS = 90  # Longest window served from the counters
+    
+    OPEN_STATES = ('new', 'in_progress')
+    OVERDUE_FIELDS = frozenset(['scheduled_date', 'state'])
+    
     def __init__(self, env=None):
         super().__init__(env)
         self._name = 'maintenance.request'
+        self._breakdowns = None  # SlidingWindowCounter, built on first use
+        # Open requests not yet overdue, as a (scheduled_date, id) min-heap
+        # with their latest scheduled date; built on first sweep
+        self._overdue_heap = None
+        self._overdue_scheduled = {}
     
-    def create(self, vals):
-        """Create maintenance request with auto-assignment logic"""
-        defaults = {
-            'subject': vals.get('subject', ''),
-            'equipment_id': vals.get('equipment_id', False),
-            'request_type': vals.get('request_type', 'corrective'),
-            'scheduled_date': vals.get('scheduled_date', False),
-            'technician_id': vals.get('technician_id', False),
-            'maintenance_team_id': vals.get('maintenance_team_id', False),
-            'duration': vals.get('duration', 0.0),
-            'description': vals.get('description', ''),
-            'state': 'new',
-            'create_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'repaired_date': False,  # Date when request was repaired
-            'is_overdue': False,
-        }
-        
-        # Auto-assign maintenance team from equipment
-        if defaults['equipment_id'] and not defaults['maintenance_team_id']:
-            if self.env:
-                equipment_model = self.env.get('equipment')
-                if equipment_model:
-                    equipment = equipment_model.browse([defaults['equipment_id']])
-                    if equipment:
-                        team_id = equipment[0].get('maintenance_team_id')
-                        if team_id:
-                            defaults['maintenance_team_id'] = team_id
-        
-        defaults.update(vals)
-        record = super().create(defaults)
-        
-        # Check overdue status
-        self._check_overdue(record._records[-1]['id'])
-        
-        return record
+    def create_multi(self, vals_list):
+        """Create maintenance requests with auto-assignment logic"""
+        create_date = datetime.now().replace(microsecond=0)
+        records = []
+        for vals in vals_list:
+            records.append({
+                'subject': vals.get('subject', ''),
+                'equipment_id': vals.get('equipment_id', False),
+                'request_type': vals.get('request_type', 'corrective'),
+                'scheduled_date': vals.get('scheduled_date', False),
+                'technician_id': vals.get('technician_id', False),
+                'maintenance_team_id': vals.get('maintenance_team_id', False),
+                'duration': vals.get('duration', 0.0),
+                'description': vals.get('description', ''),
+                'state': 'new',
+                'create_date': create_date,
+                'repaired_date': False,  # Date when request was repaired
+                'is_overdue': False,
+            })
+        
+        # Auto-assign maintenance teams from equipment, read in one lookup
+        unassigned = [defaults for defaults in records
+                      if defaults['equipment_id'] and not defaults['maintenance_team_id']]
+        equipment_model = self.env.get('equipment') if self.env and unassigned else None
+        if equipment_model:
+            # Straight from storage: the team is not a computed field, so
+            # pending recomputes of the equipment need no flush here
+            teams = {
+                equipment['id']: equipment.get('maintenance_team_id')
+                for equipment in equipment_model._storage.get_many(
+                    list({defaults['equipment_id'] for defaults in unassigned})
+                )
+            }
+            for defaults in unassigned:
+                team_id = teams.get(defaults['equipment_id'])
+                if team_id:
+                    defaults['maintenance_team_id'] = team_id
+        
+        for defaults, vals in zip(records, vals_list):
+            defaults.update(vals)
+        # Overdue status is a stored computed field, set on first read
+        return super().create_multi(records)
+    
+    def _on_created(self, records):
+        if self._breakdowns is not None:
+            for record in records:
+                if self._is_breakdown(record):
+                    self._breakdowns.add(record.get('equipment_id'), record.get('create_date'))
+        if self._overdue_heap is not None:
+            self._schedule_overdue(records)
     
     def _check_overdue(self, request_id):
         """Check and update overdue status"""
@@ -68,23 +129,86 @@ class MaintenanceRequest(BaseModel):
         if not request:
             return False
         
-        request_record = request[0]
-        scheduled_date = request_record.get('scheduled_date')
-        state = request_record.get('state', 'new')
-        
-        if not scheduled_date:
-            return False
-        
-        # Check if overdue (scheduled date passed and still not repaired/scrap)
-        today = datetime.now().strftime('%Y-%m-%d')
-        is_overdue = (
-            scheduled_date < today and 
-            state in ['new', 'in_progress']
-        )
-        
-        self.write([request_id], {'is_overdue': is_overdue})
+        is_overdue = self._compute_is_overdue([request_id])[request_id]
+        if request[0].get('is_overdue') != is_overdue:
+            self.write([request_id], {'is_overdue': is_overdue})
         return is_overdue
     
+    @computed_field('is_overdue', depends=['scheduled_date', 'state'])
+    def _compute_is_overdue(self, request_ids):
+        """Overdue: scheduled date passed and still not repaired/scrap"""
+        today = self._today()
+        result = {}
+        for request in self._storage.get_many(request_ids):
+            scheduled_date = request.get('scheduled_date')
+            result[request['id']] = bool(
+                scheduled_date and
+                scheduled_date < today and
+                request.get('state', 'new') in self.OPEN_STATES
+            )
+        return result
+    
+    def _schedule_overdue(self, records):
+        """Queue open requests that become overdue once their date passes"""
+        today = self._today()
+        for record in records:
+            scheduled_date = record.get('scheduled_date')
+            if (not scheduled_date or scheduled_date < today or
+                    record.get('state', 'new') not in self.OPEN_STATES):
+                continue  # Nothing to wait for; the computed field or first sweep decides
+            if self._overdue_scheduled.get(record['id']) != scheduled_date:
+                self._overdue_scheduled[record['id']] = scheduled_date
+                heapq.heappush(self._overdue_heap, (scheduled_date, record['id']))
+        
+        # Rescheduled requests leave stale entries behind; compact when they dominate
+        if len(self._overdue_heap) > 2 * len(self._overdue_scheduled) + 64:
+            self._overdue_heap = [(scheduled_date, request_id)
+                                  for request_id, scheduled_date in self._overdue_scheduled.items()]
+            heapq.heapify(self._overdue_heap)
+    
+    def sweep_overdue(self):
+        """
+        Flag open requests whose scheduled date has passed as overdue
+        Pops only the k due entries off the scheduled-date heap and writes
+        them in one batch, so dependent computed fields (equipment health)
+        and version-keyed caches see the change. Returns the flagged ids.
+        """
+        today = self._today()
+        due = []
+        if self._overdue_heap is None:
+            self._overdue_heap = []
+            self._overdue_scheduled = {}
+            # Only requests not yet due are queued (served by the range index)
+            self._schedule_overdue(self._storage.search([
+                ('state', 'in', list(self.OPEN_STATES)),
+                ('scheduled_date', '>=', today),
+            ]))
+            # Requests whose date passed while no sweeper ran, e.g. rows of a
+            # persistent storage loaded after a restart, are flagged now
+            due = [record['id'] for record in self._storage.search([
+                ('state', 'in', list(self.OPEN_STATES)),
+                ('scheduled_date', '<', today),
+                ('is_overdue', '!=', True),
+            ])]
+        
+        heap = self._overdue_heap
+        while heap and heap[0][0] < today:
+            scheduled_date, request_id = heapq.heappop(heap)
+            if self._overdue_scheduled.get(request_id) == scheduled_date:
+                del self._overdue_scheduled[request_id]
+                due.append(request_id)
+        if not due:
+            return []
+        
+        # Requests closed or rescheduled since they were queued drop out here
+        records = self._storage.get_many(due)
+        is_overdue = self._compute_is_overdue([record['id'] for record in records])
+        overdue_ids = [record['id'] for record in records
+                       if is_overdue[record['id']] and not record.get('is_overdue')]
+        if overdue_ids:
+            self.write(overdue_ids, {'is_overdue': True})
+        return overdue_ids
+    
     def action_start(self, request_id):
         """Start maintenance (New -> In Progress)"""
         request = self.browse([request_id])
@@ -96,7 +220,6 @@ class MaintenanceRequest(BaseModel):
             return False
         
         self.write([request_id], {'state': 'in_progress'})
-        self._check_overdue(request_id)
         return True
     
     def action_repair(self, request_id, duration=None):
@@ -123,17 +246,10 @@ class MaintenanceRequest(BaseModel):
         self.write([request_id], {
             'state': 'repaired',
             'duration': current_duration,
-            'repaired_date': datetime.now().strftime('%Y-%m-%d'),  # Track repair date
+            'repaired_date': self._today(),  # Track repair date
             'is_overdue': False,
         })
-        
-        # Update equipment health score
-        equipment_id = request[0].get('equipment_id')
-        if equipment_id and self.env:
-            equipment_model = self.env.get('equipment')
-            if equipment_model:
-                equipment_model._compute_health_score(equipment_id)
-        
+        # Equipment health score follows through its computed field
         return True
     
     def action_scrap(self, request_id):
@@ -168,12 +284,10 @@ class MaintenanceRequest(BaseModel):
         if not technician_id:
             return 0
         
-        open_requests = self.search([
+        return self.search_count([
             ('technician_id', '=', technician_id),
             ('state', 'in', ['new', 'in_progress'])
         ])
-        
-        return len(open_requests)
     
     def get_team_technicians(self, team_id):
         """Get technicians available for a team"""
@@ -218,7 +332,89 @@ class MaintenanceRequest(BaseModel):
                     if technician_id and team_id:
                         self.validate_technician_assignment(request_id, technician_id, team_id)
         
-        return super().write(ids, vals)
+        track_breakdowns = (self._breakdowns is not None and
+                            self.BREAKDOWN_FIELDS.intersection(vals))
+        old_breakdowns = self._breakdown_events(ids) if track_breakdowns else []
+        
+        result = super().write(ids, vals)
+        
+        if track_breakdowns:
+            for equipment_id, create_date in old_breakdowns:
+                self._breakdowns.remove(equipment_id, create_date)
+            for equipment_id, create_date in self._breakdown_events(ids):
+                self._breakdowns.add(equipment_id, create_date)
+        if self._overdue_heap is not None and self.OVERDUE_FIELDS.intersection(vals):
+            self._schedule_overdue(self._storage.get_many(ids))
+        return result
+    
+    def unlink(self, ids):
+        """Override unlink to keep breakdown counters in step"""
+        if isinstance(ids, int):
+            ids = [ids]
+        if self._breakdowns is None:
+            return super().unlink(ids)
+        
+        old_breakdowns = self._breakdown_events(ids)
+        result = super().unlink(ids)
+        for equipment_id, create_date in old_breakdowns:
+            self._breakdowns.remove(equipment_id, create_date)
+        return result
+    
+    def _is_breakdown(self, record):
+        return (record.get('request_type') == 'corrective' and
+                record.get('state') in self.BREAKDOWN_STATES)
+    
+    def _breakdown_events(self, ids):
+        """(equipment id, create date) of the breakdowns among ids"""
+        return [
+            (record.get('equipment_id'), record.get('create_date'))
+            for record in self._storage.get_many(ids) if self._is_breakdown(record)
+        ]
+    
+    def _get_breakdown_counter(self):
+        """Per-equipment breakdown counter, seeded from storage on first use"""
+        if self._breakdowns is None:
+            counter = SlidingWindowCounter(self.BREAKDOWN_RETENTION_DAYS)
+            for record in self._storage.search(
+                    self._breakdown_domain(self.BREAKDOWN_RETENTION_DAYS)):
+                counter.add(record.get('equipment_id'), record.get('create_date'))
+            self._breakdowns = counter
+        return self._breakdowns
+    
+    def _breakdown_domain(self, days):
+        return [
+            ('request_type', '=', 'corrective'),
+            ('create_date', '>=', to_datetime(SlidingWindowCounter.cutoff(days, self._today()))),
+            ('state', 'in', list(self.BREAKDOWN_STATES)),
+        ]
+    
+    def get_breakdown_counts(self, equipment_ids=None, days=30):
+        """
+        Corrective breakdowns per equipment in the last days
+        Returns {equipment_id: count} for equipment with breakdowns, over
+        all equipment or the given ids. Windows up to
+        BREAKDOWN_RETENTION_DAYS come from the sliding-window counters;
+        longer ones fall back to a grouped search.
+        """
+        if days <= self.BREAKDOWN_RETENTION_DAYS:
+            return self._get_breakdown_counter().counts(days, equipment_ids, self._today())
+        
+        domain = self._breakdown_domain(days)
+        if equipment_ids is not None:
+            domain.append(('equipment_id', 'in', list(equipment_ids)))
+        return {
+            group['equipment_id']: group['__count']
+            for group in self.read_group(domain, 'equipment_id')
+            if group['equipment_id']
+        }
+    
+    def get_breakdown_equipment_ids(self, start, end):
+        """Equipment with breakdowns created from start up to, not including, end"""
+        return self._get_breakdown_counter().keys_between(start, end)
+    
+    def get_breakdown_count(self, equipment_id, days=30):
+        """Corrective breakdowns of one equipment in the last days"""
+        return self.get_breakdown_counts([equipment_id], days).get(equipment_id, 0)
     
     def get_preventive_requests(self, start_date=None, end_date=None):
         """Get preventive maintenance requests for calendar view"""
@@ -234,6 +430,18 @@ class MaintenanceRequest(BaseModel):
         
         return self.search(domain)
     
+    def search_date_range(self, start_date, end_date, domain=None):
+        """
+        Requests with a scheduled or repaired date in [start_date, end_date),
+        in creation order, answered from the date range indexes
+        """
+        domain = list(domain or [])
+        found = {}
+        for field in ('scheduled_date', 'repaired_date'):
+            for record in self.search(domain + [(field, '>=', start_date), (field, '<', end_date)]):
+                found[record['id']] = record
+        return [found[record_id] for record_id in sorted(found)]
+    
     def _get_team_technician_ids(self, team_id):
         """Get technician IDs for a team (for domain filtering)"""
         if not team_id:
@@ -8,20 +8,33 @@ from .base import BaseModel
 class MaintenanceTeam(BaseModel):
     """Maintenance team with many-to-many technicians"""
     
+    _table = 'maintenance_teams'
+    _columns = {
+        'name': str,
+        'description': str,
+        'active': bool,
+    }
+    _many2many = {
+        'technician_ids': ('team_technicians', 'team_id', 'technician_id'),
+    }
+    
     def __init__(self, env=None):
         super().__init__(env)
         self._name = 'maintenance.team'
     
-    def create(self, vals):
-        """Create maintenance team"""
-        defaults = {
-            'name': vals.get('name', ''),
-            'technician_ids': vals.get('technician_ids', []),  # List of employee IDs
-            'description': vals.get('description', ''),
-            'active': vals.get('active', True),
-        }
-        defaults.update(vals)
-        return super().create(defaults)
+    def create_multi(self, vals_list):
+        """Create maintenance teams"""
+        records = []
+        for vals in vals_list:
+            defaults = {
+                'name': vals.get('name', ''),
+                'technician_ids': vals.get('technician_ids', []),  # List of employee IDs
+                'description': vals.get('description', ''),
+                'active': vals.get('active', True),
+            }
+            defaults.update(vals)
+            records.append(defaults)
+        return super().create_multi(records)
     
     def get_team_technicians(self, team_id):
         """Get all technicians in a team"""
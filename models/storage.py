@@ -0,0 +1,1480 @@
+"""
+Record storage backends for BaseModel
+MemoryStorage keeps records as Python dicts (the default); CompactStorage
+keeps them column by column in arrays, for large fleets; SQLiteStorage
+persists them to the tables created by database.py and loads rows lazily
+"""
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from itertools import chain, islice, product
+from typing import Any, Dict, Iterator, List, Optional
+
+from .dates import PARSERS
+from .domain import compile_domain
+
+
+# Keep IN (...) lists below SQLite's bound-parameter limit
+_SQL_CHUNK_SIZE = 500
+
+# Sorts after every (value, id) entry sharing the same value
+_AFTER_ALL_IDS = float('inf')
+
+
+def _chunks(values: List, size: int = _SQL_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _id_lower_bound(domain: Optional[List]) -> Optional[int]:
+    """Smallest id the domain's 'id >' / 'id >=' conditions allow, or None"""
+    low = None
+    for condition in domain or []:
+        if (len(condition) == 3 and condition[0] == 'id'
+                and condition[1] in ('>', '>=') and type(condition[2]) is int):
+            bound = condition[2] + 1 if condition[1] == '>' else condition[2]
+            low = bound if low is None else max(low, bound)
+    return low
+
+
+def _select_buckets(field_indexes: Dict[tuple, Dict], domain: List) -> Optional[tuple]:
+    """
+    Pick the most selective hash index covering the domain
+    Returns (fields, buckets) for the chosen index, or None when no
+    index applies and a full scan is needed
+    """
+    if not field_indexes or not domain:
+        return None
+    
+    # Values accepted per field by '=' / 'in' conditions
+    accepted = {}
+    for condition in domain:
+        if len(condition) != 3:
+            continue
+        field, operator, value = condition
+        if field in accepted:
+            continue
+        if operator == '=':
+            accepted[field] = [value]
+        elif operator == 'in':
+            accepted[field] = list(value)
+    
+    best = None
+    best_size = None
+    for fields, index in field_indexes.items():
+        if not all(field in accepted for field in fields):
+            continue
+        try:
+            keys = set(product(*(accepted[field] for field in fields)))
+            buckets = [index[key] for key in keys if key in index]
+        except TypeError:
+            continue  # Unhashable value, leave it to the scan
+        size = sum(len(bucket) for bucket in buckets)
+        if best_size is None or size < best_size:
+            best, best_size = (fields, buckets), size
+    return best
+
+
+class _Descending:
+    """Sort key wrapper reversing the order of a value"""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __lt__(self, other):
+        return other.value < self.value
+    
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _order_key(order: tuple):
+    """
+    Sort key for ((field, descending), ...) order terms
+    Unset values (False/None) sort last in either direction; ties go by id
+    """
+    def key(record):
+        parts = []
+        for field, descending in order:
+            value = record.get(field)
+            if value is None or value is False:
+                parts.append((1, 0))
+            else:
+                parts.append((0, _Descending(value) if descending else value))
+        parts.append(record['id'])
+        return parts
+    return key
+
+
+def _sort_page(matches, order: tuple, limit: Optional[int], offset: int) -> List[Dict]:
+    """Sort matching records, keeping only the first offset + limit in a bounded heap"""
+    key = _order_key(order)
+    if limit is None:
+        return sorted(matches, key=key)[offset:]
+    return heapq.nsmallest(offset + limit, matches, key=key)[offset:]
+
+
+class Storage:
+    """Interface shared by the storage backends"""
+    
+    records = ()  # Sequence of all records in creation order
+    
+    def insert(self, vals: Dict[str, Any]) -> Dict:
+        """Store a new record and return it with its id"""
+        raise NotImplementedError
+    
+    def insert_many(self, vals_list: List[Dict[str, Any]]) -> List[Dict]:
+        """Store new records and return them with their ids, in order"""
+        return [self.insert(vals) for vals in vals_list]
+    
+    def get_many(self, ids: List[int]) -> List[Dict]:
+        """Records for ids in creation order, unknown ids dropped"""
+        raise NotImplementedError
+    
+    def update(self, ids: List[int], vals: Dict[str, Any]):
+        """Apply vals to the records with the given ids"""
+        raise NotImplementedError
+    
+    def delete(self, ids: List[int]) -> bool:
+        """Remove records, returns whether anything was removed"""
+        raise NotImplementedError
+    
+    def search(self, domain: Optional[List], limit: Optional[int] = None,
+               offset: int = 0, order: Optional[tuple] = None) -> List[Dict]:
+        """
+        Records matching domain, in creation order unless order gives
+        ((field, descending), ...) terms
+        offset matches are skipped and at most limit returned; scanning
+        stops once the page is complete
+        """
+        raise NotImplementedError
+    
+    def count(self, domain: Optional[List]) -> int:
+        """Number of records matching domain"""
+        return len(self.search(domain))
+    
+    def read_group(self, domain: Optional[List], groupby: List[str], specs: List[tuple]) -> List[Dict]:
+        """
+        Group records matching domain in one pass
+        specs: (key, field, func) tuples with func in sum/min/max/avg
+        """
+        groups = {}
+        fields = set(groupby).union(field for _, field, _ in specs)
+        for record in self.scan(domain, fields):
+            key = tuple(record.get(field) for field in groupby)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = dict(zip(groupby, key))
+                group['__count'] = 0
+                for spec, field, func in specs:
+                    group[spec] = 0 if func in ('sum', 'avg') else None
+            group['__count'] += 1
+            for spec, field, func in specs:
+                value = record.get(field) or 0
+                if func in ('sum', 'avg'):
+                    group[spec] += value
+                elif group[spec] is None:
+                    group[spec] = value
+                elif func == 'min':
+                    group[spec] = min(group[spec], value)
+                else:
+                    group[spec] = max(group[spec], value)
+        
+        result = list(groups.values())
+        for spec, field, func in specs:
+            if func == 'avg':
+                for group in result:
+                    group[spec] = group[spec] / group['__count']
+        return result
+    
+    def scan(self, domain: Optional[List], fields: set) -> Iterator[Dict]:
+        """Records matching domain; backends may fill in only the given fields"""
+        return self.search(domain)
+
+
+class MemoryStorage(Storage):
+    """
+    In-memory storage: records are shared dicts, with an id index and
+    the hash and range indexes declared on the model
+    """
+    
+    def __init__(self, indexes=(), range_indexes=()):
+        self.records = []
+        self._records_by_id = {}  # Primary-key index: id -> record
+        self._next_id = 1
+        # Secondary indexes: fields -> {key: {id: record}}
+        self._field_indexes = {
+            (spec,) if isinstance(spec, str) else tuple(spec): {}
+            for spec in indexes
+        }
+        # Range indexes: field -> sorted [(value, id)] of set values, or
+        # None once values turned out not to be mutually comparable
+        self._range_indexes = {field: [] for field in range_indexes}
+    
+    def insert(self, vals):
+        record = {
+            'id': self._next_id,
+            **vals
+        }
+        self._next_id += 1
+        self.records.append(record)
+        self._records_by_id[record['id']] = record
+        self._index_add(record)
+        self._range_add(record)
+        return record
+    
+    def get_many(self, ids):
+        # Ids are assigned increasingly, so sorting keeps creation order
+        records_by_id = self._records_by_id
+        return [records_by_id[i] for i in sorted({i for i in ids if i in records_by_id})]
+    
+    def update(self, ids, vals):
+        indexes = [fields for fields in self._field_indexes
+                   if any(field in vals for field in fields)]
+        range_fields = [field for field in self._range_indexes if field in vals]
+        for record in self.get_many(ids):
+            self._index_remove(record, indexes)
+            self._range_remove(record, range_fields)
+            record.update(vals)
+            self._index_add(record, indexes)
+            self._range_add(record, range_fields)
+    
+    def delete(self, ids):
+        removed = False
+        for record_id in set(ids):
+            record = self._records_by_id.pop(record_id, None)
+            if record is not None:
+                self._index_remove(record)
+                self._range_remove(record)
+                removed = True
+        if removed:
+            self.records = [r for r in self.records if r['id'] in self._records_by_id]
+        return removed
+    
+    def search(self, domain, limit=None, offset=0, order=None):
+        if domain is None and limit is None and not offset and not order:
+            return self.records.copy()
+        
+        candidates = self._plan_search(domain) if domain else None
+        predicate = compile_domain(domain)
+        if order:
+            walk = self._ordered_walk(order, candidates)
+            if walk is None:
+                if candidates is None:
+                    candidates = self._id_range(domain)
+                return _sort_page((record for record in candidates if predicate(record)),
+                                  order, limit, offset)
+            candidates = walk
+        elif candidates is None:
+            candidates = self._id_range(domain)
+        
+        matches = (record for record in candidates if predicate(record))
+        if limit is None and not offset:
+            return list(matches)
+        return list(islice(matches, offset, None if limit is None else offset + limit))
+    
+    def count(self, domain):
+        if not domain:
+            return len(self.records)
+        
+        conditions = [condition for condition in domain if len(condition) == 3]
+        selected = self._select_index(conditions)
+        if selected is not None:
+            fields, buckets = selected
+            # The index answers the whole domain when it has exactly one
+            # '=' / 'in' condition per indexed field and nothing else
+            if (len(conditions) == len(fields)
+                    and all(field in fields and operator in ('=', 'in')
+                            for field, operator, _ in conditions)):
+                return sum(len(bucket) for bucket in buckets)
+        
+        candidates = self._plan_search(conditions)
+        predicate = compile_domain(conditions)
+        return sum(1 for record in (self.records if candidates is None else candidates)
+                   if predicate(record))
+    
+    def _index_add(self, record: Dict, indexes=None):
+        """Register a record in the secondary indexes"""
+        for fields in (self._field_indexes if indexes is None else indexes):
+            key = tuple(record.get(field) for field in fields)
+            self._field_indexes[fields].setdefault(key, {})[record['id']] = record
+    
+    def _index_remove(self, record: Dict, indexes=None):
+        """Drop a record from the secondary indexes"""
+        for fields in (self._field_indexes if indexes is None else indexes):
+            index = self._field_indexes[fields]
+            key = tuple(record.get(field) for field in fields)
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(record['id'], None)
+                if not bucket:
+                    del index[key]
+    
+    def _id_range(self, domain: Optional[List]):
+        """
+        Records in creation order from the domain's lower id bound on, so
+        keyset pages seek instead of scanning from the first record
+        """
+        low = _id_lower_bound(domain)
+        records = self.records
+        if low is None:
+            return records
+        
+        # Ids are assigned increasingly: binary search the first id >= low
+        start, end = 0, len(records)
+        while start < end:
+            middle = (start + end) // 2
+            if records[middle]['id'] < low:
+                start = middle + 1
+            else:
+                end = middle
+        return (records[position] for position in range(start, len(records)))
+    
+    def _ordered_walk(self, order: tuple, candidates: Optional[List[Dict]]):
+        """
+        All records in the requested order, read off a range index, or None
+        when no index serves the order or the domain's hash index already
+        narrowed the candidates enough to sort them directly
+        """
+        if len(order) != 1:
+            return None
+        field, descending = order[0]
+        entries = self._range_indexes.get(field)
+        if entries is None or (candidates is not None and len(candidates) * 4 <= len(entries)):
+            return None
+        
+        records_by_id = self._records_by_id
+        
+        def walk():
+            if not descending:
+                for _, record_id in entries:
+                    yield records_by_id[record_id]
+            else:
+                # Values descending, equal values still in id order
+                end = len(entries)
+                while end > 0:
+                    start = bisect_left(entries, (entries[end - 1][0],))
+                    for position in range(start, end):
+                        yield records_by_id[entries[position][1]]
+                    end = start
+            # Unset values are not indexed and sort last
+            for record in self.records:
+                value = record.get(field)
+                if value is None or value is False:
+                    yield record
+        
+        return walk()
+    
+    def _range_add(self, record: Dict, fields=None):
+        """Register a record's set values in the range indexes"""
+        for field in (self._range_indexes if fields is None else fields):
+            entries = self._range_indexes[field]
+            value = record.get(field)
+            if entries is None or value is None or value is False:
+                continue
+            try:
+                insort(entries, (value, record['id']))
+            except TypeError:
+                self._range_indexes[field] = None  # Mixed types, scan instead
+    
+    def _range_remove(self, record: Dict, fields=None):
+        """Drop a record's values from the range indexes"""
+        for field in (self._range_indexes if fields is None else fields):
+            entries = self._range_indexes[field]
+            value = record.get(field)
+            if entries is None or value is None or value is False:
+                continue
+            position = bisect_left(entries, (value, record['id']))
+            if position < len(entries) and entries[position] == (value, record['id']):
+                del entries[position]
+    
+    def _select_range(self, domain: List) -> Optional[List[tuple]]:
+        """
+        Narrowest slice of a range index bounded by the domain's ordering
+        conditions, as [(value, id)], or None when no range index applies
+        """
+        best = None
+        for field, entries in self._range_indexes.items():
+            if entries is None:
+                continue
+            low, high, bounded = 0, len(entries), False
+            for condition in domain:
+                if len(condition) != 3 or condition[0] != field:
+                    continue
+                _, operator, value = condition
+                if operator not in ('<', '<=', '>', '>='):
+                    continue
+                # (value,) sorts before and (value, inf) after all entries for value
+                key = (value,) if operator in ('<', '>=') else (value, _AFTER_ALL_IDS)
+                try:
+                    position = bisect_left(entries, key)
+                except TypeError:
+                    continue
+                if operator in ('>', '>='):
+                    low = max(low, position)
+                else:
+                    high = min(high, position)
+                bounded = True
+            if bounded and (best is None or high - low < best[1] - best[0]):
+                best = (low, high, entries)
+        if best is None:
+            return None
+        low, high, entries = best
+        return entries[low:high] if low < high else []
+    
+    def _select_index(self, domain: List) -> Optional[tuple]:
+        """(fields, buckets) of the most selective hash index, or None"""
+        return _select_buckets(self._field_indexes, domain)
+    
+    def _plan_search(self, domain: List) -> Optional[List[Dict]]:
+        """
+        Candidate records for a domain in creation order, or None when no
+        index applies and a full scan is needed
+        """
+        selected = self._select_index(domain)
+        in_range = self._select_range(domain) if self._range_indexes else None
+        if in_range is not None and (
+                selected is None or len(in_range) < sum(len(bucket) for bucket in selected[1])):
+            records_by_id = self._records_by_id
+            return [records_by_id[record_id] for record_id in sorted(i for _, i in in_range)]
+        if selected is None:
+            return None
+        buckets = selected[1]
+        if len(buckets) == 1:
+            candidates = list(buckets[0].values())
+        else:
+            candidates = [record for bucket in buckets for record in bucket.values()]
+        candidates.sort(key=lambda r: r['id'])
+        return candidates
+
+
+# Compact storage columns
+
+# A field the record never had: left out of the built record (get() gives None)
+_MISSING = object()
+
+# Array typecodes for dictionary codes, by the largest code they hold
+_CODE_TYPES = (('B', 0xFF), ('H', 0xFFFF), ('I', 0xFFFFFFFF))
+
+
+class _Unrepresentable(Exception):
+    """Value outside a column's compact encoding"""
+
+
+class _ListColumn:
+    """Values of one field by slot, as Python objects"""
+    
+    __slots__ = ('values',)
+    
+    def __init__(self, values=()):
+        self.values = list(values)
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def get(self, slot):
+        return self.values[slot]
+    
+    def put(self, slot, value):
+        if slot == len(self.values):
+            self.values.append(value)
+        else:
+            self.values[slot] = value
+
+
+class _CodedColumn:
+    """
+    Low-cardinality values by slot, as codes into a table of the distinct
+    values; codes widen from one to four bytes as values are added
+    """
+    
+    __slots__ = ('codes', 'values', '_codes_by_key', '_max_code')
+    
+    def __init__(self):
+        self.codes = array('B')
+        self.values = []
+        self._codes_by_key = {}
+        self._max_code = _CODE_TYPES[0][1]
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def get(self, slot):
+        return self.values[self.codes[slot]]
+    
+    def put(self, slot, value):
+        # Keyed with the type so False / 0 / 0.0 keep their own codes
+        key = (value.__class__, value)
+        try:
+            code = self._codes_by_key.get(key)
+        except TypeError:
+            raise _Unrepresentable(value)
+        if code is None:
+            code = len(self.values)
+            if code > self._max_code:
+                self._widen(code)
+            self._codes_by_key[key] = code
+            self.values.append(value)
+        if slot == len(self.codes):
+            self.codes.append(code)
+        else:
+            self.codes[slot] = code
+    
+    def _widen(self, code):
+        for typecode, max_code in _CODE_TYPES:
+            if code <= max_code:
+                self.codes = array(typecode, self.codes)
+                self._max_code = max_code
+                return
+        raise _Unrepresentable(code)
+
+
+class _IntColumn:
+    """Integers by slot in a machine array; False, None and missing are reserved values"""
+    
+    __slots__ = ('values',)
+    
+    _FALSE = -2 ** 63
+    _NONE = _FALSE + 1
+    _ABSENT = _FALSE + 2
+    _MARKERS = (False, None, _MISSING)
+    
+    def __init__(self):
+        self.values = array('q')
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def get(self, slot):
+        value = self.values[slot]
+        if value > self._ABSENT:
+            return value
+        return self._MARKERS[value - self._FALSE]
+    
+    def put(self, slot, value):
+        if value.__class__ is int and self._ABSENT < value < 2 ** 63:
+            encoded = value
+        elif value is False:
+            encoded = self._FALSE
+        elif value is None:
+            encoded = self._NONE
+        elif value is _MISSING:
+            encoded = self._ABSENT
+        else:
+            raise _Unrepresentable(value)
+        if slot == len(self.values):
+            self.values.append(encoded)
+        else:
+            self.values[slot] = encoded
+
+
+class _DatetimeColumn(_IntColumn):
+    """Naive datetimes by slot, as microseconds since 0001-01-01 in a machine array"""
+    
+    __slots__ = ()
+    
+    EPOCH = datetime(1, 1, 1)
+    _MICROSECOND = timedelta(microseconds=1)
+    
+    def get(self, slot):
+        value = self.values[slot]
+        if value > self._ABSENT:
+            return self.EPOCH + timedelta(microseconds=value)
+        return self._MARKERS[value - self._FALSE]
+    
+    def put(self, slot, value):
+        if value.__class__ is datetime and value.tzinfo is None:
+            value = (value - self.EPOCH) // self._MICROSECOND
+        elif not (value is False or value is None or value is _MISSING):
+            raise _Unrepresentable(value)
+        super().put(slot, value)
+
+
+class _TextColumn:
+    """
+    Strings by slot, UTF-8 encoded in one shared buffer; False, None and
+    missing are reserved lengths
+    """
+    
+    __slots__ = ('data', 'starts', 'lengths', 'garbage')
+    
+    _FALSE = 0xFFFFFFFF
+    _NONE = _FALSE - 1
+    _ABSENT = _FALSE - 2
+    _MARKERS = (_MISSING, None, False)
+    
+    def __init__(self):
+        self.data = bytearray()
+        self.starts = array('Q')
+        self.lengths = array('I')
+        self.garbage = 0  # Bytes of overwritten strings still in data
+    
+    def __len__(self):
+        return len(self.lengths)
+    
+    def get(self, slot):
+        length = self.lengths[slot]
+        if length < self._ABSENT:
+            start = self.starts[slot]
+            return self.data[start:start + length].decode('utf-8')
+        return self._MARKERS[length - self._ABSENT]
+    
+    def put(self, slot, value):
+        start = len(self.data)
+        if value.__class__ is str:
+            try:
+                encoded = value.encode('utf-8')
+            except UnicodeEncodeError:
+                raise _Unrepresentable(value)  # Lone surrogates
+            if len(encoded) >= self._ABSENT:
+                raise _Unrepresentable(value)
+            length = len(encoded)
+        elif value is False:
+            encoded, length = b'', self._FALSE
+        elif value is None:
+            encoded, length = b'', self._NONE
+        elif value is _MISSING:
+            encoded, length = b'', self._ABSENT
+        else:
+            raise _Unrepresentable(value)
+        
+        if slot == len(self.lengths):
+            self.starts.append(start)
+            self.lengths.append(length)
+        else:
+            if self.lengths[slot] < self._ABSENT:
+                self.garbage += self.lengths[slot]
+            self.starts[slot] = start
+            self.lengths[slot] = length
+        self.data += encoded
+        if self.garbage > 1 << 20 and self.garbage * 2 > len(self.data):
+            self._compact()
+    
+    def _compact(self):
+        """Rewrite the buffer without overwritten strings"""
+        data = bytearray()
+        for slot, length in enumerate(self.lengths):
+            if length < self._ABSENT:
+                start = self.starts[slot]
+                self.starts[slot] = len(data)
+                data += self.data[start:start + length]
+        self.data = data
+        self.garbage = 0
+
+
+class _SlotRangeIndex:
+    """Sorted distinct set values of a field, each with its slots in ascending order"""
+    
+    __slots__ = ('keys', 'slots', 'size')
+    
+    def __init__(self):
+        self.keys = []
+        self.slots = {}  # value -> array of slots
+        self.size = 0
+    
+    def add(self, value, slot):
+        """Raises TypeError for values that do not sort with the others"""
+        bucket = self.slots.get(value)
+        if bucket is None:
+            insort(self.keys, value)
+            bucket = self.slots[value] = array('I')
+        _add_slot(bucket, slot)
+        self.size += 1
+    
+    def remove(self, value, slot):
+        bucket = self.slots.get(value)
+        if bucket is not None and _remove_slot(bucket, slot):
+            self.size -= 1
+            if not bucket:
+                del self.slots[value]
+                del self.keys[bisect_left(self.keys, value)]
+    
+    def bounds(self, conditions):
+        """(low, high) positions in keys allowed by ordering conditions on the field"""
+        low, high = 0, len(self.keys)
+        for operator, value in conditions:
+            try:
+                if operator == '>':
+                    low = max(low, bisect_right(self.keys, value))
+                elif operator == '>=':
+                    low = max(low, bisect_left(self.keys, value))
+                elif operator == '<':
+                    high = min(high, bisect_left(self.keys, value))
+                else:
+                    high = min(high, bisect_right(self.keys, value))
+            except TypeError:
+                continue
+        return low, high
+
+
+def _add_slot(bucket, slot):
+    if not bucket or bucket[-1] < slot:
+        bucket.append(slot)
+    else:
+        insort(bucket, slot)
+
+
+def _remove_slot(bucket, slot):
+    position = bisect_left(bucket, slot)
+    if position < len(bucket) and bucket[position] == slot:
+        del bucket[position]
+        return True
+    return False
+
+
+# Statements reading a slot's value of column {c} into v, per column type
+_READ_TEMPLATES = {
+    _ListColumn: 'v = {c}.values[slot]',
+    _CodedColumn: 'v = {c}.values[{c}.codes[slot]]',
+    _IntColumn: 'v = {c}.values[slot]\nif v <= INT_ABSENT: v = INT_MARKERS[v - INT_FALSE]',
+    _DatetimeColumn: (
+        'v = {c}.values[slot]\n'
+        'if v <= INT_ABSENT: v = INT_MARKERS[v - INT_FALSE]\n'
+        'else: v = DATETIME_EPOCH + timedelta(microseconds=v)'
+    ),
+    _TextColumn: (
+        'n = {c}.lengths[slot]\n'
+        'if n < TEXT_ABSENT:\n'
+        '    start = {c}.starts[slot]\n'
+        "    v = {c}.data[start:start + n].decode('utf-8')\n"
+        'else:\n'
+        '    v = TEXT_MARKERS[n - TEXT_ABSENT]'
+    ),
+}
+
+# Compiled record builders kept per storage, keyed by field set
+_BUILDER_CACHE_SIZE = 64
+
+
+def _compile_builder(columns: List[tuple]):
+    """
+    Generate a function building the record in a slot from (field, column)
+    pairs; arrays are looked up on each call, so columns may grow or widen
+    """
+    namespace = {
+        'MISSING': _MISSING,
+        'INT_ABSENT': _IntColumn._ABSENT, 'INT_FALSE': _IntColumn._FALSE,
+        'INT_MARKERS': _IntColumn._MARKERS,
+        'DATETIME_EPOCH': _DatetimeColumn.EPOCH, 'timedelta': timedelta,
+        'TEXT_ABSENT': _TextColumn._ABSENT, 'TEXT_MARKERS': _TextColumn._MARKERS,
+    }
+    body = ["record = {'id': slot + 1}"]
+    for position, (field, column) in enumerate(columns):
+        name = f'c{position}'
+        namespace[name] = column
+        body.extend(_READ_TEMPLATES[type(column)].format(c=name).split('\n'))
+        body.append(f'if v is not MISSING: record[{field!r}] = v')
+    body.append('return record')
+    exec("def build(slot):\n" + ''.join(f"    {line}\n" for line in body), namespace)
+    return namespace['build']
+
+
+class CompactStorage(Storage):
+    """
+    In-memory storage laid out by column instead of one dict per record
+    A record's values live at its slot (id - 1) in per-field columns:
+    low-cardinality fields and dates as small codes, integers and
+    datetimes in machine arrays, strings in a shared UTF-8 buffer. Indexes
+    hold slot numbers. Records are built as new dicts on every read
+    (changing them changes nothing, as with SQLiteStorage), and domains
+    are checked against only the fields they name, so scans are slower
+    than MemoryStorage's but a record takes several times less memory.
+    
+    columns: declared field -> Python type, choosing each field's encoding
+    coded: fields stored as codes whatever their type (bools and dates always are)
+    """
+    
+    def __init__(self, indexes=(), range_indexes=(), columns=None, coded=()):
+        self.records = LazyRecords(self)
+        self._column_types = {}
+        for field, field_type in (columns or {}).items():
+            if field_type is bool or field_type is date:
+                self._column_types[field] = _CodedColumn
+            elif field_type is int:
+                self._column_types[field] = _IntColumn
+            elif field_type is datetime:
+                self._column_types[field] = _DatetimeColumn
+            elif field_type is str:
+                self._column_types[field] = _TextColumn
+        for field in coded:
+            self._column_types[field] = _CodedColumn
+        self._columns = {}     # field -> column, in first-seen order
+        self._builders = {}    # Field set (None: all) -> compiled record builder
+        self._alive = bytearray()  # Per slot: 1 unless deleted
+        self._size = 0
+        # Secondary indexes: fields -> {key: array of slots}
+        self._field_indexes = {
+            (spec,) if isinstance(spec, str) else tuple(spec): {}
+            for spec in indexes
+        }
+        # Range indexes: field -> _SlotRangeIndex, or None once values
+        # turned out not to be mutually comparable
+        self._range_indexes = {field: _SlotRangeIndex() for field in range_indexes}
+    
+    # Columns
+    
+    def _column(self, field: str):
+        """A field's column, created (empty for existing slots) on first use"""
+        column = self._columns.get(field)
+        if column is None:
+            column = self._column_types.get(field, _ListColumn)()
+            for slot in range(len(self._alive)):
+                column.put(slot, _MISSING)
+            self._columns[field] = column
+            self._builders.clear()
+        return column
+    
+    def _put(self, field: str, slot: int, value: Any):
+        column = self._column(field)
+        try:
+            column.put(slot, value)
+        except _Unrepresentable:
+            # Keep this field as plain objects from now on
+            column = _ListColumn(column.get(s) for s in range(len(column)))
+            column.put(slot, value)
+            self._columns[field] = column
+            self._builders.clear()
+    
+    def _value(self, slot: int, field: str) -> Any:
+        """record.get(field) for the record in slot"""
+        if field == 'id':
+            return slot + 1
+        column = self._columns.get(field)
+        if column is None:
+            return None
+        value = column.get(slot)
+        return None if value is _MISSING else value
+    
+    def _builder(self, fields=None):
+        """Compiled function building the record in a slot, with all or only the given fields"""
+        key = None if fields is None else frozenset(fields)
+        build = self._builders.get(key)
+        if build is None:
+            if len(self._builders) >= _BUILDER_CACHE_SIZE:
+                self._builders.clear()
+            build = self._builders[key] = _compile_builder([
+                (field, column) for field, column in self._columns.items()
+                if key is None or field in key
+            ])
+        return build
+    
+    def _record(self, slot: int) -> Dict:
+        return self._builder()(slot)
+    
+    def _slots(self, ids) -> List[int]:
+        """Live slots of ids, ascending"""
+        alive, total = self._alive, len(self._alive)
+        return sorted({
+            i - 1 for i in ids
+            if i.__class__ is int and 0 < i <= total and alive[i - 1]
+        })
+    
+    # Storage interface
+    
+    def insert(self, vals):
+        slot = len(self._alive)
+        for field in vals:
+            if field != 'id':
+                self._column(field)
+        for field in list(self._columns):
+            self._put(field, slot, vals.get(field, _MISSING))
+        self._alive.append(1)
+        self._size += 1
+        self._index_add(slot)
+        self._range_add(slot)
+        return self._record(slot)
+    
+    def get_many(self, ids):
+        return list(map(self._builder(), self._slots(ids)))
+    
+    def get_at(self, position: int) -> Dict:
+        """Record at a position in creation order, counting only live records"""
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError('record index out of range')
+        alive = self._alive
+        if self._size == len(alive):
+            return self._record(position)
+        if position < self._size // 2:
+            slot = -1
+            for _ in range(position + 1):
+                slot = alive.find(1, slot + 1)
+        else:
+            slot = len(alive)
+            for _ in range(self._size - position):
+                slot = alive.rfind(1, 0, slot)
+        return self._record(slot)
+    
+    def update(self, ids, vals):
+        vals = {field: value for field, value in vals.items() if field != 'id'}
+        indexes = [fields for fields in self._field_indexes
+                   if any(field in vals for field in fields)]
+        range_fields = [field for field in self._range_indexes if field in vals]
+        for slot in self._slots(ids):
+            self._index_remove(slot, indexes)
+            self._range_remove(slot, range_fields)
+            for field, value in vals.items():
+                self._put(field, slot, value)
+            self._index_add(slot, indexes)
+            self._range_add(slot, range_fields)
+    
+    def delete(self, ids):
+        slots = self._slots(ids)
+        for slot in slots:
+            self._index_remove(slot)
+            self._range_remove(slot)
+            self._alive[slot] = 0
+            self._size -= 1
+        return bool(slots)
+    
+    def iter_search(self, domain: Optional[List], order: Optional[tuple] = None) -> Iterator[Dict]:
+        """Stream matching records without building the whole result"""
+        if order:
+            yield from self.search(domain, order=order)
+            return
+        candidates = self._plan_search(domain) if domain else None
+        for slot in self._matching(self._slot_range(domain) if candidates is None else candidates,
+                                   domain):
+            yield self._record(slot)  # Columns may change between records
+    
+    def search(self, domain, limit=None, offset=0, order=None):
+        candidates = self._plan_search(domain) if domain else None
+        if order:
+            walk = self._ordered_walk(order, candidates)
+            if walk is None:
+                if candidates is None:
+                    candidates = self._slot_range(domain)
+                # Sort records of just the ordering fields, then build the page
+                keys = self._builder([field for field, _ in order])
+                page = _sort_page(map(keys, self._matching(candidates, domain)),
+                                  order, limit, offset)
+                return [self._record(record['id'] - 1) for record in page]
+            candidates = walk
+        elif candidates is None:
+            candidates = self._slot_range(domain)
+        
+        slots = self._matching(candidates, domain)
+        if limit is not None or offset:
+            slots = islice(slots, offset, None if limit is None else offset + limit)
+        return list(map(self._builder(), slots))
+    
+    def count(self, domain):
+        if not domain:
+            return self._size
+        
+        conditions = [condition for condition in domain if len(condition) == 3]
+        selected = _select_buckets(self._field_indexes, conditions)
+        if selected is not None:
+            fields, buckets = selected
+            # Same exact-cover shortcut as MemoryStorage.count
+            if (len(conditions) == len(fields)
+                    and all(field in fields and operator in ('=', 'in')
+                            for field, operator, _ in conditions)):
+                return sum(len(bucket) for bucket in buckets)
+        
+        candidates = self._plan_search(conditions)
+        if candidates is None:
+            candidates = self._slot_range(conditions)
+        return sum(1 for _ in self._matching(candidates, conditions))
+    
+    def scan(self, domain, fields):
+        candidates = self._plan_search(domain) if domain else None
+        if candidates is None:
+            candidates = self._slot_range(domain)
+        return map(self._builder(fields), self._matching(candidates, domain))
+    
+    def _matching(self, slots, domain: Optional[List]) -> Iterator[int]:
+        """Live slots matching domain, checked on records of just the domain's fields"""
+        alive = self._alive
+        if not domain:
+            return (slot for slot in slots if alive[slot])
+        predicate = compile_domain(domain)
+        probe = self._builder(condition[0] for condition in domain if len(condition) == 3)
+        return (slot for slot in slots if alive[slot] and predicate(probe(slot)))
+    
+    # Query planning
+    
+    def _slot_range(self, domain: Optional[List]) -> range:
+        """Slots from the domain's lower id bound on (see MemoryStorage._id_range)"""
+        low = _id_lower_bound(domain)
+        start = 0 if low is None else min(max(low - 1, 0), len(self._alive))
+        return range(start, len(self._alive))
+    
+    def _plan_search(self, domain: List):
+        """
+        Candidate slots for a domain in ascending order, or None when no
+        index applies and a full scan is needed
+        """
+        selected = _select_buckets(self._field_indexes, domain)
+        in_range = self._select_range(domain) if self._range_indexes else None
+        if in_range is not None and (
+                selected is None or in_range[0] < sum(len(bucket) for bucket in selected[1])):
+            _, index, low, high = in_range
+            return sorted(chain.from_iterable(index.slots[key] for key in index.keys[low:high]))
+        if selected is None:
+            return None
+        buckets = selected[1]
+        if len(buckets) == 1:
+            return buckets[0]  # Already ascending; not changed while searching
+        return sorted(chain.from_iterable(buckets))
+    
+    def _select_range(self, domain: List) -> Optional[tuple]:
+        """
+        Narrowest key range of a range index bounded by the domain's ordering
+        conditions, as (slot count, index, low, high), or None
+        """
+        best = None
+        for field, index in self._range_indexes.items():
+            if index is None:
+                continue
+            conditions = [(condition[1], condition[2]) for condition in domain
+                          if len(condition) == 3 and condition[0] == field
+                          and condition[1] in ('<', '<=', '>', '>=')]
+            if not conditions:
+                continue
+            low, high = index.bounds(conditions)
+            size = sum(len(index.slots[key]) for key in index.keys[low:high])
+            if best is None or size < best[0]:
+                best = (size, index, low, high)
+        return best
+    
+    def _ordered_walk(self, order: tuple, candidates):
+        """Slots in the requested order off a range index (see MemoryStorage._ordered_walk)"""
+        if len(order) != 1:
+            return None
+        field, descending = order[0]
+        index = self._range_indexes.get(field)
+        if index is None or (candidates is not None and len(candidates) * 4 <= index.size):
+            return None
+        
+        def walk():
+            for key in (index.keys[::-1] if descending else list(index.keys)):
+                yield from index.slots[key]
+            # Unset values are not indexed and sort last
+            for slot in range(len(self._alive)):
+                value = self._value(slot, field)
+                if value is None or value is False:
+                    yield slot
+        
+        return walk()
+    
+    # Index maintenance
+    
+    def _index_add(self, slot: int, indexes=None):
+        for fields in (self._field_indexes if indexes is None else indexes):
+            key = tuple(self._value(slot, field) for field in fields)
+            index = self._field_indexes[fields]
+            bucket = index.get(key)
+            if bucket is None:
+                bucket = index[key] = array('I')
+            _add_slot(bucket, slot)
+    
+    def _index_remove(self, slot: int, indexes=None):
+        for fields in (self._field_indexes if indexes is None else indexes):
+            index = self._field_indexes[fields]
+            key = tuple(self._value(slot, field) for field in fields)
+            bucket = index.get(key)
+            if bucket is not None:
+                _remove_slot(bucket, slot)
+                if not bucket:
+                    del index[key]
+    
+    def _range_add(self, slot: int, fields=None):
+        for field in (self._range_indexes if fields is None else fields):
+            index = self._range_indexes[field]
+            value = self._value(slot, field)
+            if index is None or value is None or value is False:
+                continue
+            try:
+                index.add(value, slot)
+            except TypeError:
+                self._range_indexes[field] = None  # Mixed types, scan instead
+    
+    def _range_remove(self, slot: int, fields=None):
+        for field in (self._range_indexes if fields is None else fields):
+            index = self._range_indexes[field]
+            value = self._value(slot, field)
+            if index is None or value is None or value is False:
+                continue
+            index.remove(value, slot)
+
+
+class LazyRecords:
+    """Read-only sequence over a storage backend, building records on access"""
+    
+    def __init__(self, storage: Storage):
+        self._storage = storage
+    
+    def __len__(self):
+        return self._storage.count(None)
+    
+    def __iter__(self):
+        return self._storage.iter_search(None)
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return list(self)[position]
+        return self._storage.get_at(position)
+    
+    def copy(self):
+        return list(self)
+
+
+class SQLiteStorage(Storage):
+    """
+    Storage persisting records to a database.py table
+    Domains are translated to SQL where possible; the remaining conditions
+    are checked in Python on the loaded rows. Nothing is cached in memory.
+    
+    columns: persisted field -> Python type (bool columns are stored as 0/1,
+    date and datetime ones as ISO text, False on other columns as NULL)
+    many2many: field -> (relation table, own column, related column)
+    """
+    
+    def __init__(self, database, table: str, columns: Dict[str, type],
+                 indexes=(), many2many: Dict[str, tuple] = None, range_indexes=()):
+        self.db = database
+        self.table = table
+        self.columns = dict(columns)
+        self.many2many = dict(many2many or {})
+        self.records = LazyRecords(self)
+        # Date / datetime columns -> parser of their stored text
+        self._parsers = {
+            field: PARSERS[field_type] for field, field_type in self.columns.items()
+            if field_type in PARSERS
+        }
+        self._select = f"SELECT id, {', '.join(self.columns)} FROM {table}"
+        self._ensure_columns()
+        # SQLite's b-tree indexes serve range conditions as well
+        self._create_indexes(tuple(indexes) + tuple(range_indexes))
+    
+    # SQL types for columns added to tables created by an older schema
+    _SQL_TYPES = {bool: 'INTEGER', int: 'INTEGER', float: 'REAL', str: 'TEXT',
+                  date: 'TEXT', datetime: 'TEXT'}
+    
+    def _ensure_columns(self):
+        """Add declared columns missing from an existing table"""
+        existing = {row['name'] for row in self.db.fetch_all(f"PRAGMA table_info({self.table})")}
+        for field, field_type in self.columns.items():
+            if field not in existing:
+                sql_type = self._SQL_TYPES.get(field_type, 'TEXT')
+                self.db.execute(f"ALTER TABLE {self.table} ADD COLUMN {field} {sql_type}")
+    
+    def _create_indexes(self, indexes):
+        """Mirror the model's declared indexes in SQLite"""
+        for spec in indexes:
+            fields = (spec,) if isinstance(spec, str) else tuple(spec)
+            if not all(field in self.columns for field in fields):
+                continue
+            name = f"idx_{self.table}_{'_'.join(fields)}"
+            self.db.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} ({', '.join(fields)})"
+            )
+    
+    # Value conversion
+    
+    def _dump(self, field: str, value: Any) -> Any:
+        if self.columns.get(field) is bool:
+            return int(bool(value))
+        if value is False or value is None:
+            return None
+        if isinstance(value, date):
+            # ISO text sorts chronologically, so SQL comparisons still hold
+            return value.isoformat(' ') if isinstance(value, datetime) else value.isoformat()
+        return value
+    
+    def _load(self, row: Dict) -> Dict:
+        record = {'id': row['id']}
+        for field, field_type in self.columns.items():
+            value = row[field]
+            if value is None:
+                value = False
+            elif field_type is bool:
+                value = bool(value)
+            elif field in self._parsers:
+                value = self._parsers[field](value)
+            record[field] = value
+        return record
+    
+    def _load_rows(self, rows: List[Dict]) -> List[Dict]:
+        records = [self._load(row) for row in rows]
+        if self.many2many and records:
+            self._load_many2many(records)
+        return records
+    
+    def _load_many2many(self, records: List[Dict]):
+        by_id = {record['id']: record for record in records}
+        for field, (relation, column, related_column) in self.many2many.items():
+            for record in records:
+                record[field] = []
+            for ids in _chunks(list(by_id)):
+                rows = self.db.fetch_all(
+                    f"SELECT {column}, {related_column} FROM {relation} "
+                    f"WHERE {column} IN ({', '.join('?' * len(ids))}) ORDER BY rowid",
+                    ids
+                )
+                for row in rows:
+                    by_id[row[column]][field].append(row[related_column])
+    
+    def _write_many2many(self, ids: List[int], vals: Dict[str, Any]):
+        for field, (relation, column, related_column) in self.many2many.items():
+            if field not in vals:
+                continue
+            related_ids = list(dict.fromkeys(vals[field] or []))
+            for chunk in _chunks(ids):
+                self.db.execute(
+                    f"DELETE FROM {relation} WHERE {column} IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+            if related_ids:
+                self.db.executemany(
+                    f"INSERT INTO {relation} ({column}, {related_column}) VALUES (?, ?)",
+                    [(record_id, related_id) for record_id in ids for related_id in related_ids]
+                )
+    
+    # Domain translation
+    
+    def _translate(self, domain: Optional[List]):
+        """Split a domain into a SQL WHERE clause and residual conditions"""
+        clauses, params, residual = [], [], []
+        for condition in domain or []:
+            if len(condition) != 3:
+                continue
+            clause = self._condition_sql(*condition, params=params)
+            if clause is None:
+                residual.append(condition)
+            else:
+                clauses.append(clause)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params, residual
+    
+    def _condition_sql(self, field, operator, value, params) -> Optional[str]:
+        if field == 'id':
+            field_type = int
+        elif field in self.columns:
+            field_type = self.columns[field]
+        else:
+            return None
+        
+        def is_unset(v):
+            return field_type is not bool and (v is False or v is None)
+        
+        if operator in ('=', '!='):
+            if isinstance(value, (list, tuple, dict, set)):
+                return None
+            if is_unset(value):
+                return f"{field} IS NULL" if operator == '=' else f"{field} IS NOT NULL"
+            params.append(self._dump(field, value))
+            if operator == '=':
+                return f"{field} = ?"
+            return f"({field} != ? OR {field} IS NULL)"
+        
+        if operator in ('in', 'not in'):
+            values = list(value)
+            if any(isinstance(v, (list, tuple, dict, set)) for v in values):
+                return None
+            unset = any(is_unset(v) for v in values)
+            values = [self._dump(field, v) for v in values if not is_unset(v)]
+            placeholders = ', '.join('?' * len(values))
+            params.extend(values)
+            if operator == 'in':
+                parts = [f"{field} IN ({placeholders})"] if values else []
+                if unset:
+                    parts.append(f"{field} IS NULL")
+                return f"({' OR '.join(parts)})" if parts else '0'
+            if not values:
+                return f"{field} IS NOT NULL" if unset else '1'
+            if unset:
+                return f"{field} NOT IN ({placeholders})"
+            return f"({field} NOT IN ({placeholders}) OR {field} IS NULL)"
+        
+        if operator in ('<', '>', '<=', '>='):
+            if is_unset(value) or isinstance(value, (list, tuple, dict, set)):
+                return None
+            params.append(self._dump(field, value))
+            return f"{field} {operator} ?"
+        
+        return None
+    
+    # Storage interface
+    
+    def insert(self, vals):
+        return self.insert_many([vals])[0]
+    
+    def insert_many(self, vals_list):
+        # One transaction and one read back for the whole batch
+        ids = []
+        with self.db.transaction():
+            for vals in vals_list:
+                fields = [field for field in self.columns if field in vals]
+                cursor = self.db.execute(
+                    f"INSERT INTO {self.table} ({', '.join(fields)}) "
+                    f"VALUES ({', '.join('?' * len(fields))})",
+                    [self._dump(field, vals[field]) for field in fields]
+                )
+                ids.append(cursor.lastrowid)
+                self._write_many2many([cursor.lastrowid], vals)
+            return self.get_many(ids)
+    
+    def get_many(self, ids):
+        ids = sorted({i for i in ids if isinstance(i, int)})
+        rows = []
+        for chunk in _chunks(ids):
+            rows.extend(self.db.fetch_all(
+                f"{self._select} WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+                chunk
+            ))
+        return self._load_rows(rows)
+    
+    def get_at(self, position: int) -> Dict:
+        """Record at a position in creation order (negative from the end)"""
+        order, offset = ('ASC', position) if position >= 0 else ('DESC', -position - 1)
+        row = self.db.fetch_one(
+            f"{self._select} ORDER BY id {order} LIMIT 1 OFFSET ?", (offset,)
+        )
+        if row is None:
+            raise IndexError('record index out of range')
+        return self._load_rows([row])[0]
+    
+    def update(self, ids, vals):
+        ids = sorted({i for i in ids if isinstance(i, int)})
+        fields = [field for field in self.columns if field in vals]
+        if not ids:
+            return
+        with self.db.transaction():
+            if fields:
+                assignments = ', '.join(f"{field} = ?" for field in fields)
+                values = [self._dump(field, vals[field]) for field in fields]
+                for chunk in _chunks(ids):
+                    self.db.execute(
+                        f"UPDATE {self.table} SET {assignments} "
+                        f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                        values + chunk
+                    )
+            self._write_many2many(ids, vals)
+    
+    def delete(self, ids):
+        ids = sorted({i for i in ids if isinstance(i, int)})
+        removed = 0
+        with self.db.transaction():
+            for chunk in _chunks(ids):
+                placeholders = ', '.join('?' * len(chunk))
+                for relation, column, _ in self.many2many.values():
+                    self.db.execute(f"DELETE FROM {relation} WHERE {column} IN ({placeholders})", chunk)
+                cursor = self.db.execute(f"DELETE FROM {self.table} WHERE id IN ({placeholders})", chunk)
+                removed += cursor.rowcount
+        return removed > 0
+    
+    def _order_sql(self, order: Optional[tuple]) -> Optional[str]:
+        """ORDER BY terms matching _order_key, or None for unknown fields"""
+        terms = []
+        for field, descending in order or ():
+            direction = 'DESC' if descending else 'ASC'
+            if field == 'id':
+                terms.append(f"id {direction}")
+                continue
+            if field not in self.columns:
+                return None
+            if self.columns[field] is bool:
+                terms.append(f"({field} IS NULL OR {field} = 0)")  # False sorts last
+            else:
+                terms.append(f"{field} IS NULL")
+            terms.append(f"{field} {direction}")
+        terms.append('id')
+        return ', '.join(terms)
+    
+    def iter_search(self, domain: Optional[List], order: Optional[tuple] = None) -> Iterator[Dict]:
+        """Stream records matching domain without holding them all"""
+        where, params, residual = self._translate(domain)
+        predicate = compile_domain(residual)
+        order_sql = self._order_sql(order) or 'id'
+        for rows in self.db.fetch_batches(f"{self._select}{where} ORDER BY {order_sql}", params):
+            for record in self._load_rows(rows):
+                if predicate(record):
+                    yield record
+    
+    def search(self, domain, limit=None, offset=0, order=None):
+        order_sql = self._order_sql(order)
+        if order_sql is None:
+            # Ordered by a field SQL does not have: sort in Python
+            return _sort_page(self.iter_search(domain), order, limit, offset)
+        if limit is None and not offset:
+            return list(self.iter_search(domain, order))
+        
+        where, params, residual = self._translate(domain)
+        if residual:
+            # Filtered in Python: stream until the page is complete
+            return list(islice(self.iter_search(domain, order), offset,
+                               None if limit is None else offset + limit))
+        rows = self.db.fetch_all(
+            f"{self._select}{where} ORDER BY {order_sql} LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset]
+        )
+        return self._load_rows(rows)
+    
+    def count(self, domain):
+        where, params, residual = self._translate(domain)
+        if residual:
+            return sum(1 for _ in self.iter_search(domain))
+        row = self.db.fetch_one(f"SELECT COUNT(*) AS n FROM {self.table}{where}", params)
+        return row['n']
+    
+    def read_group(self, domain, groupby, specs):
+        where, params, residual = self._translate(domain)
+        columns = set(self.columns) | {'id'}
+        if residual or not all(field in columns for field in groupby) \
+                or not all(field in columns for _, field, _ in specs):
+            return super().read_group(domain, groupby, specs)
+        
+        # Aggregate in SQL; unset values count as 0 like the generic path
+        selects = list(groupby) + ['COUNT(*)']
+        for _, field, func in specs:
+            if func == 'avg':
+                selects.append(f"SUM(COALESCE({field}, 0)) * 1.0 / COUNT(*)")
+            else:
+                selects.append(f"{func.upper()}(COALESCE({field}, 0))")
+        group_sql = f" GROUP BY {', '.join(groupby)} ORDER BY MIN(id)" if groupby else ''
+        cursor = self.db.get_connection().execute(
+            f"SELECT {', '.join(selects)} FROM {self.table}{where}{group_sql}", params
+        )
+        
+        result = []
+        for row in cursor.fetchall():
+            row = tuple(row)
+            if not groupby and not row[0]:
+                continue  # No matches, no group
+            group = {}
+            for position, field in enumerate(groupby):
+                value = row[position]
+                if value is None:
+                    value = False
+                elif self.columns.get(field) is bool:
+                    value = bool(value)
+                elif field in self._parsers:
+                    value = self._parsers[field](value)
+                group[field] = value
+            group['__count'] = row[len(groupby)]
+            for offset, (spec, _, _) in enumerate(specs, start=len(groupby) + 1):
+                group[spec] = row[offset]
+            result.append(group)
+        return result
+
+
+def sqlite_storage_factory(database):
+    """Storage factory persisting every model that declares a _table"""
+    def factory(model):
+        if not model._table:
+            return None
+        return SQLiteStorage(database, model._table, model._columns,
+                             model._indexes, model._many2many, model._range_indexes)
+    return factory
+
+
+def compact_storage_factory(model):
+    """Storage factory keeping every model in CompactStorage"""
+    return CompactStorage(model._indexes, model._range_indexes, model._columns,
+                          model._coded_fields)
@@ -1,19 +1,174 @@
 """
 User Model for Authentication
 """
+import atexit
 import hashlib
+import hmac
+import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from database import db
 
 
+# PBKDF2-SHA256 rounds for new hashes; stored hashes with fewer rounds (or
+# legacy unsalted SHA256) are upgraded on the next successful login
+PASSWORD_ITERATIONS = int(os.environ.get('GEARGUARD_PASSWORD_ITERATIONS', 600000))
+# Hashing is CPU-bound (and releases the GIL): at most this many at once
+HASH_WORKERS = int(os.environ.get('GEARGUARD_HASH_WORKERS', 4))
+USER_CACHE_SIZE = int(os.environ.get('GEARGUARD_USER_CACHE_SIZE', 1024))
+# Seconds between batched last-login / rehash writes
+USER_WRITE_INTERVAL = 1.0
+
+HASH_ALGORITHM = 'pbkdf2_sha256'
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='gearguard-hash')
+
+
+class _UserCache:
+    """Least-recently-used user rows by id, with a username index"""
+    
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # id -> row
+        self._ids_by_username = {}
+    
+    def get(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return None
+            self._users.move_to_end(user_id)
+            return dict(user)
+    
+    def get_by_username(self, username):
+        with self._lock:
+            user_id = self._ids_by_username.get(username)
+        return None if user_id is None else self.get(user_id)
+    
+    def put(self, user):
+        if not user or self.size <= 0:
+            return
+        with self._lock:
+            self._discard(user['id'])
+            self._users[user['id']] = dict(user)
+            self._ids_by_username[user['username']] = user['id']
+            while len(self._users) > self.size:
+                self._discard(next(iter(self._users)))
+    
+    def update(self, user_id, vals):
+        """Apply a write to the cached row, if any"""
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None:
+                user.update(vals)
+    
+    def _discard(self, user_id):
+        user = self._users.pop(user_id, None)
+        if user is not None and self._ids_by_username.get(user['username']) == user_id:
+            del self._ids_by_username[user['username']]
+
+
+class _UserWriter:
+    """
+    Background thread batching user updates (last login, rehashed
+    passwords) into one transaction, so logins never wait on the
+    database write lock
+    """
+    
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}  # user id -> {column: value}, latest value wins
+        self._thread = None
+    
+    def record(self, user_id, vals):
+        with self._lock:
+            self._pending.setdefault(user_id, {}).update(vals)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='user-writer', daemon=True)
+                self._thread.start()
+    
+    def pending(self, user_id):
+        """Queued values for a user, not yet in the database"""
+        with self._lock:
+            return dict(self._pending.get(user_id, ()))
+    
+    def flush(self):
+        """Write all pending updates now"""
+        with self._lock:
+            batch = {user_id: dict(vals) for user_id, vals in self._pending.items()}
+        if not batch:
+            return
+        with db.transaction():
+            for user_id, vals in batch.items():
+                columns = sorted(vals)
+                db.execute(
+                    f"UPDATE users SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                    [vals[column] for column in columns] + [user_id]
+                )
+        # Kept pending until committed, so reloaded rows never miss them
+        with self._lock:
+            for user_id, vals in batch.items():
+                if self._pending.get(user_id) == vals:
+                    del self._pending[user_id]
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"User update failed: {e}")
+
+
+_cache = _UserCache(USER_CACHE_SIZE)
+_writer = _UserWriter(USER_WRITE_INTERVAL)
+atexit.register(_writer.flush)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+
+
+def _hash(password, iterations):
+    salt = os.urandom(16).hex()
+    return f"{HASH_ALGORITHM}${iterations}${salt}${_pbkdf2(password, salt, iterations)}"
+
+
+def _check(password_hash, password):
+    if password_hash.startswith(HASH_ALGORITHM + '$'):
+        _, iterations, salt, expected = password_hash.split('$', 3)
+        computed = _pbkdf2(password, salt, int(iterations))
+    else:
+        # Legacy unsalted SHA256
+        expected = password_hash
+        computed = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(computed, expected)
+
+
 class User:
     """User model for authentication"""
     
     @staticmethod
-    def hash_password(password):
-        """Hash password using SHA256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+    def hash_password(password, iterations=None):
+        """
+        Salted PBKDF2-SHA256 hash, computed on the hashing pool
+        The calling thread waits for the result: the pool bounds how many
+        hashes use CPU at once, logins beyond it queue on their threads.
+        """
+        return _hash_executor.submit(_hash, password, iterations or PASSWORD_ITERATIONS).result()
+    
+    @staticmethod
+    def needs_rehash(password_hash):
+        """Whether a stored hash is weaker than the configured cost"""
+        if not password_hash.startswith(HASH_ALGORITHM + '$'):
+            return True
+        return int(password_hash.split('$', 2)[1]) < PASSWORD_ITERATIONS
     
     @staticmethod
     def create(username, email, password, full_name=None, role='user'):
@@ -21,21 +176,25 @@ class User:
         password_hash = User.hash_password(password)
         
         try:
-            db.execute('''
-                INSERT INTO users (username, email, password_hash, full_name, role)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (username, email, password_hash, full_name, role))
-            
-            # Get the created user
-            user = User.get_by_username(username)
-            return user
+            with db.transaction():
+                db.execute('''
+                    INSERT INTO users (username, email, password_hash, full_name, role)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (username, email, password_hash, full_name, role))
         except sqlite3.IntegrityError:
             return None  # Username or email already exists
+        
+        # Get the created user once committed (cached unless an enclosing
+        # transaction may still roll it back)
+        return User.get_by_username(username)
     
     @staticmethod
     def get_by_username(username):
-        """Get user by username"""
-        return db.fetch_one('SELECT * FROM users WHERE username = ?', (username,))
+        """Get user by username (cached)"""
+        user = _cache.get_by_username(username)
+        if user is None:
+            user = User._load(db.fetch_one('SELECT * FROM users WHERE username = ?', (username,)))
+        return user
     
     @staticmethod
     def get_by_email(email):
@@ -44,21 +203,52 @@ class User:
     
     @staticmethod
     def get_by_id(user_id):
-        """Get user by ID"""
-        return db.fetch_one('SELECT * FROM users WHERE id = ?', (user_id,))
+        """Get user by ID (cached)"""
+        user = _cache.get(user_id)
+        if user is None:
+            user = User._load(db.fetch_one('SELECT * FROM users WHERE id = ?', (user_id,)))
+        return user
     
     @staticmethod
     def verify_password(user, password):
-        """Verify user password"""
+        """
+        Verify user password on the hashing pool (the calling thread waits)
+        A correct password stored with an outdated hash is rehashed at the
+        configured cost.
+        """
         if not user:
             return False
-        password_hash = User.hash_password(password)
-        return user['password_hash'] == password_hash
+        password_hash = user['password_hash']
+        if not _hash_executor.submit(_check, password_hash, password).result():
+            return False
+        if User.needs_rehash(password_hash):
+            User._update(user['id'], {'password_hash': User.hash_password(password)})
+        return True
     
     @staticmethod
     def update_last_login(user_id):
-        """Update last login timestamp"""
-        db.execute('''
-            UPDATE users SET updated_at = ? WHERE id = ?
-        ''', (datetime.now().isoformat(), user_id))
-
+        """Update last login timestamp (written in the background)"""
+        User._update(user_id, {'updated_at': datetime.now().isoformat()})
+    
+    @staticmethod
+    def flush_pending_writes():
+        """Write queued last-login and rehash updates now"""
+        _writer.flush()
+    
+    @staticmethod
+    def _load(user):
+        """
+        Cache a row read from the database, with its queued writes applied
+        Rows read inside a transaction are not cached, it may still roll back
+        """
+        if user:
+            user.update(_writer.pending(user['id']))
+            if not db.in_transaction():
+                _cache.put(user)
+        return user
+    
+    @staticmethod
+    def _update(user_id, vals):
+        """Queue a write of vals, visible to cached lookups right away"""
+        _cache.update(user_id, vals)
+        _writer.record(user_id, vals)
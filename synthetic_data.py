@@ -0,0 +1,119 @@
+"""
+GearGuard+ Synthetic Data
+Seeded generator for fleets of any size, for load tests and benchmarks
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+
+DEPARTMENTS = ('Production', 'Facilities', 'Manufacturing', 'Logistics', 'IT', 'Quality')
+LOCATIONS = ('Factory Floor A', 'Factory Floor B', 'Building 1', 'Building 2', 'Warehouse', 'Server Room')
+EQUIPMENT_KINDS = ('Conveyor Belt', 'HVAC Unit', 'CNC Machine', 'Compressor', 'Pump', 'Server Rack', 'Forklift')
+
+# Relative frequency of each request state
+STATE_WEIGHTS = (('new', 30), ('in_progress', 15), ('repaired', 50), ('scrap', 5))
+PREVENTIVE_RATIO = 0.6
+FUTURE_RATIO = 0.1  # Share of requests scheduled after today
+CREATE_BATCH_SIZE = 10000  # Requests passed to one create_multi call
+
+
+def generate_fleet(app, employees=50, teams=5, equipment=1000, requests=10000,
+                   spread_days=365, seed=0):
+    """
+    Populate app with a reproducible synthetic fleet
+    Requests are created over the last spread_days and scheduled up to a
+    month later, so recent breakdowns, overdue requests and calendar
+    months are all populated. The same seed and counts give the same data
+    (dates are relative to today).
+    Returns the number of records created per model
+    """
+    rng = random.Random(seed)
+    env = app.env
+    # Midnight, so the same seed gives the same fleet all day
+    today = datetime.combine(date.today(), time())
+    
+    employee_vals = []
+    for index in range(employees):
+        is_technician = index % 3 != 0  # Two in three employees are technicians
+        employee_vals.append({
+            'name': f"Employee {index + 1}",
+            'email': f"employee{index + 1}@company.com",
+            'department': 'Maintenance' if is_technician else rng.choice(DEPARTMENTS),
+            'is_technician': is_technician,
+        })
+    employee_ids = env['employee'].create_multi(employee_vals)
+    technician_ids = [
+        employee_id for employee_id, vals in zip(employee_ids, employee_vals)
+        if vals['is_technician']
+    ]
+    
+    team_vals = [{
+        'name': f"Team {index + 1}",
+        'technician_ids': rng.sample(technician_ids, min(len(technician_ids), rng.randint(1, 5))),
+        'description': f"Synthetic maintenance team {index + 1}",
+    } for index in range(teams)]
+    team_ids = env['maintenance.team'].create_multi(team_vals)
+    team_technicians = {
+        team_id: vals['technician_ids'] for team_id, vals in zip(team_ids, team_vals)
+    }
+    
+    equipment_vals = []
+    for index in range(equipment):
+        purchase_date = today - timedelta(days=rng.randint(180, 3650))
+        equipment_vals.append({
+            'name': f"{rng.choice(EQUIPMENT_KINDS)} {index + 1}",
+            'serial_number': f"SYN-{index + 1:07d}",
+            'department': rng.choice(DEPARTMENTS),
+            'location': rng.choice(LOCATIONS),
+            'maintenance_team_id': rng.choice(team_ids) if team_ids else False,
+            'assigned_employee_id': rng.choice(employee_ids) if employee_ids else False,
+            'purchase_date': purchase_date.date(),
+            'warranty_end_date': (purchase_date + timedelta(days=1095)).date(),
+        })
+    equipment_ids = env['equipment'].create_multi(equipment_vals)
+    equipment_teams = [vals['maintenance_team_id'] for vals in equipment_vals]
+    
+    request_model = env['maintenance.request']
+    states = [state for state, _ in STATE_WEIGHTS]
+    weights = [weight for _, weight in STATE_WEIGHTS]
+    request_vals = []
+    for index in range(requests if equipment_ids else 0):
+        position = rng.randrange(len(equipment_ids))
+        team_id = equipment_teams[position]
+        members = team_technicians.get(team_id)
+        
+        if rng.random() < FUTURE_RATIO:
+            created = today - timedelta(days=rng.randint(0, 7))
+            scheduled = today + timedelta(days=rng.randint(1, 60))
+            state = 'new'
+        else:
+            created = today - timedelta(days=rng.randint(0, spread_days), seconds=rng.randint(0, 86399))
+            scheduled = created + timedelta(days=rng.randint(0, 30))
+            state = rng.choices(states, weights)[0]
+        
+        vals = {
+            'subject': f"Synthetic request {index + 1}",
+            'equipment_id': equipment_ids[position],
+            # Set up front; the model's auto-assignment would read the equipment
+            'maintenance_team_id': team_id,
+            'request_type': 'preventive' if rng.random() < PREVENTIVE_RATIO else 'corrective',
+            'scheduled_date': scheduled.date(),
+            'technician_id': rng.choice(members) if members else False,
+            'state': state,
+            'create_date': created,
+        }
+        if state == 'repaired':
+            vals['repaired_date'] = min(scheduled, today).date()
+            vals['duration'] = round(rng.uniform(0.5, 8.0), 1)
+        request_vals.append(vals)
+        if len(request_vals) == CREATE_BATCH_SIZE:
+            request_model.create_multi(request_vals)
+            request_vals = []
+    request_model.create_multi(request_vals)
+    
+    return {
+        'employee': len(employee_ids),
+        'maintenance.team': len(team_ids),
+        'equipment': len(equipment_ids),
+        'maintenance.request': requests if equipment_ids else 0,
+    }
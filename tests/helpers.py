@@ -0,0 +1,13 @@
+"""
+Helpers shared by the test modules
+"""
+import threading
+
+
+def in_thread(function):
+    """function() run in a thread of its own that has ended on return"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
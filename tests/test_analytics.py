@@ -0,0 +1,116 @@
+"""
+Columnar analytics engine: every figure against the same figure computed
+from model searches, on a fresh load and after creates, writes and unlinks
+"""
+import random
+import unittest
+from collections import Counter
+from datetime import timedelta
+
+from app import GearGuardApp
+from models.analytics import ANALYTICS_ENABLED, AnalyticsEngine
+from models.maintenance_request import MaintenanceRequest
+from models.storage import compact_storage_factory
+from synthetic_data import generate_fleet
+
+
+CRITICAL_HEALTH = 50
+
+
+@unittest.skipUnless(ANALYTICS_ENABLED, 'NumPy is required')
+class AnalyticsEngineTest(unittest.TestCase):
+    """AnalyticsEngine queries on memory and compact storage"""
+    
+    def fleets(self):
+        """(storage, environment) of one fleet per storage backend"""
+        for label, factory in (('memory', None), ('compact', compact_storage_factory)):
+            gear_app = GearGuardApp() if factory is None else GearGuardApp(storage_factory=factory)
+            generate_fleet(gear_app, employees=20, teams=4, equipment=60, requests=900, seed=6)
+            yield label, gear_app.env
+    
+    def in_service(self, env):
+        return env['equipment'].search([('is_scrapped', '=', False), ('active', '=', True)])
+    
+    def breakdowns(self, env, days):
+        cutoff = env.today() - timedelta(days=days)
+        return dict(Counter(
+            request['equipment_id'] for request in env['maintenance.request'].search([])
+            if request['request_type'] == 'corrective' and request['equipment_id']
+            and request['state'] in MaintenanceRequest.BREAKDOWN_STATES
+            and request['create_date'].date() >= cutoff
+        ))
+    
+    def assertMatchesModels(self, env, engine):
+        requests = env['maintenance.request'].search([])
+        in_service = self.in_service(env)
+        critical = [record for record in in_service if record['health_score'] < CRITICAL_HEALTH]
+        
+        self.assertEqual(engine.kpis(CRITICAL_HEALTH), {
+            'total_equipment': len(in_service),
+            'open_requests': sum(request['state'] in MaintenanceRequest.OPEN_STATES
+                                 for request in requests),
+            'overdue_requests': sum(bool(request['is_overdue']) for request in requests),
+            'critical_equipment': len(critical),
+        })
+        for field in ('state', 'request_type', 'equipment_id', 'maintenance_team_id', 'technician_id'):
+            self.assertEqual(engine.request_counts(field),
+                             dict(Counter(request[field] for request in requests if request[field])))
+        self.assertEqual(
+            engine.request_counts('technician_id', MaintenanceRequest.OPEN_STATES),
+            dict(Counter(request['technician_id'] for request in requests if request['technician_id']
+                         and request['state'] in MaintenanceRequest.OPEN_STATES)),
+        )
+        for days in (7, 30, 120):
+            self.assertEqual(engine.breakdown_counts(days), self.breakdowns(env, days))
+        
+        ranked = sorted(critical, key=lambda record: (record['health_score'], record['id']))
+        self.assertEqual(engine.critical_equipment_ids(CRITICAL_HEALTH, 5),
+                         [record['id'] for record in ranked[:5]])
+        breakdowns = self.breakdowns(env, 30)
+        self.assertEqual(engine.alert_equipment(CRITICAL_HEALTH, 2, 30), {
+            record['id']: breakdowns.get(record['id'], 0) for record in in_service
+            if record['health_score'] < CRITICAL_HEALTH or breakdowns.get(record['id'], 0) >= 2
+        })
+    
+    def test_loaded_columns_match_the_models(self):
+        for label, env in self.fleets():
+            with self.subTest(label):
+                self.assertMatchesModels(env, AnalyticsEngine(env))
+    
+    def test_writes_are_replayed(self):
+        for label, env in self.fleets():
+            with self.subTest(label):
+                engine = env.analytics
+                self.assertMatchesModels(env, engine)
+                requests, equipment = env['maintenance.request'], env['equipment']
+                rnd = random.Random(3)
+                for step in range(30):
+                    ids = rnd.sample([request['id'] for request in requests.search([])], 6)
+                    operation = rnd.random()
+                    if operation < 0.3:
+                        state = rnd.choice(['new', 'in_progress', 'repaired', 'scrap'])
+                        requests.write(ids, {'state': state})
+                    elif operation < 0.45:
+                        requests.write(ids, {'equipment_id': rnd.randint(1, 60), 'technician_id': False})
+                    elif operation < 0.6:
+                        requests.unlink(ids)
+                    elif operation < 0.8:
+                        requests.create_multi([{
+                            'subject': f'Breakdown {step}',
+                            'equipment_id': rnd.randint(1, 60),
+                            'request_type': 'corrective',
+                        } for _ in range(4)])
+                    else:
+                        equipment.write(rnd.sample(range(1, 61), 3), {'is_scrapped': rnd.random() < 0.5})
+                    if step % 5 == 4:
+                        self.assertMatchesModels(env, engine)
+                self.assertMatchesModels(env, engine)
+    
+    def test_unknown_states_are_ignored(self):
+        for label, env in self.fleets():
+            with self.subTest(label):
+                self.assertEqual(AnalyticsEngine(env).request_counts('state', ['missing']), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+ASGI app: JSON API on the event loop and worker thread, Flask UI through
+WsgiToAsgi, model calls serialized by the environment lock
+"""
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+try:
+    import asgi_app
+    from web_app import app as flask_app, gear_app
+except ImportError:  # Flask, asgiref
+    asgi_app = None
+
+
+def call(path, method='GET', headers=(), body=b''):
+    """(status, headers, body) of one request to the ASGI app"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'headers': list(headers), 'http_version': '1.1',
+        'scheme': 'http', 'root_path': '', 'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+    asyncio.run(asgi_app.app(scope, receive, send))
+    return (sent[0]['status'], dict(sent[0]['headers']),
+            b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+@unittest.skipIf(asgi_app is None, 'Flask and asgiref are required')
+class AsgiAppTest(unittest.TestCase):
+    """Requests driven through the ASGI entry point"""
+    
+    def test_api_matches_flask(self):
+        client = flask_app.test_client()
+        for path in ('/api/dashboard/kpis', '/api/dashboard/alerts',
+                     '/api/calendar/2025/3', '/api/equipment/1/health'):
+            status, headers, body = call(path)
+            response = client.get(path)
+            self.assertEqual(status, response.status_code, path)
+            self.assertEqual(json.loads(body), response.get_json(), path)
+            self.assertEqual(headers[b'content-type'], b'application/json')
+    
+    def test_api_errors(self):
+        self.assertEqual(call('/api/calendar/2025/13')[0], 400)
+        self.assertEqual(call('/api/equipment/999999/health')[0], 404)
+        status, headers, _ = call('/api/dashboard/kpis', method='POST')
+        self.assertEqual(status, 405)
+        self.assertEqual(headers[b'allow'], b'GET, HEAD')
+    
+    def test_head_has_no_body(self):
+        status, headers, body = call('/api/dashboard/kpis', method='HEAD')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'')
+        self.assertIn(b'etag', headers)
+    
+    def test_unchanged_data_answers_304(self):
+        _, headers, _ = call('/api/dashboard/kpis')
+        etag = headers[b'etag']
+        self.assertEqual(etag.decode(), flask_app.test_client().get('/api/dashboard/kpis').headers['ETag'])
+        status, headers, body = call('/api/dashboard/kpis', headers=[(b'if-none-match', b'W/' + etag)])
+        self.assertEqual((status, body), (304, b''))
+        self.assertEqual(headers[b'etag'], etag)
+        self.assertNotIn(b'etag', call('/api/equipment/999999/health')[1])
+        
+        # Checked after the handler ran: the equipment must exist
+        status, headers, body = call('/api/equipment/1/health', headers=[(b'if-none-match', etag)])
+        self.assertEqual((status, body), (304, b''))
+    
+    def test_invalid_paths_are_not_answered_304(self):
+        etag = call('/api/dashboard/kpis')[1][b'etag']
+        for path, status in (('/api/calendar/2026/13', 400), ('/api/equipment/999999/health', 404)):
+            with self.subTest(path):
+                response = call(path, headers=[(b'if-none-match', etag)])
+                self.assertEqual(response[0], status)
+                self.assertNotIn(b'etag', response[1])
+    
+    def test_busy_api_answers_503(self):
+        pending, asgi_app._api_pending = asgi_app._api_pending, asgi_app.API_MAX_PENDING
+        try:
+            status, headers, _ = call('/api/dashboard/alerts')
+        finally:
+            asgi_app._api_pending = pending
+        self.assertEqual(status, 503)
+        self.assertEqual(headers[b'retry-after'], b'1')
+    
+    def test_ui_served_through_wsgi_adapter(self):
+        status, _, body = call('/login')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, flask_app.test_client().get('/login').data)
+        
+        form = b'username=nobody&password=wrong'
+        status, _, body = call('/login', method='POST', body=form, headers=[
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', str(len(form)).encode()),
+        ])
+        self.assertEqual(status, 200)
+        self.assertIn(b'Invalid username or password', body)
+    
+    def test_model_calls_wait_for_the_environment_lock(self):
+        results = []
+        with gear_app.env.lock:
+            thread = threading.Thread(target=lambda: results.append(call('/api/dashboard/kpis')))
+            thread.start()
+            time.sleep(0.2)
+            self.assertEqual(results, [])  # Blocked while another thread holds the models
+        thread.join(10)
+        self.assertEqual(results[0][0], 200)
+        
+        results = []
+        with gear_app.env.lock:
+            thread = threading.Thread(target=lambda: results.append(call('/requests')))
+            thread.start()
+            time.sleep(0.2)
+            self.assertEqual(results, [])
+        thread.join(10)
+        self.assertEqual(results[0][0], 302)  # Login required
+    
+    def test_login_page_does_not_wait_for_the_models(self):
+        with gear_app.env.lock:
+            thread = threading.Thread(target=lambda: call('/login'))
+            thread.start()
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
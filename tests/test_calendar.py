@@ -0,0 +1,94 @@
+"""
+Calendar month feed: requests found through the date range indexes and
+the per-day JSON built from them
+"""
+import unittest
+from datetime import date, timedelta
+
+from app import GearGuardApp
+from synthetic_data import generate_fleet
+
+try:
+    from web_app import app as flask_app, gear_app as web_gear_app
+except ImportError:  # Flask
+    flask_app = None
+
+
+def month_bounds(day):
+    first = day.replace(day=1)
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+class SearchDateRangeTest(unittest.TestCase):
+    """search_date_range() against a scan of every request"""
+    
+    @classmethod
+    def setUpClass(cls):
+        gear_app = GearGuardApp()
+        generate_fleet(gear_app, employees=20, teams=4, equipment=30, requests=1200, seed=8)
+        cls.requests = gear_app.env['maintenance.request']
+    
+    def scan(self, start, end, state=None):
+        return [
+            request for request in self.requests.search([])
+            if (state is None or request['state'] == state) and any(
+                request[field] and start <= request[field] < end
+                for field in ('scheduled_date', 'repaired_date'))
+        ]
+    
+    def test_months_match_a_scan(self):
+        month = month_bounds(date.today())[0]
+        for _ in range(14):
+            start, end = month_bounds(month)
+            with self.subTest(start=start):
+                self.assertEqual(self.requests.search_date_range(start, end), self.scan(start, end))
+                self.assertEqual(self.requests.search_date_range(start.isoformat(), end.isoformat()),
+                                 self.scan(start, end))
+            month = start - timedelta(days=1)
+        self.assertTrue(self.scan(*month_bounds(date.today())))
+    
+    def test_extra_domain(self):
+        start, end = date.today() - timedelta(days=60), date.today()
+        self.assertEqual(self.requests.search_date_range(start, end, [('state', '=', 'repaired')]),
+                         self.scan(start, end, 'repaired'))
+
+
+@unittest.skipIf(flask_app is None, 'Flask is required')
+class CalendarFeedTest(unittest.TestCase):
+    """GET /api/calendar/<year>/<month> on the demo data"""
+    
+    def test_days_list_open_and_repaired_requests(self):
+        today = date.today()
+        response = flask_app.test_client().get(f'/api/calendar/{today.year}/{today.month}')
+        self.assertEqual(response.status_code, 200)
+        feed = response.get_json()
+        self.assertEqual((feed['year'], feed['month']), (today.year, today.month))
+        
+        start, end = month_bounds(today)
+        expected = {}
+        for request in web_gear_app.env['maintenance.request'].search_date_range(start, end):
+            if not request['equipment_id']:
+                continue
+            for field, states, status in (('repaired_date', ('repaired',), 'green'),
+                                          ('scheduled_date', ('new', 'in_progress'), 'red')):
+                day = request[field]
+                if day and start <= day < end and request['state'] in states:
+                    statuses = expected.setdefault(day.isoformat(), {})
+                    if statuses.get(request['equipment_id']) != 'red':  # Open requests win
+                        statuses[request['equipment_id']] = status
+        self.assertTrue(expected)
+        self.assertEqual(
+            {day: {entry['equipment_id']: entry['status'] for entry in entries}
+             for day, entries in feed['days'].items()},
+            expected,
+        )
+        self.assertEqual(list(feed['days']), sorted(feed['days']))
+    
+    def test_invalid_month(self):
+        response = flask_app.test_client().get('/api/calendar/2025/0')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'Invalid month'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Stored computed fields: writes mark the affected records dirty, and the
+next read recomputes them in one batch
+"""
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from app import GearGuardApp
+from models.equipment import Equipment
+
+
+# Requests are created now, so breakdowns count against the real date
+TODAY = date.today()
+
+
+class ComputedFieldsTest(unittest.TestCase):
+    """Equipment counters and health fed by maintenance requests"""
+    
+    def setUp(self):
+        self.gear_app = GearGuardApp()
+        self.gear_app.env.today = lambda: TODAY
+        self.equipment = self.gear_app.env['equipment']
+        self.requests = self.gear_app.env['maintenance.request']
+        self.press, self.lathe = self.equipment.create_multi([{'name': 'Press'}, {'name': 'Lathe'}])
+    
+    def fields(self, equipment_id):
+        record = self.equipment.browse([equipment_id])[0]
+        return (record['maintenance_requests_count'], record['open_requests_count'],
+                record['health_score'])
+    
+    def test_new_requests_update_counters(self):
+        self.assertEqual(self.fields(self.press), (0, 0, 100))
+        self.requests.create_multi([
+            {'subject': 'Leak', 'equipment_id': self.press},
+            {'subject': 'Noise', 'equipment_id': self.press},
+            {'subject': 'Check', 'equipment_id': self.press, 'request_type': 'preventive'},
+        ])
+        self.assertEqual(self.fields(self.press), (3, 3, 100))
+        self.assertEqual(self.fields(self.lathe), (0, 0, 100))
+    
+    def test_repaired_breakdowns_lower_health(self):
+        leak, noise, check = self.requests.create_multi([
+            {'subject': 'Leak', 'equipment_id': self.press},
+            {'subject': 'Noise', 'equipment_id': self.press},
+            {'subject': 'Check', 'equipment_id': self.press, 'request_type': 'preventive'},
+        ])
+        for request_id in (leak, noise, check):
+            self.requests.action_repair(request_id, duration=1.0)
+        self.assertEqual(self.fields(self.press), (3, 0, 70))
+    
+    def test_state_changes_and_unlinks_are_tracked(self):
+        leak, noise = self.requests.create_multi([
+            {'subject': 'Leak', 'equipment_id': self.press, 'request_type': 'preventive'},
+            {'subject': 'Noise', 'equipment_id': self.press, 'request_type': 'preventive'},
+        ])
+        self.requests.action_repair(leak, duration=1.0)
+        self.assertEqual(self.fields(self.press), (2, 1, 100))
+        self.requests.unlink([noise])
+        self.assertEqual(self.fields(self.press), (1, 0, 100))
+    
+    def test_moved_request_recomputes_old_and_new_equipment(self):
+        leak, = self.requests.create_multi([{'subject': 'Leak', 'equipment_id': self.press}])
+        self.requests.action_repair(leak, duration=1.0)
+        self.assertEqual(self.fields(self.press), (1, 0, 85))
+        self.requests.write([leak], {'equipment_id': self.lathe})
+        self.assertEqual(self.fields(self.press), (0, 0, 100))
+        self.assertEqual(self.fields(self.lathe), (1, 0, 85))
+    
+    def test_overdue_follows_scheduled_date_and_state(self):
+        late, = self.requests.create_multi([{
+            'subject': 'Late', 'equipment_id': self.press, 'request_type': 'preventive',
+            'scheduled_date': TODAY - timedelta(days=2),
+        }])
+        self.assertTrue(self.requests.browse([late])[0]['is_overdue'])
+        self.assertEqual(self.fields(self.press), (1, 1, 90))
+        
+        self.requests.write([late], {'scheduled_date': TODAY + timedelta(days=2)})
+        self.assertFalse(self.requests.browse([late])[0]['is_overdue'])
+        self.assertEqual(self.fields(self.press), (1, 1, 100))
+        
+        self.requests.write([late], {'scheduled_date': TODAY - timedelta(days=1)})
+        self.requests.action_repair(late, duration=1.0)
+        self.assertFalse(self.requests.browse([late])[0]['is_overdue'])
+    
+    def test_health_recovers_when_breakdowns_age_out(self):
+        env, dashboard = self.gear_app.env, self.gear_app.env['dashboard']
+        leaks = self.requests.create_multi([{'subject': 'Leak %d' % n, 'equipment_id': self.press}
+                                            for n in range(5)])
+        for request_id in leaks:
+            self.requests.action_repair(request_id, duration=1.0)
+        env.flush()
+        self.assertEqual(self.fields(self.press), (5, 0, 25))
+        self.assertEqual([item['equipment_id'] for item in dashboard.get_critical_equipment()], [self.press])
+        
+        env.today = lambda: TODAY + timedelta(days=30)
+        self.assertEqual(self.gear_app.overdue_sweeper.sweep(), [])
+        self.assertEqual(self.fields(self.press), (5, 0, 25))
+        
+        env.today = lambda: TODAY + timedelta(days=31)
+        self.gear_app.overdue_sweeper.sweep()
+        self.assertEqual(self.fields(self.press), (5, 0, 100))
+        self.assertEqual(dashboard.get_critical_equipment(), [])
+        
+        # Breakdowns back inside the window when the clock is set back
+        env.today = lambda: TODAY
+        env.flush()
+        self.assertEqual(self.fields(self.press), (5, 0, 25))
+    
+    def test_first_expiry_covers_scores_stored_before_a_restart(self):
+        leak, = self.requests.create_multi([{'subject': 'Leak', 'equipment_id': self.press}])
+        self.requests.action_repair(leak, duration=1.0)
+        self.assertEqual(self.equipment.expire_breakdowns(), [])
+        self.assertEqual(self.fields(self.press), (1, 0, 85))
+        
+        self.gear_app.env.today = lambda: TODAY + timedelta(days=40)
+        self.equipment._breakdown_cutoff = None  # As after a restart
+        self.assertEqual(self.equipment.expire_breakdowns(), [self.press])
+        self.assertEqual(self.equipment.expire_breakdowns(), [])
+        self.assertEqual(self.fields(self.press), (1, 0, 100))
+    
+    def test_unrelated_writes_recompute_nothing(self):
+        leak, = self.requests.create_multi([{'subject': 'Leak', 'equipment_id': self.press}])
+        self.equipment.browse([self.press])
+        self.requests.write([leak], {'description': 'Oil on the floor'})
+        self.equipment.write([self.press], {'location': 'Hall B'})
+        self.assertEqual(self.equipment._dirty, {})
+        self.assertEqual(self.requests._dirty, {})
+    
+    def test_pending_fields_recomputed_once_per_batch(self):
+        self.equipment.browse([self.press])
+        self.requests.create_multi([{'subject': 'Leak %d' % n, 'equipment_id': self.press} for n in range(5)])
+        requests = self.requests.search([])
+        for request in requests:
+            self.requests.write([request['id']], {'state': 'repaired'})
+        self.assertEqual(self.equipment._dirty['open_requests_count'], {self.press})
+        
+        compute = Equipment._compute_open_requests_count
+        with mock.patch.object(Equipment, '_compute_open_requests_count', autospec=True,
+                               side_effect=compute) as spy:
+            self.assertEqual(self.fields(self.press), (5, 0, 25))
+            self.fields(self.press)
+        spy.assert_called_once_with(self.equipment, [self.press])
+
+
+if __name__ == '__main__':
+    unittest.main()
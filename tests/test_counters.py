@@ -0,0 +1,101 @@
+"""
+Sliding-window breakdown counters, on their own and kept in step with
+maintenance request writes
+"""
+import random
+import unittest
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from app import GearGuardApp
+from models.counters import SlidingWindowCounter
+from synthetic_data import generate_fleet
+
+
+# Counters expire buckets against the real date
+TODAY = date.today()
+
+
+class SlidingWindowCounterTest(unittest.TestCase):
+    """Day-bucketed counts per key"""
+    
+    def setUp(self):
+        self.counter = SlidingWindowCounter(retention_days=90)
+    
+    def test_windows(self):
+        for days_ago, key in ((0, 'a'), (1, 'a'), (7, 'a'), (30, 'b'), (31, 'b'), (45, 'a')):
+            self.counter.add(key, datetime.combine(TODAY - timedelta(days=days_ago), datetime.min.time()))
+        self.assertEqual(self.counter.counts(1, today=TODAY), {'a': 2})
+        self.assertEqual(self.counter.counts(30, today=TODAY), {'a': 3, 'b': 1})
+        self.assertEqual(self.counter.counts(90, ['b', 'c'], today=TODAY), {'b': 2})
+        self.assertEqual(self.counter.count('a', 60, today=TODAY), 4)
+    
+    def test_remove_and_unset_events(self):
+        self.counter.add('a', TODAY)
+        self.counter.add('a', TODAY)
+        self.counter.add(None, TODAY)
+        self.counter.add('a', False)
+        self.counter.remove('a', TODAY)
+        self.assertEqual(self.counter.counts(7, today=TODAY), {'a': 1})
+        self.counter.remove('a', TODAY)
+        self.assertEqual(self.counter.counts(7, today=TODAY), {})
+        self.assertEqual(self.counter._buckets, {})
+    
+    def test_old_events_expire(self):
+        self.counter.add('a', TODAY - timedelta(days=91))
+        self.counter.add('a', TODAY - timedelta(days=89))
+        self.assertEqual(self.counter.counts(90), {'a': 1})
+        self.assertEqual(len(self.counter._buckets['a']), 1)
+    
+    def test_keys_between(self):
+        for days_ago, key in ((0, 'a'), (10, 'b'), (31, 'c'), (40, 'a')):
+            self.counter.add(key, TODAY - timedelta(days=days_ago))
+        self.assertEqual(self.counter.keys_between(TODAY - timedelta(days=40), TODAY - timedelta(days=30)),
+                         {'a', 'c'})
+        self.assertEqual(self.counter.keys_between(TODAY - timedelta(days=10), TODAY), {'b'})
+        self.assertEqual(self.counter.keys_between(TODAY, TODAY), set())
+    
+    def test_window_longer_than_retention(self):
+        with self.assertRaises(ValueError):
+            self.counter.counts(91)
+
+
+class BreakdownCountsTest(unittest.TestCase):
+    """Counters of a fleet against a grouped search, through writes and unlinks"""
+    
+    def setUp(self):
+        self.gear_app = GearGuardApp()
+        generate_fleet(self.gear_app, employees=20, teams=4, equipment=30, requests=800, seed=5)
+        self.requests = self.gear_app.env['maintenance.request']
+    
+    def expected(self, days):
+        cutoff = TODAY - timedelta(days=days)
+        return dict(Counter(
+            request['equipment_id'] for request in self.requests.search([])
+            if request['request_type'] == 'corrective' and request['state'] in ('repaired', 'scrap')
+            and request['equipment_id'] and request['create_date'].date() >= cutoff
+        ))
+    
+    def test_counts_follow_writes_and_unlinks(self):
+        self.assertEqual(self.requests.get_breakdown_counts(days=30), self.expected(30))
+        rnd = random.Random(2)
+        for _ in range(50):
+            ids = rnd.sample([request['id'] for request in self.requests.search([])], 5)
+            operation = rnd.random()
+            if operation < 0.4:
+                self.requests.write(ids, {'state': rnd.choice(['new', 'repaired', 'scrap'])})
+            elif operation < 0.6:
+                self.requests.write(ids, {'request_type': rnd.choice(['preventive', 'corrective'])})
+            elif operation < 0.8:
+                self.requests.write(ids, {'equipment_id': rnd.randint(1, 30)})
+            else:
+                self.requests.unlink(ids)
+            for days in (7, 30, 90):
+                self.assertEqual(self.requests.get_breakdown_counts(days=days), self.expected(days))
+        # Past the retention, the grouped search answers
+        self.assertEqual(self.requests.get_breakdown_counts(days=365), self.expected(365))
+        self.assertEqual(self.requests.get_breakdown_count(1, days=30), self.expected(30).get(1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
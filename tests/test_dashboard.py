@@ -0,0 +1,170 @@
+"""
+Dashboard figures checked against plain computations over the records,
+with and without the NumPy analytics engine
+"""
+import time
+import unittest
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+
+from app import GearGuardApp
+from synthetic_data import generate_fleet
+
+
+OPEN_STATES = ('new', 'in_progress')
+
+
+class DashboardTest(unittest.TestCase):
+    """Dashboard of a seeded synthetic fleet"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.gear_app = GearGuardApp()
+        generate_fleet(cls.gear_app, employees=45, teams=8, equipment=80, requests=1500, seed=3)
+        cls.env = cls.gear_app.env
+        cls.env.flush()
+        cls.analytics = cls.env.analytics  # None without NumPy
+    
+    def tearDown(self):
+        self.env.analytics = self.analytics
+    
+    def dashboards(self):
+        """Yield (label, Dashboard) querying the models, then the analytics engine if built"""
+        self.env.analytics = None
+        yield 'models', self.env['dashboard']
+        if self.analytics is not None:
+            self.env.analytics = self.analytics
+            yield 'analytics', self.env['dashboard']
+    
+    def test_technician_workloads_list_every_technician_busiest_first(self):
+        requests = self.env['maintenance.request'].search([])
+        open_counts = Counter(request['technician_id'] for request in requests
+                              if request['state'] in OPEN_STATES)
+        technicians = self.env['employee'].get_technicians()
+        self.assertGreater(len(technicians), 20)
+        expected = sorted((
+            {'technician_id': technician['id'], 'technician_name': technician['name'],
+             'workload': open_counts.get(technician['id'], 0)}
+            for technician in technicians
+        ), key=lambda x: x['workload'], reverse=True)
+        
+        for label, dashboard in self.dashboards():
+            with self.subTest(label):
+                self.assertEqual(dashboard.get_technician_workloads(), expected)
+    
+    def test_critical_equipment_lowest_health_first(self):
+        equipment = [record for record in self.env['equipment'].search([])
+                     if record['health_score'] < 40 and not record['is_scrapped'] and record['active']]
+        equipment.sort(key=lambda record: (record['health_score'], record['id']))
+        expected = [record['id'] for record in equipment[:10]]
+        self.assertTrue(expected)
+        
+        for label, dashboard in self.dashboards():
+            with self.subTest(label):
+                ranked = dashboard.get_critical_equipment()
+                self.assertEqual([row['equipment_id'] for row in ranked], expected)
+                self.assertEqual([row['equipment_id'] for row in dashboard.get_critical_equipment(3)],
+                                 expected[:3])
+    
+    def test_kpis_and_charts(self):
+        requests = self.env['maintenance.request'].search([])
+        equipment = self.env['equipment'].search([])
+        in_service = [record for record in equipment if not record['is_scrapped'] and record['active']]
+        expected_kpis = {
+            'total_equipment': len(in_service),
+            'open_requests': sum(1 for request in requests if request['state'] in OPEN_STATES),
+            'overdue_requests': sum(1 for request in requests if request['is_overdue']),
+            'critical_equipment': sum(1 for record in in_service if record['health_score'] < 40),
+        }
+        types = Counter(request['request_type'] for request in requests)
+        teams = Counter(request['maintenance_team_id'] for request in requests)
+        
+        for label, dashboard in self.dashboards():
+            with self.subTest(label):
+                self.assertEqual(dashboard.get_kpis(), expected_kpis)
+                self.assertEqual(dashboard.get_preventive_vs_corrective(),
+                                 {'preventive': types['preventive'], 'corrective': types['corrective']})
+                self.assertEqual({row['team_id']: row['request_count']
+                                  for row in dashboard.get_requests_per_team()},
+                                 {team['id']: teams.get(team['id'], 0)
+                                  for team in self.env['maintenance.team'].search([])})
+    
+    def test_predictive_alerts_match_plain_computation(self):
+        cutoff = self.env.today() - timedelta(days=30)
+        breakdowns = Counter(
+            request['equipment_id'] for request in self.env['maintenance.request'].search([])
+            if request['request_type'] == 'corrective' and request['state'] in ('repaired', 'scrap')
+            and request['create_date'].date() >= cutoff
+        )
+        expected = [
+            (record['id'], breakdowns.get(record['id'], 0), record['health_score'])
+            for record in self.env['equipment'].search([])
+            if not record['is_scrapped'] and record['active']
+            and (breakdowns.get(record['id'], 0) >= 3 or record['health_score'] < 40)
+        ]
+        self.assertTrue(expected)
+        
+        for label, dashboard in self.dashboards():
+            with self.subTest(label):
+                alerts = dashboard.get_predictive_alerts()
+                self.assertEqual([(alert['equipment_id'], alert['breakdown_count'], alert['health_score'])
+                                  for alert in alerts], expected)
+                for alert in alerts:
+                    self.assertEqual(alert['severity'],
+                                     'critical' if alert['health_score'] < 40 else 'warning')
+    
+    def test_predictive_alerts_agree(self):
+        results = {label: dashboard.get_predictive_alerts() for label, dashboard in self.dashboards()}
+        self.assertTrue(results['models'])
+        for alert in results['models']:
+            self.assertTrue(alert['breakdown_count'] >= 3 or alert['health_score'] < 40)
+        if 'analytics' in results:
+            self.assertEqual(results['analytics'], results['models'])
+
+
+class DashboardCacheTest(unittest.TestCase):
+    """Dashboard sections cached by data version, date-dependent ones for a TTL"""
+    
+    def setUp(self):
+        self.gear_app = GearGuardApp()
+        self.gear_app.setup_demo_data()
+        self.dashboard = self.gear_app.env['dashboard']
+    
+    def test_sections_match_the_dashboard(self):
+        data = self.gear_app.get_dashboard_data()
+        for section, (method_name, _) in GearGuardApp.DASHBOARD_SECTIONS.items():
+            with self.subTest(section):
+                self.assertEqual(data[section], getattr(self.dashboard, method_name)())
+    
+    def test_served_from_cache_until_data_changes(self):
+        with mock.patch.object(self.dashboard, 'get_requests_per_team',
+                               wraps=self.dashboard.get_requests_per_team) as compute:
+            first = self.gear_app.get_dashboard_section('requests_per_team')
+            self.assertIs(self.gear_app.get_dashboard_section('requests_per_team'), first)
+            self.assertEqual(compute.call_count, 1)
+            
+            team_id = first[0]['team_id']
+            self.gear_app.env['maintenance.request'].create({'subject': 'Cache check',
+                                                            'maintenance_team_id': team_id})
+            second = self.gear_app.get_dashboard_section('requests_per_team')
+            self.assertEqual(compute.call_count, 2)
+            self.assertEqual(second[0]['request_count'], first[0]['request_count'] + 1)
+    
+    def test_date_dependent_sections_expire(self):
+        now = time.monotonic()
+        with mock.patch.object(self.dashboard, 'get_kpis', wraps=self.dashboard.get_kpis) as kpis, \
+                mock.patch.object(self.dashboard, 'get_preventive_vs_corrective',
+                                  wraps=self.dashboard.get_preventive_vs_corrective) as chart, \
+                mock.patch('app.time.monotonic', return_value=now):
+            self.gear_app.get_dashboard_data()
+            self.gear_app.get_dashboard_data()
+            self.assertEqual((kpis.call_count, chart.call_count), (1, 1))
+            
+            with mock.patch('app.time.monotonic', return_value=now + GearGuardApp.DASHBOARD_CACHE_TTL + 1):
+                self.gear_app.get_dashboard_data()
+            self.assertEqual((kpis.call_count, chart.call_count), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
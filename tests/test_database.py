@@ -0,0 +1,174 @@
+"""
+Database connections and transactions: a pooled connection per thread,
+one commit per unit of work, rollback on error, savepoints for nested
+blocks
+"""
+import os
+import tempfile
+import threading
+import unittest
+
+from database import Database
+from helpers import in_thread
+from models.maintenance_team import MaintenanceTeam
+from models.storage import SQLiteStorage
+
+
+class DatabaseTest(unittest.TestCase):
+    """Transactions on a scratch database file"""
+    
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self._tmpdir.name, 'gearguard.db'))
+    
+    def tearDown(self):
+        self.db.close()
+        self._tmpdir.cleanup()
+    
+    def team_names(self):
+        return [row['name'] for row in self.db.fetch_all("SELECT name FROM maintenance_teams ORDER BY id")]
+    
+    def committed_team_names(self):
+        """Team names as another thread's connection sees them"""
+        return in_thread(self.team_names)
+    
+    def insert_team(self, name):
+        self.db.execute("INSERT INTO maintenance_teams (name) VALUES (?)", (name,))
+    
+    def test_commits_once_at_the_end(self):
+        with self.db.transaction():
+            self.assertTrue(self.db.in_transaction())
+            self.insert_team('Mechanics')
+            self.insert_team('Electricians')
+            self.assertEqual(self.team_names(), ['Mechanics', 'Electricians'])
+            self.assertEqual(self.committed_team_names(), [])
+        self.assertFalse(self.db.in_transaction())
+        self.assertEqual(self.committed_team_names(), ['Mechanics', 'Electricians'])
+    
+    def test_error_rolls_back_everything(self):
+        self.insert_team('Mechanics')
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.insert_team('Electricians')
+                self.db.execute("UPDATE maintenance_teams SET name = 'Renamed'")
+                raise ValueError('abort')
+        self.assertFalse(self.db.in_transaction())
+        self.assertEqual(self.team_names(), ['Mechanics'])
+        self.assertEqual(self.committed_team_names(), ['Mechanics'])
+    
+    def test_nested_block_rolls_back_to_its_savepoint(self):
+        with self.db.transaction():
+            self.insert_team('Mechanics')
+            with self.assertRaises(ValueError):
+                with self.db.transaction():
+                    self.insert_team('Electricians')
+                    raise ValueError('abort')
+            with self.db.transaction():
+                self.insert_team('Painters')
+            self.assertEqual(self.committed_team_names(), [])
+        self.assertEqual(self.committed_team_names(), ['Mechanics', 'Painters'])
+    
+    def test_executemany_commits_once(self):
+        self.db.executemany("INSERT INTO maintenance_teams (name) VALUES (?)",
+                            [('Team %d' % n,) for n in range(500)])
+        self.assertEqual(len(self.committed_team_names()), 500)
+        
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.db.executemany("INSERT INTO maintenance_teams (name) VALUES (?)",
+                                    [('Extra %d' % n,) for n in range(10)])
+                raise ValueError('abort')
+        self.assertEqual(len(self.team_names()), 500)
+    
+    def test_storage_writes_join_the_outer_transaction(self):
+        storage = SQLiteStorage(self.db, 'maintenance_teams', MaintenanceTeam._columns,
+                                many2many=MaintenanceTeam._many2many)
+        kept = storage.insert({'name': 'Mechanics', 'technician_ids': [1, 2]})
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                storage.insert({'name': 'Electricians', 'technician_ids': [3]})
+                storage.update([kept['id']], {'name': 'Renamed', 'technician_ids': [4]})
+                storage.delete([kept['id']])
+                raise ValueError('abort')
+        self.assertEqual(storage.search([]), [kept])
+        self.assertEqual(kept['technician_ids'], [1, 2])
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """Per-thread connections in WAL mode, returned to an idle pool"""
+    
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmpdir.name, 'gearguard.db')
+    
+    def tearDown(self):
+        self._tmpdir.cleanup()
+    
+    def open(self, **kwargs):
+        database = Database(self.path, **kwargs)
+        self.addCleanup(database.close)
+        return database
+    
+    def test_connections_are_per_thread_and_configured(self):
+        database = self.open(busy_timeout=1234)
+        conn = database.get_connection()
+        self.assertIs(database.conn, conn)
+        self.assertIsNot(in_thread(database.get_connection), conn)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA busy_timeout').fetchone()[0], 1234)
+    
+    def test_finished_threads_return_their_connection(self):
+        database = self.open()
+        database.get_connection()
+        first = in_thread(database.get_connection)
+        self.assertEqual(database._idle_connections, [first])
+        self.assertIs(in_thread(database.get_connection), first)
+    
+    def test_open_transaction_is_rolled_back_on_return(self):
+        database = self.open()
+        
+        def abandon():
+            conn = database.get_connection()
+            conn.execute('BEGIN')
+            conn.execute("INSERT INTO maintenance_teams (name) VALUES ('Lost')")
+            return conn
+        
+        conn = in_thread(abandon)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(database.fetch_all("SELECT name FROM maintenance_teams"), [])
+    
+    def test_idle_pool_is_capped(self):
+        database = self.open(max_idle_connections=1)
+        barrier = threading.Barrier(3)
+        
+        def connect():
+            database.get_connection()
+            barrier.wait()  # Three connections open at once
+        
+        threads = [threading.Thread(target=connect) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(database._idle_connections), 1)
+        self.assertEqual(len(database._connections), 2)  # With the main thread's, from setup
+    
+    def test_readers_do_not_wait_for_a_writer(self):
+        database = self.open(busy_timeout=100)
+        database.execute("INSERT INTO maintenance_teams (name) VALUES ('Mechanics')")
+        with database.transaction():
+            database.execute("UPDATE maintenance_teams SET name = 'Renamed'")
+            self.assertEqual(in_thread(lambda: database.fetch_one("SELECT name FROM maintenance_teams")),
+                             {'name': 'Mechanics'})
+    
+    def test_in_memory_database_shares_one_connection(self):
+        database = Database(':memory:')
+        self.addCleanup(database.close)
+        database.execute("INSERT INTO maintenance_teams (name) VALUES ('Mechanics')")
+        self.assertIs(in_thread(database.get_connection), database.get_connection())
+        self.assertEqual(in_thread(lambda: database.fetch_all("SELECT name FROM maintenance_teams")),
+                         [{'name': 'Mechanics'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Date fields: values parsed once at the model boundary and kept as date /
+datetime objects on every storage backend
+"""
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from app import GearGuardApp
+from database import Database
+from models.dates import to_date, to_datetime
+from models.storage import compact_storage_factory, sqlite_storage_factory
+
+
+class ParseTest(unittest.TestCase):
+    """to_date() and to_datetime()"""
+    
+    def test_to_date(self):
+        for value, expected in (
+            (date(2025, 3, 4), date(2025, 3, 4)),
+            (datetime(2025, 3, 4, 10, 30), date(2025, 3, 4)),
+            ('2025-03-04', date(2025, 3, 4)),
+            ('2025-03-04 10:30:00', date(2025, 3, 4)),
+            (False, False),
+            ('', False),
+            (None, None),
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(to_date(value), expected)
+                self.assertIs(type(to_date(value)), type(expected))
+    
+    def test_to_datetime(self):
+        for value, expected in (
+            (datetime(2025, 3, 4, 10, 30), datetime(2025, 3, 4, 10, 30)),
+            (date(2025, 3, 4), datetime(2025, 3, 4)),
+            ('2025-03-04', datetime(2025, 3, 4)),
+            ('2025-03-04 10:30:00', datetime(2025, 3, 4, 10, 30)),
+            (False, False),
+            (None, None),
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(to_datetime(value), expected)
+    
+    def test_invalid_values(self):
+        for parse in (to_date, to_datetime):
+            for value in ('04/03/2025', 'soon', 20250304):
+                with self.subTest(parse.__name__, value=value):
+                    with self.assertRaises(ValueError):
+                        parse(value)
+
+
+class DateFieldsTest(unittest.TestCase):
+    """Date strings given to create, write and domains, on each storage backend"""
+    
+    def environments(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        database = Database(os.path.join(tmpdir.name, 'gearguard.db'))
+        self.addCleanup(database.close)
+        for label, storage_factory in (('memory', None), ('compact', compact_storage_factory),
+                                       ('sqlite', sqlite_storage_factory(database))):
+            env = GearGuardApp(storage_factory=storage_factory).env
+            env['equipment'].create_multi([{'name': 'Press', 'purchase_date': '2020-05-01'}])
+            yield label, env
+    
+    def test_values_are_stored_as_dates(self):
+        for label, env in self.environments():
+            with self.subTest(label):
+                requests = env['maintenance.request']
+                vals = {'subject': 'Belt', 'equipment_id': 1, 'scheduled_date': '2025-03-04'}
+                request_id, = requests.create_multi([vals])
+                self.assertEqual(vals['scheduled_date'], '2025-03-04')  # Not modified
+                
+                request = requests.browse([request_id])[0]
+                self.assertEqual(request['scheduled_date'], date(2025, 3, 4))
+                self.assertIsInstance(request['create_date'], datetime)
+                self.assertEqual(env['equipment'].browse([1])[0]['purchase_date'], date(2020, 5, 1))
+                
+                requests.write([request_id], {'scheduled_date': '2025-04-01 08:00:00',
+                                              'repaired_date': datetime(2025, 4, 2, 17, 0)})
+                request = requests.browse([request_id])[0]
+                self.assertEqual((request['scheduled_date'], request['repaired_date']),
+                                 (date(2025, 4, 1), date(2025, 4, 2)))
+                
+                requests.write([request_id], {'repaired_date': False})
+                self.assertFalse(requests.browse([request_id])[0]['repaired_date'])
+                with self.assertRaises(ValueError):
+                    requests.write([request_id], {'scheduled_date': 'next week'})
+    
+    def test_domains_accept_strings(self):
+        for label, env in self.environments():
+            with self.subTest(label):
+                requests = env['maintenance.request']
+                requests.create_multi([
+                    {'subject': f'Check {day}', 'equipment_id': 1, 'scheduled_date': date(2025, 3, day)}
+                    for day in range(1, 11)
+                ])
+                for domain, days in (
+                    ([('scheduled_date', '>=', '2025-03-08')], [8, 9, 10]),
+                    ([('scheduled_date', '<', date(2025, 3, 3))], [1, 2]),
+                    ([('scheduled_date', '=', '2025-03-05')], [5]),
+                    ([('scheduled_date', 'in', ['2025-03-02', date(2025, 3, 9)])], [2, 9]),
+                    ([('create_date', '<', '2000-01-01')], []),
+                ):
+                    with self.subTest(domain=domain):
+                        self.assertEqual(
+                            [request['scheduled_date'].day for request in requests.search(domain)], days)
+                self.assertEqual(requests.search_count([('scheduled_date', '<=', '2025-03-04 23:59:59')]), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
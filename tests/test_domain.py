@@ -0,0 +1,78 @@
+"""
+Domain compilation: predicates behave like the original per-condition
+checks, and domains of one shape share a generated function
+"""
+import unittest
+from unittest import mock
+
+from models import domain as domain_module
+from models.domain import compile_domain
+
+
+RECORDS = [
+    {'id': 1, 'state': 'new', 'duration': 2.5, 'team_id': 3},
+    {'id': 2, 'state': 'repaired', 'duration': 0.0, 'team_id': False},
+    {'id': 3, 'state': 'new', 'duration': False},
+    {'id': 4, 'state': 'scrap', 'duration': None, 'team_id': 3},
+]
+
+
+def matching_ids(domain):
+    predicate = compile_domain(domain)
+    return [record['id'] for record in RECORDS if predicate(record)]
+
+
+class CompileDomainTest(unittest.TestCase):
+    """Predicates compiled from domains"""
+    
+    def test_operators(self):
+        for domain, expected in (
+            ([('state', '=', 'new')], [1, 3]),
+            ([('state', '!=', 'new')], [2, 4]),
+            ([('state', 'in', ['new', 'scrap'])], [1, 3, 4]),
+            ([('state', 'not in', ('new',))], [2, 4]),
+            ([('team_id', '=', False)], [2]),
+            ([('team_id', '=', None)], [3]),
+            ([('duration', '>', 0)], [1]),
+            ([('duration', '>=', 0)], [1, 2]),
+            ([('duration', '<', 3)], [1, 2]),
+            ([('duration', '<=', 0.0)], [2]),
+            ([('state', '=', 'new'), ('team_id', '=', 3)], [1]),
+            ([], [1, 2, 3, 4]),
+            (None, [1, 2, 3, 4]),
+        ):
+            with self.subTest(domain=domain):
+                self.assertEqual(matching_ids(domain), expected)
+    
+    def test_ordering_never_matches_unset_values(self):
+        self.assertEqual(matching_ids([('duration', '<', 100)]), [1, 2])
+        self.assertEqual(matching_ids([('team_id', '<=', 3)]), [1, 4])
+    
+    def test_unknown_operators_and_markers_are_ignored(self):
+        self.assertEqual(matching_ids([('state', 'like', 'n%')]), [1, 2, 3, 4])
+        self.assertEqual(matching_ids(['&', ('state', '=', 'new'), ('id', '>', 1)]), [3])
+    
+    def test_unhashable_in_values(self):
+        self.assertEqual(matching_ids([('state', 'in', [['new'], 'scrap'])]), [4])
+    
+    def test_same_shape_shares_one_function(self):
+        with mock.patch.dict(domain_module._predicate_factories, clear=True), \
+                mock.patch.object(domain_module, '_build_predicate_factory',
+                                  wraps=domain_module._build_predicate_factory) as build:
+            self.assertEqual(matching_ids([('state', '=', 'new'), ('duration', '>', 1)]), [1])
+            self.assertEqual(matching_ids([('state', '=', 'repaired'), ('duration', '>', -1)]), [2])
+            self.assertEqual(build.call_count, 1)
+            matching_ids([('duration', '>', 1), ('state', '=', 'new')])
+            self.assertEqual(build.call_count, 2)
+    
+    def test_cache_is_bounded(self):
+        with mock.patch.dict(domain_module._predicate_factories, clear=True), \
+                mock.patch.object(domain_module, '_PREDICATE_CACHE_SIZE', 4):
+            for number in range(10):
+                compile_domain([('field_%d' % number, '=', 1)])
+                self.assertLessEqual(len(domain_module._predicate_factories), 4)
+            self.assertTrue(compile_domain([('field_9', '=', 1)])({'field_9': 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
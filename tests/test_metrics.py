@@ -0,0 +1,170 @@
+"""
+Metrics registry: histograms, the Prometheus text rendering, ORM call
+instrumentation and the /api/_metrics route
+"""
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app import GearGuardApp
+from metrics import LATENCY_BUCKETS, Histogram, Metrics
+from models import base as base_module
+
+try:
+    import web_app
+    from web_app import app as flask_app, gear_app
+except ImportError:  # Flask
+    flask_app = None
+
+
+def sample_lines(text, prefix):
+    """Sample name and labels -> value, for the lines starting with prefix"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+class HistogramTest(unittest.TestCase):
+    """Observation counts per upper bound"""
+    
+    def test_cumulative_samples(self):
+        histogram = Histogram((1, 5, 10))
+        for value in (0, 1, 2, 5, 7, 50):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.samples()), [('1', 2), ('5', 4), ('10', 5), ('+Inf', 6)])
+        self.assertEqual((histogram.sum, histogram.count), (65, 6))
+
+
+class MetricsTest(unittest.TestCase):
+    """A registry of its own, observed directly"""
+    
+    def setUp(self):
+        self.metrics = Metrics()
+    
+    def test_render(self):
+        self.metrics.observe('orm', (('model', 'equipment'), ('operation', 'search')), 0.002, 10)
+        self.metrics.observe('orm', (('model', 'equipment'), ('operation', 'search')), 0.2, 5)
+        self.metrics.observe('db', (('operation', 'fetch_all'),), 0.01, 3)
+        text = self.metrics.render()
+        
+        self.assertIn('# TYPE gearguard_orm_operation_seconds histogram', text)
+        self.assertIn('# TYPE gearguard_orm_records_total counter', text)
+        labels = 'model="equipment",operation="search"'
+        self.assertEqual(sample_lines(text, 'gearguard_orm_records_total'),
+                         {'gearguard_orm_records_total{%s}' % labels: 15})
+        buckets = sample_lines(text, 'gearguard_orm_operation_seconds_bucket')
+        self.assertEqual(len(buckets), len(LATENCY_BUCKETS) + 1)
+        self.assertEqual(buckets['gearguard_orm_operation_seconds_bucket{%s,le="0.0025"}' % labels], 1)
+        self.assertEqual(buckets['gearguard_orm_operation_seconds_bucket{%s,le="+Inf"}' % labels], 2)
+        self.assertEqual(sample_lines(text, 'gearguard_orm_operation_seconds_count'),
+                         {'gearguard_orm_operation_seconds_count{%s}' % labels: 2})
+        self.assertEqual(sample_lines(text, 'gearguard_db_rows_total'),
+                         {'gearguard_db_rows_total{operation="fetch_all"}': 3})
+        self.assertNotIn('gearguard_http', text)
+    
+    def test_label_values_are_escaped(self):
+        self.metrics.observe('db', (('operation', 'a"b\\c\nd'),), 0.001, 1)
+        self.assertIn('gearguard_db_rows_total{operation="a\\"b\\\\c\\nd"} 1', self.metrics.render())
+    
+    def test_orm_operations_per_request(self):
+        self.metrics.begin_request()
+        for _ in range(3):
+            self.metrics.observe('orm', (('model', 'employee'), ('operation', 'browse')), 0.001, 1)
+        self.metrics.observe('db', (('operation', 'execute'),), 0.001)
+        
+        # Other threads are not being served this request
+        other = threading.Thread(target=self.metrics.observe,
+                                 args=('orm', (('model', 'employee'), ('operation', 'search')), 0.001, 1))
+        other.start()
+        other.join()
+        
+        self.metrics.observe_request('index', 'GET', 200, 0.01, self.metrics.end_request())
+        self.metrics.observe_request(None, 'GET', 404, 0.01, 0)
+        text = self.metrics.render()
+        self.assertEqual(
+            sample_lines(text, 'gearguard_http_request_orm_operations_sum'),
+            {'gearguard_http_request_orm_operations_sum{route="index"}': 3,
+             'gearguard_http_request_orm_operations_sum{route="unmatched"}': 0},
+        )
+        self.assertIn('gearguard_http_request_seconds_count{route="index",method="GET",status="200"} 1', text)
+        self.assertEqual(self.metrics.end_request(), 0)
+    
+    def test_disabled_and_reset(self):
+        self.metrics.observe('orm', (('model', 'employee'), ('operation', 'search')), 0.001, 1)
+        self.metrics.reset()
+        self.assertEqual(self.metrics.render(), '\n')
+        
+        disabled = Metrics(enabled=False)
+        disabled.observe('orm', (('model', 'employee'), ('operation', 'search')), 0.001, 1)
+        disabled.observe_request('index', 'GET', 200, 0.01, 0)
+        self.assertEqual(disabled.render(), '\n')
+
+
+class InstrumentedModelTest(unittest.TestCase):
+    """ORM calls counted with the records they return or write"""
+    
+    def setUp(self):
+        self.metrics = Metrics()
+        patcher = mock.patch.object(base_module, 'metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.employees = GearGuardApp().env['employee']
+    
+    def records(self, operation):
+        key = 'gearguard_orm_records_total{model="employee",operation="%s"}' % operation
+        return sample_lines(self.metrics.render(), 'gearguard_orm_records_total').get(key)
+    
+    def test_calls_and_records(self):
+        ids = self.employees.create_multi([{'name': f'Employee {number}'} for number in range(4)])
+        self.employees.search([])
+        self.employees.browse(ids[:2])
+        self.employees.write(ids[0], {'name': 'Renamed'})
+        self.employees.unlink(ids[1:])
+        self.assertEqual(
+            [self.records(operation) for operation in ('create', 'search', 'browse', 'write', 'unlink')],
+            [4, 4, 2, 1, 3],
+        )
+    
+    def test_disabled_registry_skips_timing(self):
+        self.metrics.enabled = False
+        self.employees.create_multi([{'name': 'Employee'}])
+        self.assertEqual(self.metrics.render(), '\n')
+
+
+@unittest.skipIf(flask_app is None, 'Flask is required')
+class MetricsRouteTest(unittest.TestCase):
+    """GET /api/_metrics after requests served by the Flask app"""
+    
+    def test_served_requests_are_exported(self):
+        registry = Metrics()
+        with mock.patch.object(web_app, 'metrics', registry):
+            client = flask_app.test_client()
+            self.assertEqual(client.get('/api/dashboard/kpis').status_code, 200)
+            response = client.get('/api/_metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        self.assertIn('gearguard_http_request_seconds_count'
+                      '{route="api_kpis",method="GET",status="200"} 1', text)
+        self.assertIn('gearguard_http_request_orm_operations_count{route="api_kpis"} 1', text)
+    
+    def test_waiting_for_the_model_lock_is_timed(self):
+        registry = Metrics()
+        with mock.patch.object(web_app, 'metrics', registry):
+            client = flask_app.test_client()
+            with gear_app.env.lock:
+                thread = threading.Thread(target=client.get, args=('/api/dashboard/kpis',))
+                thread.start()
+                time.sleep(0.2)
+            thread.join(10)
+        seconds = sample_lines(registry.render(), 'gearguard_http_request_seconds_sum')
+        self.assertGreaterEqual(
+            seconds['gearguard_http_request_seconds_sum{route="api_kpis",method="GET",status="200"}'], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
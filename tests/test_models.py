@@ -0,0 +1,374 @@
+"""
+BaseModel ORM primitives on a small model kept in MemoryStorage, and
+related-record lookups on the application's models
+"""
+import os
+import random
+import tempfile
+import unittest
+from datetime import date
+from functools import cmp_to_key
+from unittest import mock
+
+from app import GearGuardApp
+from database import Database
+from helpers import in_thread
+from models.base import BaseModel
+from models.domain import compile_domain
+from models.storage import compact_storage_factory, sqlite_storage_factory
+from synthetic_data import generate_fleet
+
+
+class Part(BaseModel):
+    """Test model with a hash index, a composite index and a range index"""
+    
+    _indexes = ('state', ('state', 'bin'))
+    _range_indexes = ('weight',)
+    
+    def __init__(self, env=None):
+        super().__init__(env)
+        self._name = 'part'
+
+
+def create_parts(model, count):
+    """Parts cycling through states, bins and weights"""
+    states = ('new', 'used', 'scrap', False)
+    return model.create_multi([
+        {'name': 'Part %d' % number, 'state': states[number % 4],
+         'bin': number % 3 or False, 'weight': number % 7 if number % 5 else None}
+        for number in range(count)
+    ])
+
+
+class PrimaryKeyTest(unittest.TestCase):
+    """browse / write / unlink by id"""
+    
+    def setUp(self):
+        self.parts = Part()
+        self.ids = create_parts(self.parts, 10)
+    
+    def test_browse_keeps_creation_order_and_drops_unknown_ids(self):
+        self.assertEqual(self.ids, list(range(1, 11)))
+        records = self.parts.browse([7, 3, 99, 3, 'x', 0])
+        self.assertEqual([record['id'] for record in records], [3, 7])
+        self.assertEqual(self.parts.browse(5)[0]['name'], 'Part 4')
+    
+    def test_write_and_unlink_by_id(self):
+        self.parts.write(4, {'name': 'Renamed'})
+        self.parts.write([1, 2, 99], {'bin': 9})
+        self.assertEqual(self.parts.browse([4])[0]['name'], 'Renamed')
+        self.assertEqual([record['bin'] for record in self.parts.browse([1, 2, 3])], [9, 9, 2])
+        
+        self.parts.unlink([2, 5, 99])
+        self.parts.unlink(7)
+        self.assertEqual(self.parts.browse([2, 5, 7]), [])
+        self.assertEqual([record['id'] for record in self.parts._records], [1, 3, 4, 6, 8, 9, 10])
+        self.assertEqual(self.parts.create_multi([{'name': 'New'}]), [11])
+
+
+class IndexedSearchTest(unittest.TestCase):
+    """search() through the hash and range indexes gives the same records as a full scan"""
+    
+    def setUp(self):
+        self.parts = Part()
+        create_parts(self.parts, 200)
+    
+    def scan(self, domain):
+        predicate = compile_domain(domain)
+        return [record for record in self.parts._records if predicate(record)]
+    
+    def assertIndexesMatchRecords(self):
+        storage = self.parts._storage
+        for fields, index in storage._field_indexes.items():
+            expected = {}
+            for record in storage.records:
+                expected.setdefault(tuple(record.get(field) for field in fields), {})[record['id']] = record
+            self.assertEqual(index, expected, fields)
+        self.assertEqual(storage._range_indexes['weight'], sorted(
+            (record['weight'], record['id']) for record in storage.records
+            if record.get('weight') is not None and record.get('weight') is not False
+        ))
+    
+    def test_indexed_domains_match_a_full_scan(self):
+        rnd = random.Random(5)
+        for _ in range(300):
+            operation = rnd.random()
+            ids = rnd.sample(range(1, 260), 3)
+            if operation < 0.3:
+                self.parts.write(ids, {'state': rnd.choice(['new', 'used', False]), 'bin': rnd.randint(0, 3)})
+            elif operation < 0.5:
+                self.parts.write(ids, {'weight': rnd.choice([None, False, rnd.randint(0, 9)])})
+            elif operation < 0.6:
+                self.parts.unlink(ids)
+            elif operation < 0.7:
+                create_parts(self.parts, 3)
+            
+            domain = rnd.choice([
+                [('state', '=', rnd.choice(['new', 'used', 'scrap', False]))],
+                [('state', 'in', ['new', 'scrap']), ('bin', '=', rnd.randint(0, 3))],
+                [('state', '=', 'used'), ('bin', 'in', [1, 2])],
+                [('state', '!=', 'new'), ('bin', '=', 2)],
+                [('weight', '>=', rnd.randint(0, 6)), ('weight', '<', rnd.randint(3, 9))],
+                [('weight', '<=', 2), ('state', '!=', 'new')],
+                [('state', '=', 'new'), ('weight', '>', 3)],
+            ])
+            self.assertEqual(self.parts.search(domain), self.scan(domain), domain)
+            self.assertEqual(self.parts.search_count(domain), len(self.scan(domain)), domain)
+        self.assertIndexesMatchRecords()
+    
+    def test_planner_narrows_the_candidates(self):
+        storage = self.parts._storage
+        candidates = storage._plan_search([('state', '=', 'scrap'), ('bin', '=', 1)])
+        self.assertEqual(len(candidates), len(self.scan([('state', '=', 'scrap'), ('bin', '=', 1)])))
+        candidates = storage._plan_search([('weight', '>', 5), ('state', 'in', ['new', 'used', 'scrap'])])
+        self.assertEqual(len(candidates), len(self.scan([('weight', '>', 5)])))
+        self.assertIsNone(storage._plan_search([('name', '=', 'Part 3')]))
+
+
+class AggregationTest(unittest.TestCase):
+    """search_count() and read_group()"""
+    
+    def setUp(self):
+        self.parts = Part()
+        create_parts(self.parts, 12)
+    
+    def test_search_count(self):
+        self.assertEqual(self.parts.search_count(), 12)
+        self.assertEqual(self.parts.search_count([('state', '=', 'new')]), 3)
+        self.assertEqual(self.parts.search_count([('state', 'in', ['new', 'used']), ('bin', '=', 1)]), 2)
+        self.assertEqual(self.parts.search_count([('weight', '>', 3)]), 3)
+    
+    def test_groups_in_order_of_first_appearance(self):
+        groups = self.parts.read_group([], 'state', ['weight', 'weight:max', 'bin:avg'])
+        # Unset weights and bins count as 0
+        self.assertEqual(groups, [
+            {'state': 'new', '__count': 3, 'weight': 1 + 4, 'weight:max': 4, 'bin:avg': 1.0},
+            {'state': 'used', '__count': 3, 'weight': 1 + 2, 'weight:max': 2, 'bin:avg': 1.0},
+            {'state': 'scrap', '__count': 3, 'weight': 2 + 6, 'weight:max': 6, 'bin:avg': 1.0},
+            {'state': False, '__count': 3, 'weight': 3 + 0 + 4, 'weight:max': 4, 'bin:avg': 1.0},
+        ])
+    
+    def test_several_groupby_fields_and_a_domain(self):
+        groups = self.parts.read_group([('weight', '>=', 2)], ['state', 'bin'], ['weight:min'])
+        expected = {}
+        for record in self.parts.search([('weight', '>=', 2)]):
+            group = expected.setdefault((record['state'], record['bin']), [])
+            group.append(record['weight'])
+        self.assertEqual(
+            {(group['state'], group['bin']): (group['__count'], group['weight:min']) for group in groups},
+            {key: (len(weights), min(weights)) for key, weights in expected.items()},
+        )
+    
+    def test_unknown_aggregate_function(self):
+        with self.assertRaises(ValueError):
+            self.parts.read_group([], 'state', ['weight:median'])
+
+
+def fleet_request_models(test):
+    """(label, maintenance request model) of the same fleet on each storage backend"""
+    tmpdir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmpdir.cleanup)
+    database = Database(os.path.join(tmpdir.name, 'gearguard.db'))
+    test.addCleanup(database.close)
+    for label, storage_factory in (('memory', None), ('compact', compact_storage_factory),
+                                   ('sqlite', sqlite_storage_factory(database))):
+        gear_app = GearGuardApp(storage_factory=storage_factory)
+        generate_fleet(gear_app, employees=10, teams=3, equipment=20, requests=230, seed=4)
+        model = gear_app.env['maintenance.request']
+        model.unlink([5, 6, 7, 100])
+        yield label, model
+
+
+class PaginationTest(unittest.TestCase):
+    """Pages by offset and by keyset cursor, on each storage backend"""
+    
+    def test_pages_cover_the_result_once(self):
+        for label, model in fleet_request_models(self):
+            for domain in ([], [('state', '=', 'new')], [('request_type', '=', 'corrective'), ('duration', '>', 1)]):
+                with self.subTest(label, domain=domain):
+                    expected = model.search(domain)
+                    self.assertGreater(len(expected), 20)
+                    
+                    by_offset = []
+                    for offset in range(0, len(expected) + 20, 20):
+                        by_offset.append(model.search(domain, limit=20, offset=offset))
+                    self.assertEqual([record for page in by_offset for record in page], expected)
+                    self.assertEqual(by_offset[-1], [])
+                    
+                    by_cursor, after_id = [], None
+                    while True:
+                        page = model.search(domain, limit=20, after_id=after_id)
+                        if not page:
+                            break
+                        by_cursor.extend(page)
+                        after_id = page[-1]['id']
+                    self.assertEqual(by_cursor, expected)
+                    self.assertEqual(model.search(domain, offset=len(expected) - 3), expected[-3:])
+
+
+def ordered(records, order):
+    """records sorted like search(order=...): unset values last either way, ties by id"""
+    def compare(a, b):
+        for field, descending in order:
+            value_a, value_b = a.get(field), b.get(field)
+            unset_a = value_a is None or value_a is False
+            unset_b = value_b is None or value_b is False
+            if unset_a or unset_b:
+                if unset_a != unset_b:
+                    return 1 if unset_a else -1
+                continue
+            if value_a != value_b:
+                result = -1 if value_a < value_b else 1
+                return -result if descending else result
+        return a['id'] - b['id']
+    return sorted(records, key=cmp_to_key(compare))
+
+
+class OrderedSearchTest(unittest.TestCase):
+    """search(order=...) with and without a limit, on each storage backend"""
+    
+    ORDERS = ('scheduled_date', 'scheduled_date desc', 'repaired_date desc', 'duration desc, id',
+              'technician_id, scheduled_date desc', 'state, duration', 'id desc')
+    
+    def test_orders_match_a_sort(self):
+        for label, model in fleet_request_models(self):
+            records = model.search([])
+            for order in self.ORDERS:
+                terms = BaseModel._parse_order(order)
+                for domain in ([], [('state', 'in', ['new', 'in_progress'])], [('equipment_id', '=', 2)]):
+                    with self.subTest(label, order=order, domain=domain):
+                        predicate = compile_domain(domain)
+                        expected = ordered([record for record in records if predicate(record)], terms)
+                        self.assertEqual(model.search(domain, order=order), expected)
+                        self.assertEqual(model.search(domain, order=order, limit=7), expected[:7])
+                        self.assertEqual(model.search(domain, order=order, limit=5, offset=3), expected[3:8])
+    
+    def test_parse_order(self):
+        self.assertEqual(BaseModel._parse_order('a, b desc,c ASC'),
+                         (('a', False), ('b', True), ('c', False)))
+        for order in ('a sideways', 'a desc b'):
+            with self.assertRaises(ValueError):
+                BaseModel._parse_order(order)
+
+
+class RelatedRecordsTest(unittest.TestCase):
+    """Batched prefetch of related records and the request-scoped identity map"""
+    
+    def setUp(self):
+        # Records read from CompactStorage are copies, so stale ones would show
+        self.gear_app = GearGuardApp(storage_factory=compact_storage_factory)
+        self.env = self.gear_app.env
+        self.gear_app.setup_demo_data()
+        self.requests = self.env['maintenance.request'].search([])
+        self.equipment = self.env['equipment']
+    
+    def test_prefetch_browses_once(self):
+        with mock.patch.object(self.equipment, 'browse', wraps=self.equipment.browse) as browse:
+            related = self.env['maintenance.request'].prefetch(self.requests, 'equipment_id', 'equipment')
+        self.assertEqual(browse.call_count, 1)
+        self.assertEqual(related, {record['id']: record for record in self.equipment.browse(
+            [request['equipment_id'] for request in self.requests])})
+        
+        teams = self.env['maintenance.team'].search([])
+        technicians = self.env['maintenance.team'].prefetch(teams, 'technician_ids', 'employee')
+        self.assertEqual(set(technicians), {i for team in teams for i in team['technician_ids']})
+        self.assertEqual(self.env['maintenance.request'].prefetch([], 'equipment_id', 'equipment'), {})
+    
+    def test_identity_map_serves_repeated_lookups_in_a_request(self):
+        ids = [self.requests[0]['equipment_id'], 999]
+        with mock.patch.object(self.equipment, 'browse', wraps=self.equipment.browse) as browse:
+            self.equipment.browse_map(ids)
+            self.equipment.browse_map(ids)
+            self.assertEqual(browse.call_count, 2)  # No request scope, nothing kept
+            
+            with self.env.request_scope():
+                first = self.equipment.browse_map(ids)
+                self.assertEqual(list(first), ids[:1])
+                self.assertEqual(self.equipment.browse_map(ids), first)
+                self.assertEqual(in_thread(lambda: self.env.get_identity_map()), None)
+            self.assertEqual(browse.call_count, 3)
+            self.assertIsNone(self.env.get_identity_map())
+    
+    def test_writes_evict_records_from_the_identity_map(self):
+        equipment_id = self.requests[0]['equipment_id']
+        with self.env.request_scope():
+            self.equipment.browse_map([equipment_id])
+            self.equipment.write([equipment_id], {'name': 'Renamed'})
+            self.assertEqual(self.equipment.browse_map([equipment_id])[equipment_id]['name'], 'Renamed')
+            related = self.env['maintenance.request']._get_related(self.requests[0], 'equipment_id', 'equipment')
+            self.assertEqual(related['name'], 'Renamed')
+            self.equipment.unlink([equipment_id])
+            self.assertEqual(self.equipment.browse_map([equipment_id]), {})
+    
+    def test_today_is_fixed_for_a_request(self):
+        days = iter([date(2025, 3, 10), date(2025, 3, 11)])
+        with mock.patch('app.date') as fake_date:
+            fake_date.today.side_effect = lambda: next(days)
+            with self.env.request_scope():
+                self.assertEqual(self.env.today(), date(2025, 3, 10))
+                self.assertEqual(self.env.today(), date(2025, 3, 10))
+            self.assertEqual(self.env.today(), date(2025, 3, 11))
+
+
+class CreateMultiTest(unittest.TestCase):
+    """Batch creation: the same records as one create per row, with one lookup per batch"""
+    
+    def setUp(self):
+        self.env = GearGuardApp().env
+        self.env['employee'].create_multi([{'name': 'Ann', 'is_technician': True}])
+        self.env['maintenance.team'].create_multi([{'name': 'Mechanics', 'technician_ids': [1]},
+                                                  {'name': 'Electricians'}])
+        self.env['equipment'].create_multi([{'name': 'Press', 'maintenance_team_id': 1},
+                                            {'name': 'Lathe', 'maintenance_team_id': 2},
+                                            {'name': 'Spare'}])
+    
+    VALS = [
+        {'subject': 'Belt', 'equipment_id': 1},
+        {'subject': 'Motor', 'equipment_id': 2, 'request_type': 'preventive', 'duration': 2.0},
+        {'subject': 'Spare check', 'equipment_id': 3},
+        {'subject': 'Reassigned', 'equipment_id': 1, 'maintenance_team_id': 2},
+        {'subject': 'Loose'},
+        {'subject': 'Assigned', 'equipment_id': 1, 'technician_id': 1, 'scheduled_date': '2025-03-04'},
+    ]
+    
+    def test_batch_matches_one_create_per_row(self):
+        requests = self.env['maintenance.request']
+        ids = requests.create_multi(self.VALS)
+        self.assertEqual(ids, list(range(1, len(self.VALS) + 1)))
+        for vals in self.VALS:
+            requests.create(vals)
+        
+        def content(record):
+            return {field: value for field, value in record.items() if field not in ('id', 'create_date')}
+        records = requests.search([])
+        self.assertEqual([content(record) for record in records[:len(ids)]],
+                         [content(record) for record in records[len(ids):]])
+        self.assertEqual([record['maintenance_team_id'] for record in records[:len(ids)]],
+                         [1, 2, False, 2, False, 1])
+        self.assertEqual(
+            {field: records[0][field] for field in ('request_type', 'state', 'duration', 'description',
+                                                    'technician_id', 'repaired_date', 'is_overdue')},
+            {'request_type': 'corrective', 'state': 'new', 'duration': 0.0, 'description': '',
+             'technician_id': False, 'repaired_date': False, 'is_overdue': False},
+        )
+        self.assertEqual(len({record['create_date'] for record in records[:len(ids)]}), 1)
+    
+    def test_one_equipment_lookup_per_batch(self):
+        storage = self.env['equipment']._storage
+        with mock.patch.object(storage, 'get_many', wraps=storage.get_many) as get_many:
+            self.env['maintenance.request'].create_multi(self.VALS * 50)
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(sorted(get_many.call_args[0][0]), [1, 2, 3])
+    
+    def test_counters_follow_the_batch(self):
+        self.env['maintenance.request'].create_multi(self.VALS * 3)
+        self.assertEqual([record['open_requests_count'] for record in self.env['equipment'].search([])],
+                         [9, 3, 3])
+    
+    def test_empty_batch(self):
+        self.assertEqual(self.env['maintenance.request'].create_multi([]), [])
+        self.assertEqual(self.env['maintenance.request'].search_count([]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Overdue sweeper: requests are flagged once their scheduled date passes,
+including requests that went overdue while the application was down
+"""
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from app import GearGuardApp
+from database import Database
+from models.storage import sqlite_storage_factory
+
+
+TODAY = date(2025, 3, 10)
+
+
+def make_app(today, storage_factory=None):
+    """GearGuardApp whose environment sees a fixed date"""
+    gear_app = GearGuardApp(storage_factory=storage_factory)
+    gear_app.env.today = lambda: today
+    return gear_app
+
+
+def create_requests(gear_app):
+    """One equipment with an open request due today, one due later and one repaired"""
+    equipment = gear_app.env['equipment']
+    equipment.create({'name': 'Conveyor Belt'})
+    equipment_id = equipment._records[-1]['id']
+    
+    ids = gear_app.env['maintenance.request'].create_multi([
+        {'subject': 'Due today', 'equipment_id': equipment_id,
+         'scheduled_date': TODAY, 'state': 'new'},
+        {'subject': 'Due later', 'equipment_id': equipment_id,
+         'scheduled_date': TODAY + timedelta(days=10), 'state': 'in_progress'},
+        {'subject': 'Repaired', 'equipment_id': equipment_id,
+         'scheduled_date': TODAY - timedelta(days=5), 'state': 'repaired',
+         'repaired_date': TODAY - timedelta(days=4), 'duration': 1.0},
+    ])
+    return equipment_id, ids
+
+
+def overdue_flags(gear_app):
+    return {record['id']: record['is_overdue']
+            for record in gear_app.env['maintenance.request'].search([])}
+
+
+class OverdueSweeperTest(unittest.TestCase):
+    """Requests flagged by a running application"""
+    
+    def test_sweep_flags_requests_as_days_pass(self):
+        gear_app = make_app(TODAY)
+        _, (due_today, due_later, repaired) = create_requests(gear_app)
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [])
+        self.assertEqual(overdue_flags(gear_app), {due_today: False, due_later: False, repaired: False})
+        
+        gear_app.env.today = lambda: TODAY + timedelta(days=1)
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [due_today])
+        self.assertEqual(overdue_flags(gear_app), {due_today: True, due_later: False, repaired: False})
+        self.assertEqual(gear_app.env['dashboard'].get_kpis()['overdue_requests'], 1)
+    
+    def test_rescheduled_and_closed_requests_are_not_flagged(self):
+        gear_app = make_app(TODAY)
+        _, (due_today, due_later, _) = create_requests(gear_app)
+        gear_app.overdue_sweeper.sweep()
+        request_model = gear_app.env['maintenance.request']
+        request_model.write([due_today], {'scheduled_date': TODAY + timedelta(days=30)})
+        request_model.action_repair(due_later, duration=2.0)
+        
+        gear_app.env.today = lambda: TODAY + timedelta(days=20)
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [])
+        self.assertFalse(any(overdue_flags(gear_app).values()))
+
+
+class OverdueSweeperRestartTest(unittest.TestCase):
+    """Persisted requests whose date passed while the application was stopped"""
+    
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmpdir.name, 'gearguard.db')
+        self._databases = []
+    
+    def tearDown(self):
+        for database in self._databases:
+            database.close()
+        self._tmpdir.cleanup()
+    
+    def start(self, today):
+        database = Database(self.db_path)
+        self._databases.append(database)
+        return make_app(today, sqlite_storage_factory(database))
+    
+    def test_first_sweep_after_restart_flags_past_due_requests(self):
+        gear_app = self.start(TODAY)
+        equipment_id, (due_today, due_later, repaired) = create_requests(gear_app)
+        gear_app.env.flush()
+        self.assertFalse(any(overdue_flags(gear_app).values()))
+        health_before = gear_app.env['equipment'].browse([equipment_id])[0]['health_score']
+        
+        # Three days later, a fresh process loads the same rows
+        gear_app = self.start(TODAY + timedelta(days=3))
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [due_today])
+        self.assertEqual(overdue_flags(gear_app), {due_today: True, due_later: False, repaired: False})
+        self.assertEqual(gear_app.get_dashboard_section('kpis')['overdue_requests'], 1)
+        health_after = gear_app.env['equipment'].browse([equipment_id])[0]['health_score']
+        self.assertLess(health_after, health_before)
+        
+        # Flagged once; the request not yet due is still waiting on the heap
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [])
+        gear_app.env.today = lambda: TODAY + timedelta(days=11)
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [due_later])
+    
+    def test_flags_survive_another_restart(self):
+        gear_app = self.start(TODAY)
+        _, (due_today, _, _) = create_requests(gear_app)
+        gear_app.env.flush()
+        self.start(TODAY + timedelta(days=3)).overdue_sweeper.sweep()
+        
+        gear_app = self.start(TODAY + timedelta(days=4))
+        self.assertEqual(gear_app.overdue_sweeper.sweep(), [])
+        self.assertTrue(overdue_flags(gear_app)[due_today])
+
+
+if __name__ == '__main__':
+    unittest.main()
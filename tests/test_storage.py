@@ -0,0 +1,265 @@
+"""
+CompactStorage and SQLiteStorage checked against MemoryStorage: the same
+writes must give the same records, searches, counts and groups
+"""
+import os
+import random
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from app import Environment, GearGuardApp
+from database import Database
+from models.storage import (CompactStorage, MemoryStorage, compact_storage_factory,
+                            sqlite_storage_factory)
+from synthetic_data import generate_fleet
+
+
+INDEXES = ('state', 'number', ('state', 'number'), 'flag')
+RANGE_INDEXES = ('day', 'number')
+COLUMNS = {'state': str, 'number': int, 'day': str, 'flag': bool, 'text': str,
+           'amount': float, 'stamp': datetime, 'deadline': date}
+CODED = ('state', 'day')
+FIELDS = list(COLUMNS) + ['extra']
+OPERATORS = ('=', '!=', 'in', 'not in', '<', '<=', '>', '>=')
+
+
+class RandomValues:
+    """Field values for the storages, mostly of the declared type, with unset and stray values"""
+    
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+    
+    def day(self):
+        return self.random.choice([False, None, '2024-0%d-%02d' % (
+            self.random.randint(1, 3), self.random.randint(1, 28))])
+    
+    def value(self, field):
+        choice, stray = self.random.choice, self.random.random() < 0.02
+        if field == 'state':
+            return choice(['new', 'in_progress', 'repaired', False])
+        if field == 'number':
+            return choice(['x', 2.5, True]) if stray else choice([False, None, self.random.randint(-5, 5)])
+        if field == 'day':
+            return self.day()
+        if field == 'flag':
+            return choice([True, False])
+        if field == 'text':
+            return ['list'] if stray else choice(['', 'héllo', 'abc' * self.random.randint(0, 3), False, None])
+        if field == 'amount':
+            return choice([1.5, 0.0, False, 0, 3])
+        if field == 'stamp':
+            if stray:
+                return choice(['x', 3])
+            return choice([False, None, datetime(2024, self.random.randint(1, 3), self.random.randint(1, 28),
+                                                 self.random.randint(0, 23), 0, 0, choice([0, 123456]))])
+        if field == 'deadline':
+            return choice([False, None, date(2024, self.random.randint(1, 3), self.random.randint(1, 28))])
+        return choice([1, 'z', None])
+    
+    def vals(self):
+        return {field: self.value(field) for field in FIELDS if self.random.random() < 0.85}
+    
+    def condition(self):
+        field = self.random.choice(FIELDS + ['id'])
+        if field == 'id':
+            return ('id', self.random.choice(['>', '>=', '<', '=']), self.random.randint(0, 60))
+        operator = self.random.choice(OPERATORS)
+        if operator in ('in', 'not in'):
+            return (field, operator, [self.value(field), self.value(field)])
+        if operator in ('=', '!='):
+            return (field, operator, self.value(field))
+        if field in ('number', 'amount'):
+            value = self.random.randint(-5, 5)
+        elif field == 'stamp':
+            value = self.value(field) or datetime(2024, 2, 1)
+        elif field == 'deadline':
+            value = self.value(field) or date(2024, 2, 1)
+        else:
+            value = self.day() or 'b'
+        return (field, operator, value)
+    
+    def domain(self):
+        domain = [self.condition() for _ in range(self.random.randint(0, 3))]
+        if len(domain) >= 2 and self.random.random() < 0.2:
+            domain.insert(0, '|')
+        return domain or None
+
+
+class CompactStorageTest(unittest.TestCase):
+    """Random writes and queries replayed on both storages"""
+    
+    def setUp(self):
+        self.memory = MemoryStorage(INDEXES, RANGE_INDEXES)
+        self.compact = CompactStorage(INDEXES, RANGE_INDEXES, COLUMNS, CODED)
+    
+    def assertSameRecords(self):
+        self.assertEqual([dict(record) for record in self.memory.records], list(self.compact.records))
+    
+    def assertSameQuery(self, domain, order, limit, offset, groupby):
+        specs = [('amount_sum', 'amount', 'sum'), ('number_max', 'number', 'max')]
+        try:
+            expected = (self.memory.search(domain, limit=limit, offset=offset, order=order),
+                        self.memory.count(domain),
+                        self.memory.read_group(domain, [groupby], specs))
+        except TypeError:
+            return False  # Values that do not compare, in either storage
+        self.assertEqual([dict(record) for record in expected[0]],
+                         self.compact.search(domain, limit=limit, offset=offset, order=order))
+        self.assertEqual(expected[1], self.compact.count(domain))
+        self.assertEqual(expected[2], self.compact.read_group(domain, [groupby], specs))
+        return True
+    
+    def test_random_operations_match_memory_storage(self):
+        for seed in range(8):
+            with self.subTest(seed=seed):
+                self.setUp()  # Fresh storages per seed
+                values, checked = RandomValues(seed), 0
+                for step in range(1500):
+                    operation = values.random.random()
+                    if operation < 0.4:
+                        vals = values.vals()
+                        self.assertEqual(dict(self.memory.insert(dict(vals))), self.compact.insert(dict(vals)))
+                    elif operation < 0.65 and self.memory.records:
+                        ids = [record['id'] for record in values.random.sample(
+                            list(self.memory.records), min(3, len(self.memory.records)))] + [999]
+                        vals = {field: values.value(field) for field in values.random.sample(FIELDS, 2)}
+                        self.memory.update(ids, dict(vals))
+                        self.compact.update(ids, dict(vals))
+                    elif operation < 0.72 and self.memory.records:
+                        ids = [values.random.choice(list(self.memory.records))['id'], 12345]
+                        self.assertEqual(self.memory.delete(ids), self.compact.delete(ids))
+                    
+                    if step % 5 == 0:
+                        order = None
+                        if values.random.random() < 0.5:
+                            order = ((values.random.choice(['day', 'number', 'id', 'state']),
+                                      values.random.random() < 0.5),)
+                        checked += self.assertSameQuery(
+                            values.domain(), order, values.random.choice([None, 1, 5]),
+                            values.random.choice([0, 0, 2]), values.random.choice(['state', 'flag', 'day']))
+                    if self.memory.records and values.random.random() < 0.1:
+                        position = values.random.randrange(-len(self.memory.records), len(self.memory.records))
+                        self.assertEqual(dict(self.memory.records[position]), self.compact.records[position])
+                self.assertGreater(checked, 50)
+                self.assertSameRecords()
+    
+    def test_values_outside_a_columns_encoding_are_kept(self):
+        vals = [{'number': 2 ** 70}, {'number': 'seven'}, {'stamp': datetime(2024, 1, 1, 8)},
+                {'stamp': '2024-01-01'}, {'text': 'caf\udce9'}, {'text': b'raw'}, {'extra': ['a']}]
+        for record in vals:
+            self.memory.insert(dict(record))
+            self.compact.insert(dict(record))
+        self.assertSameRecords()
+        self.assertEqual(self.compact.search([('number', '=', 'seven')]), [{'id': 2, 'number': 'seven'}])
+    
+    def test_codes_widen_past_one_byte(self):
+        for number in range(70000):
+            vals = {'state': 'state-%d' % number, 'flag': number % 2 == 0}
+            self.memory.insert(dict(vals))
+            self.compact.insert(dict(vals))
+        self.assertEqual(self.compact.search([('state', '=', 'state-69999')]),
+                         [{'id': 70000, 'state': 'state-69999', 'flag': False}])
+        self.compact.update([1], {'state': 'state-69999'})
+        self.assertEqual(self.compact.count([('state', '=', 'state-69999')]), 2)
+        self.assertEqual(self.compact.get_many([70000, 1, 5])[1]['state'], 'state-4')
+    
+    def test_overwritten_text_is_reclaimed(self):
+        self.compact.insert({'text': 'first'})
+        self.compact.insert({'text': 'kept'})
+        for number in range(300):
+            self.compact.update([1], {'text': str(number) * 5000})
+        self.assertEqual(self.compact.get_many([1, 2]),
+                         [{'id': 1, 'text': '299' * 5000}, {'id': 2, 'text': 'kept'}])
+        self.assertLess(len(self.compact._columns['text'].data), 2 ** 21)
+    
+    def test_returned_records_are_copies(self):
+        record = self.compact.insert({'state': 'new'})
+        record['state'] = 'repaired'
+        self.compact.search([])[0]['state'] = 'repaired'
+        self.assertEqual(self.compact.count([('state', '=', 'new')]), 1)
+
+
+def fleet_env(storage_factory=None):
+    """Environment of a seeded synthetic fleet on the given storage"""
+    gear_app = GearGuardApp(storage_factory=storage_factory)
+    gear_app.env.analytics = None
+    generate_fleet(gear_app, employees=20, teams=5, equipment=40, requests=600, seed=11)
+    gear_app.env.flush()
+    return gear_app.env
+
+
+class FleetComparison:
+    """Checks of a fleet on another storage against the same fleet in memory"""
+    
+    QUERIES = (
+        ([('state', 'in', ['new', 'in_progress'])], None, None),
+        ([('equipment_id', '=', 3), ('request_type', '=', 'corrective')], None, None),
+        ([('scheduled_date', '>=', '2000-01-01'), ('technician_id', '!=', False)], 'scheduled_date desc', 25),
+        ([('duration', '>', 2.0)], 'duration, scheduled_date desc', 10),
+        ([], 'create_date desc', 5),
+    )
+    
+    def assertSameFleet(self, memory, other):
+        for model in ('equipment', 'maintenance.team', 'employee', 'maintenance.request'):
+            with self.subTest(model):
+                self.assertEqual(memory[model].search([]), other[model].search([]))
+        
+        requests = memory['maintenance.request'], other['maintenance.request']
+        for domain, order, limit in self.QUERIES:
+            with self.subTest(domain=domain, order=order):
+                self.assertEqual(*(model.search(domain, order=order, limit=limit) for model in requests))
+                self.assertEqual(*(model.search_count(domain) for model in requests))
+                self.assertEqual(*(model.read_group(domain, ['state', 'request_type'],
+                                                    ['duration', 'duration:max']) for model in requests))
+        
+        dashboards = memory['dashboard'], other['dashboard']
+        for section in ('get_kpis', 'get_preventive_vs_corrective', 'get_requests_per_team',
+                        'get_critical_equipment', 'get_technician_workloads', 'get_predictive_alerts'):
+            with self.subTest(section):
+                self.assertEqual(*(getattr(dashboard, section)() for dashboard in dashboards))
+
+
+class CompactModelsTest(FleetComparison, unittest.TestCase):
+    """The same seeded fleet on MemoryStorage and CompactStorage"""
+    
+    def test_fleet_and_dashboard_match(self):
+        self.assertSameFleet(fleet_env(), fleet_env(compact_storage_factory))
+
+
+class SQLiteModelsTest(FleetComparison, unittest.TestCase):
+    """The same seeded fleet on MemoryStorage and SQLiteStorage, across restarts"""
+    
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._databases = []
+    
+    def tearDown(self):
+        for database in self._databases:
+            database.close()
+        self._tmpdir.cleanup()
+    
+    def storage_factory(self):
+        """SQLite storage on the test's database file, opened anew"""
+        database = Database(os.path.join(self._tmpdir.name, 'gearguard.db'))
+        self._databases.append(database)
+        return sqlite_storage_factory(database)
+    
+    def test_fleet_and_dashboard_match(self):
+        memory, sqlite = fleet_env(), fleet_env(self.storage_factory())
+        self.assertSameFleet(memory, sqlite)
+        
+        # Writes land in the database and a restarted environment reads them back
+        for env in (memory, sqlite):
+            requests = env['maintenance.request']
+            requests.write([1, 2], {'state': 'repaired', 'duration': 1.5})
+            requests.unlink([3])
+            env['equipment'].write([4], {'is_scrapped': True})
+            env.flush()
+        restarted = Environment(storage_factory=self.storage_factory())
+        restarted.analytics = None
+        self.assertSameFleet(memory, restarted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Synthetic fleets and the benchmark suite that times them: the same seed
+gives the same data, and a small run reports every benchmark
+"""
+import contextlib
+import io
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import benchmark
+from app import GearGuardApp
+from models.analytics import ANALYTICS_ENABLED
+from synthetic_data import generate_fleet
+
+
+SMALL_FLEET = dict(employees=12, teams=3, equipment=40, requests=500)
+
+
+def fleet(seed, **counts):
+    gear_app = GearGuardApp()
+    created = generate_fleet(gear_app, seed=seed, **dict(SMALL_FLEET, **counts))
+    return gear_app, created
+
+
+def snapshot(gear_app):
+    """Every record of the synthetic models, without create timestamps"""
+    return {
+        model: [{field: value for field, value in record.items() if field != 'create_date'}
+                for record in gear_app.env[model].search([])]
+        for model in ('employee', 'maintenance.team', 'equipment', 'maintenance.request')
+    }
+
+
+class GenerateFleetTest(unittest.TestCase):
+    """generate_fleet() on an empty application"""
+    
+    def test_same_seed_same_fleet(self):
+        first, second = fleet(3)[0], fleet(3)[0]
+        self.assertEqual(snapshot(first), snapshot(second))
+        self.assertNotEqual(snapshot(first), snapshot(fleet(4)[0]))
+    
+    def test_counts(self):
+        gear_app, created = fleet(1, requests=120)
+        self.assertEqual(created, {'employee': 12, 'maintenance.team': 3,
+                                   'equipment': 40, 'maintenance.request': 120})
+        for model, count in created.items():
+            self.assertEqual(gear_app.env[model].search_count([]), count)
+        self.assertEqual(fleet(1, equipment=0)[1]['maintenance.request'], 0)
+    
+    def test_requests_are_consistent(self):
+        gear_app, _ = fleet(2)
+        teams = {team['id']: team['technician_ids']
+                 for team in gear_app.env['maintenance.team'].search([])}
+        equipment = {record['id']: record for record in gear_app.env['equipment'].search([])}
+        now = datetime.now()
+        for request in gear_app.env['maintenance.request'].search([]):
+            team_id = equipment[request['equipment_id']]['maintenance_team_id']
+            self.assertEqual(request['maintenance_team_id'], team_id)
+            self.assertIn(request['technician_id'], teams[team_id] or [False])
+            self.assertLessEqual(request['create_date'], now)
+            self.assertGreaterEqual(request['create_date'], now - timedelta(days=366))
+            if request['state'] == 'repaired':
+                self.assertTrue(request['repaired_date'])
+                self.assertLessEqual(request['repaired_date'], now.date())
+            else:
+                self.assertFalse(request['repaired_date'])
+
+
+class BenchmarkTest(unittest.TestCase):
+    """A small benchmark run and the comparison against a baseline"""
+    
+    def test_fleet_counts(self):
+        self.assertEqual(benchmark.fleet_counts(1000), {
+            'employees': 6, 'teams': 2, 'equipment': 100, 'requests': 1000,
+        })
+        counts = benchmark.fleet_counts(1000000)
+        self.assertEqual(counts['requests'], 1000000)
+        self.assertGreater(counts['equipment'], benchmark.fleet_counts(1000)['equipment'])
+    
+    def test_time_call(self):
+        calls = []
+        timing = benchmark.time_call(lambda: calls.append(1), 5)
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(set(timing), {'first_ms', 'min_ms', 'median_ms', 'mean_ms'})
+        self.assertLessEqual(timing['min_ms'], timing['median_ms'])
+    
+    def test_run_size_and_compare(self):
+        with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+            run = benchmark.run_size(1000, 'memory', workdir, repeat=1, seed=0, routes=False)
+        self.assertEqual((run['size'], run['storage'], run['analytics']), (1000, 'memory', ANALYTICS_ENABLED))
+        self.assertEqual(
+            set(run['results']),
+            {'orm.' + name for name in benchmark.orm_benchmarks(GearGuardApp())} |
+            {'dashboard.' + name for name in benchmark.DASHBOARD_METHODS} |
+            {'dashboard.get_dashboard_data'},
+        )
+        
+        slower = {'runs': [dict(run, results={name: dict(timing, median_ms=timing['median_ms'] * 2)
+                                              for name, timing in run['results'].items()})]}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            benchmark.compare(slower, {'runs': [run]})
+        self.assertIn('Size 1000 (memory) vs baseline', output.getvalue())
+        self.assertIn('x2.00', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
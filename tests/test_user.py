@@ -0,0 +1,92 @@
+"""
+User authentication: password hashing, the user cache and batched writes
+"""
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from database import Database
+from models import user as user_module
+from models.user import User
+
+
+class UserTest(unittest.TestCase):
+    """Users stored in a scratch database"""
+    
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self._tmpdir.name, 'gearguard.db'))
+        self.cache = user_module._UserCache(16)
+        for target, value in (('db', self.db), ('_cache', self.cache),
+                              ('PASSWORD_ITERATIONS', 1000)):
+            patcher = mock.patch.object(user_module, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def tearDown(self):
+        User.flush_pending_writes()
+        self.db.close()
+        self._tmpdir.cleanup()
+    
+    def test_create_and_verify(self):
+        user = User.create('alice', 'alice@example.com', 'secret1', 'Alice')
+        self.assertEqual(user['username'], 'alice')
+        self.assertTrue(user['password_hash'].startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(User.verify_password(user, 'secret1'))
+        self.assertFalse(User.verify_password(user, 'wrong'))
+        self.assertIsNone(User.create('alice', 'other@example.com', 'secret1'))
+    
+    def test_lookups_are_cached_after_commit(self):
+        user = User.create('alice', 'alice@example.com', 'secret1')
+        self.assertEqual(self.cache.get(user['id']), user)
+        self.db.execute('DELETE FROM users')
+        self.assertEqual(User.get_by_id(user['id']), user)
+        self.assertEqual(User.get_by_username('alice'), user)
+    
+    def test_rolled_back_user_is_not_cached(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                User.create('alice', 'alice@example.com', 'secret1')
+                self.assertIsNotNone(User.get_by_username('alice'))
+                raise RuntimeError('abort')
+        self.assertIsNone(self.cache.get_by_username('alice'))
+        self.assertIsNone(User.get_by_username('alice'))
+    
+    def test_committed_outer_transaction_caches_on_next_lookup(self):
+        with self.db.transaction():
+            User.create('alice', 'alice@example.com', 'secret1')
+        self.assertIsNone(self.cache.get_by_username('alice'))
+        self.assertIsNotNone(User.get_by_username('alice'))
+        self.assertIsNotNone(self.cache.get_by_username('alice'))
+    
+    def test_legacy_hash_upgraded_on_login(self):
+        legacy = hashlib.sha256(b'secret1').hexdigest()
+        self.db.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+            ('bob', 'bob@example.com', legacy)
+        )
+        user = User.get_by_username('bob')
+        self.assertTrue(User.verify_password(user, 'secret1'))
+        
+        # Visible right away, written in the background
+        upgraded = User.get_by_username('bob')['password_hash']
+        self.assertTrue(upgraded.startswith('pbkdf2_sha256$'))
+        User.flush_pending_writes()
+        row = self.db.fetch_one("SELECT password_hash FROM users WHERE username = 'bob'")
+        self.assertEqual(row['password_hash'], upgraded)
+        self.assertTrue(User.verify_password(User.get_by_username('bob'), 'secret1'))
+    
+    def test_last_login_written_in_batch(self):
+        user = User.create('alice', 'alice@example.com', 'secret1')
+        User.update_last_login(user['id'])
+        updated_at = User.get_by_id(user['id'])['updated_at']
+        self.assertNotEqual(updated_at, user['updated_at'])
+        User.flush_pending_writes()
+        row = self.db.fetch_one("SELECT updated_at FROM users WHERE id = ?", (user['id'],))
+        self.assertEqual(row['updated_at'], updated_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
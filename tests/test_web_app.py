@@ -0,0 +1,122 @@
+"""
+Web layer: conditional requests on the JSON API (ETag on every 200, 304
+while the model data and the date are unchanged) and list view pages
+"""
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+try:
+    import web_app
+    from web_app import app, gear_app
+except ImportError:  # Flask
+    app = None
+
+
+@unittest.skipIf(app is None, 'Flask is required')
+class ConditionalApiTest(unittest.TestCase):
+    """ETag / If-None-Match on the Flask API routes"""
+    
+    PATHS = ('/api/dashboard/kpis', '/api/dashboard/alerts',
+             '/api/calendar/2025/3', '/api/equipment/1/health')
+    
+    def setUp(self):
+        self.client = app.test_client()
+    
+    def test_unchanged_data_answers_304(self):
+        for path in self.PATHS:
+            with self.subTest(path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                etag = response.headers['ETag']
+                self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+                
+                response = self.client.get(path, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.data, b'')
+                self.assertEqual(response.headers['ETag'], etag)
+                
+                weak_list = '"stale", W/' + etag
+                self.assertEqual(self.client.get(path, headers={'If-None-Match': weak_list}).status_code, 304)
+    
+    def test_writes_change_the_tag(self):
+        response = self.client.get('/api/dashboard/kpis')
+        etag, kpis = response.headers['ETag'], response.get_json()
+        
+        request_model = gear_app.env['maintenance.request']
+        with gear_app.env.lock:
+            request_id, = request_model.create_multi([{'subject': 'Tag check', 'equipment_id': 1}])
+        self.addCleanup(request_model.unlink, [request_id])
+        response = self.client.get('/api/dashboard/kpis', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.get_json()['open_requests'], kpis['open_requests'] + 1)
+    
+    def test_new_day_changes_the_tag(self):
+        etag = self.client.get('/api/dashboard/alerts').headers['ETag']
+        tomorrow = gear_app.env.today() + timedelta(days=1)
+        with mock.patch.object(gear_app.env, 'today', lambda: tomorrow):
+            response = self.client.get('/api/dashboard/alerts', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(tomorrow.isoformat(), response.headers['ETag'])
+    
+    def test_invalid_paths_are_not_answered_304(self):
+        etag = self.client.get('/api/dashboard/kpis').headers['ETag']
+        for path, status in (('/api/calendar/2026/13', 400), ('/api/equipment/999999/health', 404)):
+            with self.subTest(path):
+                response = self.client.get(path, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, status)
+                self.assertNotIn('ETag', response.headers)
+    
+    def test_errors_are_not_tagged(self):
+        for path, status in (('/api/calendar/2025/13', 400), ('/api/equipment/999999/health', 404)):
+            with self.subTest(path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, status)
+                self.assertNotIn('ETag', response.headers)
+
+
+@unittest.skipIf(app is None, 'Flask is required')
+class PaginationTest(unittest.TestCase):
+    """Pages of the list views: ?page=, ?per_page= and the ?after= cursor"""
+    
+    def paginate(self, query, domain=()):
+        with app.test_request_context('/requests' + query):
+            return web_app._paginate(gear_app.env['maintenance.request'], list(domain))
+    
+    def test_pages(self):
+        all_ids = [request['id'] for request in gear_app.env['maintenance.request'].search([])]
+        self.assertGreater(len(all_ids), 4)
+        
+        records, pagination = self.paginate('?per_page=2')
+        self.assertEqual([record['id'] for record in records], all_ids[:2])
+        self.assertEqual(pagination, {
+            'page': 1, 'per_page': 2, 'total': len(all_ids), 'pages': (len(all_ids) + 1) // 2,
+            'has_prev': False, 'has_next': True, 'next_after': all_ids[1],
+        })
+        
+        records, pagination = self.paginate(f'?per_page=2&page=2&after={all_ids[1]}')
+        self.assertEqual([record['id'] for record in records], all_ids[2:4])
+        self.assertTrue(pagination['has_prev'])
+        self.assertEqual(self.paginate('?per_page=2&page=2')[0], records)
+        
+        records, pagination = self.paginate(f'?per_page=2&after={all_ids[-1]}')
+        self.assertEqual((records, pagination['has_next'], pagination['next_after']), ([], False, None))
+    
+    def test_page_size_is_bounded(self):
+        self.assertEqual(self.paginate('?per_page=0')[1]['per_page'], 1)
+        self.assertEqual(self.paginate('?per_page=100000')[1]['per_page'], web_app.MAX_PAGE_SIZE)
+        self.assertEqual(self.paginate('?page=-3')[1]['page'], 1)
+    
+    def test_list_views_need_a_login_and_render_one_page(self):
+        client = app.test_client()
+        self.assertEqual(client.get('/requests').status_code, 302)
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+        for path in ('/requests?per_page=2', '/requests?view=kanban', '/equipment?per_page=2&page=2'):
+            with self.subTest(path):
+                self.assertEqual(client.get(path).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
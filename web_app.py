@@ -2,17 +2,32 @@
 GearGuard+ Web Application
 Flask-based web interface for the maintenance management system
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, Response, g, render_template, request, jsonify, redirect, url_for, flash, session
 from app import GearGuardApp
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from database import db
+from metrics import metrics
+from models.base import get_data_version
+from models.storage import compact_storage_factory, sqlite_storage_factory
 from models.user import User
 import json
+import os
+import time
 
 app = Flask(__name__)
 app.secret_key = 'gearguard-secret-key-2025-change-in-production'
 
 # Initialize the application
-gear_app = GearGuardApp()
+# GEARGUARD_STORAGE=sqlite persists models to the SQLite database so data
+# survives restarts; GEARGUARD_STORAGE=compact keeps large fleets in memory
+# column by column; the default keeps every record as a dict in memory
+STORAGE = os.environ.get('GEARGUARD_STORAGE', 'memory')
+if STORAGE == 'sqlite':
+    gear_app = GearGuardApp(storage_factory=sqlite_storage_factory(db))
+elif STORAGE == 'compact':
+    gear_app = GearGuardApp(storage_factory=compact_storage_factory)
+else:
+    gear_app = GearGuardApp()
 
 # Initialize demo data on startup
 def initialize_demo_data():
@@ -20,21 +35,22 @@ def initialize_demo_data():
     try:
         # Check if data already exists
         request_model = gear_app.env['maintenance.request']
-        existing_requests = request_model.search([])
+        existing_requests = request_model.search_count([])
         
         if not existing_requests:
             print("=" * 70)
             print("Initializing Demo Data...")
             print("=" * 70)
             
-            # Setup demo data
-            demo_data = gear_app.setup_demo_data()
-            
-            # Create default admin user if not exists
-            existing_user = User.get_by_username('admin')
-            if not existing_user:
-                User.create('admin', 'admin@gearguard.com', 'admin123', 'Administrator', 'admin')
-                print("✓ Default admin user created: username='admin', password='admin123'")
+            # Setup demo data (one commit for all rows when persisted)
+            with db.transaction():
+                demo_data = gear_app.setup_demo_data()
+                
+                # Create default admin user if not exists
+                existing_user = User.get_by_username('admin')
+                if not existing_user:
+                    User.create('admin', 'admin@gearguard.com', 'admin123', 'Administrator', 'admin')
+                    print("✓ Default admin user created: username='admin', password='admin123'")
             
             print("✓ Demo data created successfully!")
             print("  - Employees: Created")
@@ -50,6 +66,51 @@ def initialize_demo_data():
 # Initialize on startup
 initialize_demo_data()
 
+# Keep is_overdue (and the health scores built on it) current as days pass
+gear_app.overdue_sweeper.start()
+
+
+# Views that never touch the models run without the model lock, so password
+# hashing on the login and signup pages does not hold up other requests
+MODEL_FREE_ENDPOINTS = frozenset(['login', 'signup', 'logout', 'static', 'api_metrics'])
+
+
+@app.before_request
+def begin_request_metrics():
+    """
+    Start timing the request and counting its ORM operations
+    Registered first, so the time spent waiting for the model lock counts
+    """
+    g.request_start = time.perf_counter()
+    metrics.begin_request()
+
+
+@app.before_request
+def begin_request_scope():
+    """Serialize model access and share related-record lookups within one request"""
+    if request.endpoint not in MODEL_FREE_ENDPOINTS:
+        gear_app.env.lock.acquire()
+        g.holds_model_lock = True
+    gear_app.env.begin_request_scope()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Time the request and count the ORM operations it made, per route"""
+    start = g.get('request_start')
+    if start is not None:
+        metrics.observe_request(request.endpoint, request.method, response.status_code,
+                                time.perf_counter() - start, metrics.end_request())
+    return response
+
+
+@app.teardown_request
+def end_request_scope(exc):
+    """Drop the request's identity map and let other threads at the models"""
+    gear_app.env.end_request_scope()
+    if g.pop('holds_model_lock', False):
+        gear_app.env.lock.release()
+
 
 def login_required(f):
     """Decorator to require login"""
@@ -164,20 +225,56 @@ def logout():
     return redirect(url_for('login'))
 
 
+# Records per page on the list views (?per_page= overrides, up to the max)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Cards per Kanban column; the rest is reachable through the list view
+KANBAN_COLUMN_LIMIT = 50
+
+
+def _paginate(model, domain):
+    """
+    One page of model records for the current request
+    ?page=N pages by offset; the Next link also carries ?after=<last id>
+    so following it seeks past that record instead of skipping N pages
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after = request.args.get('after', type=int)
+    
+    # One extra record tells whether there is a next page
+    if after:
+        records = model.search(domain, limit=per_page + 1, after_id=after)
+    else:
+        records = model.search(domain, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_next = len(records) > per_page
+    records = records[:per_page]
+    
+    total = model.search_count(domain)
+    pagination = {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': max((total + per_page - 1) // per_page, 1),
+        'has_prev': page > 1,
+        'has_next': has_next,
+        'next_after': records[-1]['id'] if records else None,
+    }
+    return records, pagination
+
+
 @app.route('/equipment')
 @login_required
 def equipment_list():
-    """List all equipment"""
+    """List equipment, one page at a time"""
     equipment_model = gear_app.env['equipment']
-    equipments = equipment_model.search([])
+    equipments, pagination = _paginate(equipment_model, [])
     
-    # Add computed fields
+    # Request counters are stored computed fields; add the health category
     for equip in equipments:
-        equip['maintenance_requests_count'] = equipment_model._get_maintenance_requests_count(equip['id'])
-        equip['open_requests_count'] = equipment_model._get_open_requests_count(equip['id'])
         equip['health_status'] = equipment_model.get_health_status(equip['id'])
     
-    return render_template('equipment_list.html', equipments=equipments)
+    return render_template('equipment_list.html', equipments=equipments, pagination=pagination)
 
 
 @app.route('/equipment/<int:equipment_id>')
@@ -192,8 +289,6 @@ def equipment_detail(equipment_id):
         return redirect(url_for('equipment_list'))
     
     equip = equipment[0]
-    equip['maintenance_requests_count'] = equipment_model._get_maintenance_requests_count(equipment_id)
-    equip['open_requests_count'] = equipment_model._get_open_requests_count(equipment_id)
     equip['health_status'] = equipment_model.get_health_status(equipment_id)
     
     # Get assigned employee details
@@ -252,34 +347,42 @@ def equipment_create():
 @app.route('/requests')
 @login_required
 def requests_list():
-    """List all maintenance requests"""
+    """List maintenance requests, one page (or Kanban column limit) at a time"""
     view_type = request.args.get('view', 'list')  # 'list' or 'kanban'
+    state_filter = request.args.get('state')
+    domain = [('state', '=', state_filter)] if state_filter else []
     
     request_model = gear_app.env['maintenance.request']
-    requests = request_model.search([])
+    kanban_counts = None
+    pagination = None
+    if view_type == 'kanban':
+        # Each column shows its first cards and the column total
+        states = [state_filter] if state_filter else ['new', 'in_progress', 'repaired', 'scrap']
+        requests = []
+        kanban_counts = {}
+        for state in states:
+            requests.extend(request_model.search([('state', '=', state)], limit=KANBAN_COLUMN_LIMIT))
+            kanban_counts[state] = request_model.search_count([('state', '=', state)])
+    else:
+        requests, pagination = _paginate(request_model, domain)
     
-    # Add equipment names and technician names
-    equipment_model = gear_app.env['equipment']
-    employee_model = gear_app.env['employee']
+    # Add equipment names and technician names (one lookup per model)
+    equipment_by_id = request_model.prefetch(requests, 'equipment_id', 'equipment')
+    technicians_by_id = request_model.prefetch(requests, 'technician_id', 'employee')
     
     for req in requests:
         if req.get('equipment_id'):
-            equip = equipment_model.browse([req['equipment_id']])
-            req['equipment_name'] = equip[0]['name'] if equip else 'Unknown'
+            equip = equipment_by_id.get(req['equipment_id'])
+            req['equipment_name'] = equip['name'] if equip else 'Unknown'
         else:
             req['equipment_name'] = 'N/A'
         
         if req.get('technician_id'):
-            tech = employee_model.browse([req['technician_id']])
-            req['technician_name'] = tech[0]['name'] if tech else 'Unknown'
+            tech = technicians_by_id.get(req['technician_id'])
+            req['technician_name'] = tech['name'] if tech else 'Unknown'
         else:
             req['technician_name'] = 'Unassigned'
     
-    # Filter by state if provided
-    state_filter = request.args.get('state')
-    if state_filter:
-        requests = [r for r in requests if r.get('state') == state_filter]
-    
     # Group by state for Kanban
     if view_type == 'kanban':
         kanban_data = {
@@ -292,9 +395,11 @@ def requests_list():
             state = req.get('state', 'new')
             if state in kanban_data:
                 kanban_data[state].append(req)
-        return render_template('requests_kanban.html', kanban_data=kanban_data, current_state=state_filter, view_type=view_type)
+        return render_template('requests_kanban.html', kanban_data=kanban_data, kanban_counts=kanban_counts,
+                               column_limit=KANBAN_COLUMN_LIMIT, current_state=state_filter, view_type=view_type)
     
-    return render_template('requests_list.html', requests=requests, current_state=state_filter, view_type=view_type)
+    return render_template('requests_list.html', requests=requests, pagination=pagination,
+                           current_state=state_filter, view_type=view_type)
 
 
 @app.route('/requests/<int:request_id>')
@@ -393,12 +498,14 @@ def teams_list():
     team_model = gear_app.env['maintenance.team']
     teams = team_model.search([])
     
-    # Add technician names
-    employee_model = gear_app.env['employee']
+    # Add technician names (one lookup for all teams)
+    employees_by_id = team_model.prefetch(teams, 'technician_ids', 'employee')
     for team in teams:
-        technician_ids = team.get('technician_ids', [])
-        technicians = employee_model.browse(technician_ids) if technician_ids else []
-        team['technicians'] = [{'id': t['id'], 'name': t['name']} for t in technicians]
+        technician_ids = sorted(set(team.get('technician_ids', [])))
+        team['technicians'] = [
+            {'id': tech_id, 'name': employees_by_id[tech_id]['name']}
+            for tech_id in technician_ids if tech_id in employees_by_id
+        ]
     
     return render_template('teams_list.html', teams=teams)
 
@@ -499,46 +606,42 @@ def team_assignment_guide():
     return render_template('team_assignment_info.html')
 
 
-@app.route('/calendar')
-@login_required
-def calendar_view():
-    """Calendar view showing equipment maintenance status by date"""
-    from datetime import datetime, timedelta
-    from calendar import monthrange
-    
-    # Get month and year from query params or use current
-    year = int(request.args.get('year', datetime.now().year))
-    month = int(request.args.get('month', datetime.now().month))
-    
-    # Get all maintenance requests
+def _month_bounds(year, month):
+    """First day of the month and of the next month"""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return date(year, month, 1), date(next_year, next_month, 1)
+
+
+def _build_calendar_data(start_date, end_date):
+    """
+    Equipment maintenance status per day in [start_date, end_date)
+    Format: {'YYYY-MM-DD': {equipment_id: {'status': 'red'/'green', 'equipment_name': '...', 'request_id': ...}}}
+    Only requests scheduled or repaired in the range are loaded.
+    """
     request_model = gear_app.env['maintenance.request']
-    equipment_model = gear_app.env['equipment']
+    month_requests = request_model.search_date_range(start_date, end_date)
+    equipment_by_id = request_model.prefetch(month_requests, 'equipment_id', 'equipment')
     
-    all_requests = request_model.search([])
-    
-    # Build calendar data structure
-    # Format: {date: {equipment_id: {'status': 'red'/'green', 'equipment_name': '...', 'request_id': ...}}}
     calendar_data = {}
     
-    for req in all_requests:
+    for req in month_requests:
         equipment_id = req.get('equipment_id')
         if not equipment_id:
             continue
         
-        equipment = equipment_model.browse([equipment_id])
+        equipment = equipment_by_id.get(equipment_id)
         if not equipment:
             continue
         
-        equip_name = equipment[0].get('name', 'Unknown')
+        equip_name = equipment.get('name', 'Unknown')
         state = req.get('state', 'new')
         scheduled_date = req.get('scheduled_date')
         repaired_date = req.get('repaired_date')
         
         # Red status: Active/pending requests (new, in_progress) on scheduled date
-        if scheduled_date and state in ['new', 'in_progress']:
-            if scheduled_date not in calendar_data:
-                calendar_data[scheduled_date] = {}
-            calendar_data[scheduled_date][equipment_id] = {
+        if scheduled_date and state in ['new', 'in_progress'] and start_date <= scheduled_date < end_date:
+            day = calendar_data.setdefault(scheduled_date.isoformat(), {})
+            day[equipment_id] = {
                 'status': 'red',
                 'equipment_name': equip_name,
                 'request_id': req.get('id'),
@@ -547,12 +650,11 @@ def calendar_view():
             }
         
         # Green status: Repaired requests on repair date
-        if repaired_date and state == 'repaired':
-            if repaired_date not in calendar_data:
-                calendar_data[repaired_date] = {}
+        if repaired_date and state == 'repaired' and start_date <= repaired_date < end_date:
+            day = calendar_data.setdefault(repaired_date.isoformat(), {})
             # Only show green if not already red (repair takes priority)
-            if equipment_id not in calendar_data[repaired_date] or calendar_data[repaired_date][equipment_id]['status'] != 'red':
-                calendar_data[repaired_date][equipment_id] = {
+            if equipment_id not in day or day[equipment_id]['status'] != 'red':
+                day[equipment_id] = {
                     'status': 'green',
                     'equipment_name': equip_name,
                     'request_id': req.get('id'),
@@ -560,6 +662,24 @@ def calendar_view():
                     'state': 'repaired'
                 }
     
+    return calendar_data
+
+
+@app.route('/calendar')
+@login_required
+def calendar_view():
+    """Calendar view showing equipment maintenance status by date"""
+    from calendar import monthrange
+    
+    # Get month and year from query params or use current
+    year = int(request.args.get('year', datetime.now().year))
+    month = int(request.args.get('month', datetime.now().month))
+    
+    equipment_model = gear_app.env['equipment']
+    
+    # Only this month's requests, via the date range indexes
+    calendar_data = _build_calendar_data(*_month_bounds(year, month))
+    
     # Get all equipment for the month view
     all_equipment = equipment_model.search([('is_scrapped', '=', False)])
     
@@ -570,7 +690,7 @@ def calendar_view():
     first_weekday, days_in_month = monthrange(year, month)
     # Convert Monday=0 to Sunday=0 format
     first_day = (first_weekday + 1) % 7  # Sunday=0, Monday=1, ..., Saturday=6
-    today = datetime.now().date()
+    today = gear_app.env.today()
     
     # Previous and next month
     if month == 1:
@@ -597,33 +717,122 @@ def calendar_view():
                          all_equipment=all_equipment)
 
 
+def api_etag():
+    """
+    Entity tag for API payloads: the model data version plus today's date
+    (overdue flags and 30-day breakdown windows move with the date)
+    """
+    return f"{get_data_version()}-{gear_app.env.today().isoformat()}"
+
+
+def conditional_api(check=None):
+    """
+    Decorator answering If-None-Match with 304 while model data is unchanged
+    check(**view_args) returns the (payload, status) error of a request the
+    view would reject, or None; only requests that pass it get a 304
+    """
+    from functools import wraps
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            error = check(**kwargs) if check else None
+            if error is not None:
+                payload, status = error
+                return jsonify(payload), status
+            # Checked before the view runs, so idle pollers cost one comparison
+            if request.if_none_match.contains_weak(api_etag()):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # Tagged after the view ran: flushing computed fields bumps the version
+            response.set_etag(api_etag())
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
+
+
 @app.route('/api/dashboard/kpis')
+@conditional_api()
 def api_kpis():
     """API endpoint for dashboard KPIs"""
-    dashboard_data = gear_app.get_dashboard_data()
-    return jsonify(dashboard_data['kpis'])
+    return jsonify(gear_app.get_dashboard_section('kpis'))
 
 
 @app.route('/api/dashboard/alerts')
+@conditional_api()
 def api_alerts():
     """API endpoint for predictive alerts"""
-    dashboard_data = gear_app.get_dashboard_data()
-    return jsonify(dashboard_data['alerts'])
+    return jsonify(gear_app.get_dashboard_section('alerts'))
 
 
-@app.route('/api/equipment/<int:equipment_id>/health')
-def api_equipment_health(equipment_id):
-    """API endpoint for equipment health score"""
+@app.route('/api/_metrics')
+def api_metrics():
+    """Hot-path metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def check_calendar_month(year, month):
+    """Error payload and status code for a month out of range, else None"""
+    if not 1 <= month <= 12:
+        return {'error': 'Invalid month'}, 400
+    return None
+
+
+def get_calendar_month(year, month):
+    """JSON payload and status code for one calendar month"""
+    error = check_calendar_month(year, month)
+    if error is not None:
+        return error
+    
+    calendar_data = _build_calendar_data(*_month_bounds(year, month))
+    return {
+        'year': year,
+        'month': month,
+        'days': {
+            date: [dict(info, equipment_id=equipment_id) for equipment_id, info in equipments.items()]
+            for date, equipments in sorted(calendar_data.items())
+        },
+    }, 200
+
+
+def check_equipment(equipment_id):
+    """Error payload and status code for unknown equipment, else None"""
+    if not gear_app.env['equipment'].browse([equipment_id]):
+        return {'error': 'Equipment not found'}, 404
+    return None
+
+
+def get_equipment_health(equipment_id):
+    """JSON payload and status code for an equipment's health score"""
     equipment_model = gear_app.env['equipment']
     equipment_model._compute_health_score(equipment_id)
     equipment = equipment_model.browse([equipment_id])
     
     if equipment:
-        return jsonify({
+        return {
             'health_score': equipment[0].get('health_score', 100),
             'status': equipment_model.get_health_status(equipment_id)
-        })
-    return jsonify({'error': 'Equipment not found'}), 404
+        }, 200
+    return {'error': 'Equipment not found'}, 404
+
+
+@app.route('/api/calendar/<int:year>/<int:month>')
+@conditional_api(check=check_calendar_month)
+def api_calendar_month(year, month):
+    """API endpoint for one calendar month: per-day equipment maintenance status"""
+    payload, status = get_calendar_month(year, month)
+    return jsonify(payload), status
+
+
+@app.route('/api/equipment/<int:equipment_id>/health')
+@conditional_api(check=check_equipment)
+def api_equipment_health(equipment_id):
+    """API endpoint for equipment health score"""
+    payload, status = get_equipment_health(equipment_id)
+    return jsonify(payload), status
 
 
 if __name__ == '__main__':